@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+
+# ------------------- Background Loop -------------------
+# One asyncio event loop on a daemon thread, shared by everything that does
+# network or process I/O. Tk stays on the main thread: coroutines are
+# handed over with submit() and results come back either as futures or
+# through state the UI polls with after().
+class BackgroundLoop:
+    def __init__(self, name="yesway-io"):
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine from any thread; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2)
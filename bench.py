@@ -0,0 +1,354 @@
+"""Benchmarks for the console core and its Tk views at growing data sizes.
+
+    python bench.py run                        # 1k, 10k and 100k rows -> bench-<commit>.json
+    python bench.py run --sizes 1000 --no-gui
+    python bench.py compare old.json new.json  # exit status 1 on a regression
+    python bench.py memory --size 500000       # resident size of the in-memory structures
+
+The GUI part needs a display. Without one it starts Xvfb when it is
+installed, and otherwise records the GUI benchmarks as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from core import Console
+from storage import Store
+
+SIZES = (1000, 10000, 100000)
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ------------------- Timing -------------------
+def summarize(samples):
+    samples = sorted(samples)
+    ms = [s * 1000 for s in samples]
+    return {
+        "runs": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def repeat(func, times):
+    # func(i) is called once per run so each run can touch a different row
+    return summarize([timed(func, i) for i in range(times)])
+
+
+# ------------------- Data -------------------
+def seed(path, size):
+    """A fresh database with `size` clients, services and workers."""
+    locations = [f"Town{i}" for i in range(50)]
+    statuses = ("Pending", "In Progress", "Finished ✅")
+    store = Store(path)
+    store.add_clients((f"Client{i}", f"C{i:07d}", locations[i % 50], "01 Jan 2025",
+                       "Not Registered", [f"₹{100 + i % 900} - Jan 2025"] if i % 3 == 0 else [])
+                      for i in range(size))
+    store.add_services((f"Client{i % size}", f"Task {i % 97}", statuses[i % 3])
+                       for i in range(size))
+    store.add_workers((f"Worker{i}", locations[i % 50], "Available" if i % 2 else "On Task")
+                      for i in range(size))
+    store.close()
+
+
+# ------------------- Core -------------------
+def bench_core(path, runs):
+    results = {}
+    results["core.open"] = summarize([timed(lambda: Console(path=path).warm()) for _ in range(3)])
+
+    console = Console(path=path)
+    console.warm()
+    service_ids, worker_ids = [], []
+    results["core.create_client"] = repeat(
+        lambda i: console.create_client(f"BenchClient{i}", "Bench"), runs)
+    results["core.add_service"] = repeat(
+        lambda i: service_ids.append(console.add_service(f"Client{i}", "Bench task", "Pending")),
+        runs)
+    results["core.update_service"] = repeat(
+        lambda i: console.update_service(service_ids[i], f"Client{i}", "Bench task", "In Progress"),
+        runs)
+    results["core.finish_service"] = repeat(
+        lambda i: console.finish_service(service_ids[i]), runs)
+    results["core.delete_service"] = repeat(
+        lambda i: console.delete_service(service_ids[i]), runs)
+    results["core.add_worker"] = repeat(
+        lambda i: worker_ids.append(console.add_worker(f"BenchWorker{i}", "Bench", "Available")),
+        runs)
+    results["core.update_worker"] = repeat(
+        lambda i: console.update_worker(worker_ids[i], f"BenchWorker{i}", "Bench", "On Task"),
+        runs)
+    results["core.delete_worker"] = repeat(
+        lambda i: console.delete_worker(worker_ids[i]), runs)
+
+    # Seconds per assignment, over batches of up to 10 until runs or
+    # the pending services run out
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        assigned = console.dispatch(10)
+        if not assigned:
+            break
+        samples.append((time.perf_counter() - started) / len(assigned))
+    if samples:
+        results["core.dispatch_per_assignment"] = summarize(samples)
+
+    results["core.search.build"] = summarize([timed(console.search.index, "clients")])
+    queries = ["c", "client1", "town4", "client12 town12"]
+    results["core.search.clients"] = repeat(
+        lambda i: console.search.index("clients").search(queries[i % len(queries)]), runs)
+    results["core.dashboard_counters"] = repeat(
+        lambda i: (console.counters.total("clients"), console.counters.active_services(),
+                   console.counters.finished_services()), runs)
+    console.close()
+    return results
+
+
+# ------------------- Memory -------------------
+def measure_memory(path):
+    """{structure: MiB} allocated by each in-memory structure over the database at path."""
+    console = Console(path=path)
+    parts = [
+        ("indexes", lambda: console.indexes),
+        ("counters", lambda: console.counters),
+        ("ledger", lambda: console.ledger),
+        ("search.clients", lambda: console.search.index("clients")),
+        ("search.services", lambda: console.search.index("services")),
+        ("search.workers", lambda: console.search.index("workers")),
+    ]
+    results = {}
+    tracemalloc.start()
+    try:
+        for name, build in parts:
+            before = tracemalloc.get_traced_memory()[0]
+            build()
+            results[name] = round((tracemalloc.get_traced_memory()[0] - before) / 2 ** 20, 1)
+    finally:
+        tracemalloc.stop()
+    results["total"] = round(sum(results.values()), 1)
+    console.close()
+    return results
+
+
+def memory(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.db")
+        print(f"seeding {args.size} rows...", file=sys.stderr)
+        seed(path, args.size)
+        for name, mib in measure_memory(path).items():
+            print(f"{name:<20} {mib:>8.1f} MiB")
+
+
+# ------------------- GUI -------------------
+def start_xvfb():
+    """Start Xvfb on a free display when there is none; returns the process or None."""
+    if os.environ.get("DISPLAY") or not shutil.which("Xvfb"):
+        return None
+    for number in range(99, 140):
+        if not os.path.exists(f"/tmp/.X{number}-lock"):
+            break
+    else:
+        return None
+    process = subprocess.Popen(["Xvfb", f":{number}", "-screen", "0", "1280x800x24",
+                                "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            return None
+        time.sleep(0.05)
+    os.environ["DISPLAY"] = f":{number}"
+    return process
+
+
+def bench_gui(path, runs):
+    import customtkinter as ctk
+    from remote_desktop_ui import AdminApp
+
+    ctk.set_appearance_mode("light")
+    results = {}
+    started = time.perf_counter()
+    app = AdminApp(db_path=path)
+    app.update()
+    results["gui.startup"] = summarize([time.perf_counter() - started])
+
+    def show(text):
+        # switch_menu plus everything Tk needs to put the view on screen
+        app.switch_menu(app.menu_items[text], text)
+        app.update()
+
+    views = [text for text in app.menu_items if text != "Quit"]
+    for text in views:
+        if text != "Dashboard":
+            results[f"gui.build.{text}"] = summarize([timed(show, text)])
+    for text in views:
+        # Back to an already built view, timing only the switch itself
+        away = views[1] if text == "Dashboard" else "Dashboard"
+        samples = []
+        for _ in range(runs):
+            show(away)
+            samples.append(timed(show, text))
+        results[f"gui.switch.{text}"] = summarize(samples)
+
+    def refresh(text):
+        show(text)
+        return repeat(lambda i: (app.view_refreshers[text](), app.update()), runs)
+
+    results["gui.refresh.Dashboard"] = refresh("Dashboard")
+    results["gui.refresh.Services"] = refresh("Services")
+    results["gui.refresh.Remote Desktop"] = refresh("Remote Desktop")
+
+    # Handlers: the same core calls the dialogs make, plus the row patches
+    # every built view applies, flushed to the screen
+    core = app.core
+    service_ids, worker_ids = [], []
+
+    def handler(func):
+        return lambda i: (func(i), app.update())
+
+    show("Services")
+    results["gui.create_client"] = repeat(
+        handler(lambda i: core.create_client(f"GuiClient{i}", "Bench")), runs)
+    results["gui.add_service"] = repeat(handler(
+        lambda i: service_ids.append(core.add_service(f"Client{i}", "Bench task", "Pending"))),
+        runs)
+    results["gui.edit_service"] = repeat(handler(
+        lambda i: core.update_service(service_ids[i], f"Client{i}", "Bench task", "In Progress")),
+        runs)
+    results["gui.finish_service"] = repeat(
+        handler(lambda i: core.finish_service(service_ids[i])), runs)
+    results["gui.delete_service"] = repeat(
+        handler(lambda i: core.delete_service(service_ids[i])), runs)
+
+    show("Worker Status")
+    results["gui.add_worker"] = repeat(handler(
+        lambda i: worker_ids.append(core.add_worker(f"GuiWorker{i}", "Bench", "Available"))),
+        runs)
+    results["gui.edit_worker"] = repeat(handler(
+        lambda i: core.update_worker(worker_ids[i], f"GuiWorker{i}", "Bench", "On Task")), runs)
+    results["gui.delete_worker"] = repeat(
+        handler(lambda i: core.delete_worker(worker_ids[i])), runs)
+
+    app.heartbeats.stop()
+    app.destroy()
+    return results
+
+
+# ------------------- Run / Compare -------------------
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def run(args):
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": {},
+    }
+    xvfb = None if args.no_gui else start_xvfb()
+    gui_skipped = ("disabled with --no-gui" if args.no_gui
+                   else None if os.environ.get("DISPLAY") else "no display and Xvfb not found")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for size in args.sizes:
+                path = os.path.join(tmp, f"bench-{size}.db")
+                print(f"seeding {size} rows...", file=sys.stderr)
+                seed(path, size)
+                results = bench_core(path, args.runs)
+                if gui_skipped is None:
+                    results.update(bench_gui(path, args.runs))
+                report["sizes"][str(size)] = results
+                for name, summary in results.items():
+                    print(f"{size:>7}  {name:<30} median {summary['median_ms']:>9.3f} ms"
+                          f"  p95 {summary['p95_ms']:>9.3f} ms", file=sys.stderr)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    if gui_skipped:
+        report["gui_skipped"] = gui_skipped
+        print(f"GUI benchmarks skipped: {gui_skipped}", file=sys.stderr)
+
+    output = args.output or f"bench-{commit or 'results'}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(output)
+
+
+def compare(args):
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    regressions = 0
+    print(f"{'size':>7}  {'benchmark':<30} {old.get('commit') or 'old':>12} "
+          f"{new.get('commit') or 'new':>12}  ratio")
+    for size, results in new["sizes"].items():
+        for name, summary in results.items():
+            before = old["sizes"].get(size, {}).get(name)
+            if before is None:
+                continue
+            a, b = before["median_ms"], summary["median_ms"]
+            ratio = b / a if a else float("inf")
+            # Sub-millisecond differences are noise, not regressions
+            slower = ratio > args.threshold and b - a > args.min_ms
+            regressions += slower
+            print(f"{size:>7}  {name:<30} {a:>12.3f} {b:>12.3f}  {ratio:5.2f}x"
+                  f"{'  REGRESSION' if slower else ''}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("run", help="run the benchmarks and save JSON")
+    bench.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    bench.add_argument("--runs", type=int, default=30, help="repetitions per timed operation")
+    bench.add_argument("--output", help="JSON file (default: bench-<commit>.json)")
+    bench.add_argument("--no-gui", action="store_true", help="core benchmarks only")
+    bench.set_defaults(run=run)
+
+    diff = commands.add_parser("compare", help="compare two result files")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=1.25,
+                      help="median slowdown ratio counted as a regression")
+    diff.add_argument("--min-ms", type=float, default=0.5)
+    diff.set_defaults(run=compare)
+
+    sizes = commands.add_parser("memory", help="memory held by the in-memory indexes")
+    sizes.add_argument("--size", type=int, default=500000)
+    sizes.set_defaults(run=memory)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import time
+from itertools import islice
+
+from dispatch import PRIORITIES
+from storage import BATCH_SIZE, Store, today
+
+# Columns per table, in the order the store takes them
+FIELDS = {
+    "clients": ("name", "code", "location", "joined", "computer", "payments"),
+    "services": ("client", "task", "status", "priority", "worker"),
+    "orders": ("type", "client", "date"),
+    "workers": ("name", "location", "status", "code"),
+}
+REQUIRED = {
+    "clients": ("name", "code"),
+    "services": ("client", "task", "status"),
+    "orders": ("type", "client"),
+    "workers": ("name", "location", "status"),
+}
+FORMATS = ("csv", "jsonl")
+
+# Payment entries share one CSV cell; JSONL carries them as a list
+PAYMENT_SEPARATOR = "; "
+
+# Only the first errors are kept for display; the rest are just counted,
+# so a file full of bad rows still imports in constant memory.
+MAX_ERRORS = 1000
+
+# Files are decoded with surrogateescape, so bytes that are not UTF-8 end
+# up as lone surrogates in the one record they belong to instead of
+# stopping the import halfway
+UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if ext in ("csv", "txt"):
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path}; use .csv or .jsonl")
+
+
+# ------------------- Progress -------------------
+# Written by the worker thread, read by the Tk thread on a timer.
+class Progress:
+    __slots__ = ("table", "total", "done", "imported", "errors", "error_count",
+                 "started", "elapsed", "cancelled", "finished")
+
+    def __init__(self, table):
+        self.table = table
+        self.total = 0        # bytes of the input file, or rows to export
+        self.done = 0         # bytes read, or rows written
+        self.imported = 0
+        self.errors = []
+        self.error_count = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.cancelled = False
+        self.finished = False
+
+    @property
+    def fraction(self):
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+    def reject(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# ------------------- Parsing -------------------
+def _undecodable(values):
+    return any(isinstance(v, str) and UNDECODABLE.search(v) for v in values)
+
+
+def read_records(file, fmt, required=()):
+    """Yield (line number, record dict, error) from an open text file, one record at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(file)
+        missing = [f for f in required if f not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        while True:
+            line = reader.line_num
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as exc:
+                yield reader.line_num, None, f"invalid CSV: {exc}"
+                if reader.line_num == line:
+                    return  # the reader is stuck; nothing more can be read
+                continue
+            if _undecodable(record.values()):
+                yield reader.line_num, None, "not valid UTF-8 text"
+            else:
+                yield reader.line_num, record, None
+        return
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        if UNDECODABLE.search(line):
+            yield number, None, "not valid UTF-8 text"
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"invalid JSON: {exc}"
+            continue
+        if isinstance(record, dict):
+            yield number, record, None
+        else:
+            yield number, None, "expected a JSON object"
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def to_row(table, record):
+    """Validate one record and return the store row; raises ValueError with the reason."""
+    values = {field: _text(record.get(field)) for field in FIELDS[table] if field != "payments"}
+    missing = [field for field in REQUIRED[table] if not values[field]]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    if table == "clients":
+        payments = record.get("payments") or ()
+        if isinstance(payments, str):
+            payments = payments.split(PAYMENT_SEPARATOR.strip())
+        elif not isinstance(payments, (list, tuple)):
+            raise ValueError("payments must be a list")
+        payments = [entry for entry in map(_text, payments) if entry]
+        return (values["name"], values["code"], values["location"] or "Unknown",
+                values["joined"] or today(), values["computer"] or "Not Registered", payments)
+    if table == "orders":
+        return (values["type"], values["client"], values["date"] or today())
+    if table == "workers":
+        return (values["name"], values["location"], values["status"], values["code"] or None)
+    if table == "services":
+        # Files written before priority and worker were exported have
+        # neither column: those services come in Normal and unassigned.
+        # worker is the worker's unique code (see IMPORT_INSERTS).
+        try:
+            priority = int(values["priority"] or 0)
+        except ValueError:
+            raise ValueError("priority must be a whole number") from None
+        if priority not in range(len(PRIORITIES)):
+            raise ValueError(f"priority must be 0-{len(PRIORITIES) - 1}")
+        return (values["client"], values["task"], values["status"], priority,
+                values["worker"] or None)
+    return tuple(values[field] for field in FIELDS[table])
+
+
+def _describe(error):
+    # sqlite3 IntegrityError text -> something a user can act on
+    if error.startswith("UNIQUE constraint failed: "):
+        return f"duplicate {error.rsplit('.', 1)[-1]}"
+    return error
+
+
+# ------------------- Import -------------------
+# Streams the file in BATCH_SIZE chunks: each chunk is parsed, validated
+# and inserted in its own transaction, so memory stays flat however large
+# the file is and the console can keep reading while it runs.
+def import_file(store, table, path, fmt=None, progress=None):
+    fmt = fmt or detect_format(path)
+    progress = progress or Progress(table)
+    progress.total = os.path.getsize(path)
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="surrogateescape",
+                                newline="")
+        records = read_records(text, fmt, REQUIRED[table])
+        while not progress.cancelled:
+            chunk = list(islice(records, BATCH_SIZE))
+            if not chunk:
+                break
+            rows, lines = [], []
+            for line, record, error in chunk:
+                if error is None:
+                    try:
+                        rows.append(to_row(table, record))
+                        lines.append(line)
+                        continue
+                    except ValueError as exc:
+                        error = str(exc)
+                progress.reject(line, error)
+
+            if table == "services":
+                # Same rule as the Add Service dialog: the client must exist
+                known = store.existing_clients({row[0] for row in rows})
+                checked = list(zip(lines, rows))
+                lines, rows = [], []
+                for line, row in checked:
+                    if row[0] in known:
+                        lines.append(line)
+                        rows.append(row)
+                    else:
+                        progress.reject(line, f"unknown client {row[0]!r}")
+
+            rejected = store.import_rows(table, rows)
+            for position, error in rejected:
+                progress.reject(lines[position], _describe(error))
+            progress.imported += len(rows) - len(rejected)
+            progress.done = raw.tell()
+    progress.elapsed = time.perf_counter() - progress.started
+    progress.finished = True
+    return progress
+
+
+# ------------------- Export -------------------
+def export_file(store, table, path, fmt=None, progress=None):
+    fmt = fmt or detect_format(path)
+    progress = progress or Progress(table)
+    progress.total = store.count(table)
+    fields = FIELDS[table]
+    rows = store.export_rows(table)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(fields)
+        while not progress.cancelled:
+            chunk = rows.fetchmany(BATCH_SIZE)
+            if not chunk:
+                break
+            if table == "clients":
+                chunk = [row[:5] + (json.loads(row[5]),) for row in chunk]
+                if writer:
+                    chunk = [row[:5] + (PAYMENT_SEPARATOR.join(row[5]),) for row in chunk]
+            if writer:
+                writer.writerows(chunk)
+            else:
+                f.writelines(json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n"
+                             for row in chunk)
+            progress.done += len(chunk)
+    progress.imported = progress.done
+    progress.elapsed = time.perf_counter() - progress.started
+    progress.finished = True
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of Yesway records")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("table", choices=sorted(FIELDS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--db", help="database file (default: YESWAY_DB or yesway.db)")
+    args = parser.parse_args(argv)
+
+    store = Store(args.db)
+    try:
+        run = import_file if args.action == "import" else export_file
+        progress = run(store, args.table, args.path, args.format)
+    finally:
+        store.close()
+    verb = "imported" if args.action == "import" else "exported"
+    print(f"{verb} {progress.imported} {args.table} in {progress.elapsed:.1f}s, "
+          f"{progress.error_count} error(s)")
+    for line, message in progress.errors[:20]:
+        print(f"  line {line}: {message}")
+
+
+if __name__ == "__main__":
+    main()
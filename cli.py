@@ -0,0 +1,274 @@
+"""Command line for scripted and batch work on the Yesway database.
+
+Imports only the console core, never Tk, so it starts in a fraction of
+the time the GUI takes:
+
+    python cli.py client add Ravi --location Kollam
+    python cli.py service finish 12 13 14
+    python cli.py batch jobs.txt        # one command per line, one transaction
+"""
+import argparse
+import shlex
+import sqlite3
+import sys
+
+from bulk import FIELDS, export_file, import_file
+from core import Console, ValidationError
+from dispatch import PRIORITIES
+from journal import JOURNAL_KEEP
+from ledger import format_amount, format_month
+from search import SEARCH_FIELDS
+
+ROWS = {
+    "clients": ("clients_by_ids", ("name", "code")),
+    "services": ("services_by_ids", ("id", "client", "task", "status")),
+    "workers": ("workers_by_ids", ("id", "name", "location", "status")),
+}
+
+
+# ------------------- Commands -------------------
+def stats(console, args):
+    c = console.counters
+    print(f"clients\t{c.total('clients')}")
+    print(f"services\t{c.total('services')}")
+    print(f"active services\t{c.active_services()}")
+    print(f"finished services\t{c.finished_services()}")
+    print(f"orders\t{c.pending_orders()}")
+    print(f"workers\t{c.total('workers')}")
+
+
+def client_add(console, args):
+    print(console.create_client(args.name, args.location, args.payment, args.computer))
+
+
+def client_show(console, args):
+    details = console.client_details(args.name)
+    if details is None:
+        raise ValidationError(f"No client named {args.name!r}")
+    print(details.strip())
+
+
+def payment_add(console, args):
+    if console.add_payment(args.client, args.amount, args.date) is None:
+        raise ValidationError(f"No client named {args.client!r}")
+
+
+def revenue(console, args):
+    ledger = console.ledger
+    print(f"total\t{format_amount(ledger.total())}\t{len(ledger)}")
+    for month, paise, n in ledger.monthly()[:args.months]:
+        print(f"{format_month(month)}\t{format_amount(paise)}\t{n}")
+
+
+def service_add(console, args):
+    print(console.add_service(args.client, args.task, args.status, args.location, args.payment,
+                              PRIORITIES.index(args.priority)))
+
+
+def service_finish(console, args):
+    console.finish_services(args.ids)
+
+
+def service_delete(console, args):
+    console.delete_services(args.ids)
+
+
+def dispatch(console, args):
+    assignments = console.dispatch(args.limit)
+    names = {w["id"]: w["name"] for w in console.store.workers_by_ids(w for _, w in assignments)}
+    for service_id, worker_id in assignments:
+        print(f"{service_id}\t{names.get(worker_id, worker_id)}")
+
+
+def worker_add(console, args):
+    console.add_worker(args.name, args.location, args.status)
+
+
+def worker_status(console, args):
+    if console.worker_id(args.name) is None:
+        raise ValidationError(f"No worker named {args.name!r}")
+    console.set_worker_statuses({args.name: args.status})
+
+
+def worker_delete(console, args):
+    worker_id = console.worker_id(args.name)
+    if worker_id is None:
+        raise ValidationError(f"No worker named {args.name!r}")
+    console.delete_worker(worker_id)
+
+
+def search(console, args):
+    by_ids, columns = ROWS[args.table]
+    ids = console.search.search(args.table, args.query, args.limit)
+    for row in getattr(console.store, by_ids)(ids):
+        print("\t".join(str(row[column]) for column in columns))
+    if console.search.truncated(args.table, args.query, args.limit):
+        print(f"(first {args.limit} matches; raise --limit for more)", file=sys.stderr)
+
+
+def transfer(console, args):
+    run = import_file if args.command == "import" else export_file
+    progress = run(console.store, args.table, args.path, args.format)
+    verb = "imported" if args.command == "import" else "exported"
+    print(f"{verb} {progress.imported} {args.table} in {progress.elapsed:.1f}s, "
+          f"{progress.error_count} error(s)")
+    for line, message in sorted(progress.errors)[:20]:
+        print(f"  line {line}: {message}", file=sys.stderr)
+
+
+def journal_compact(console, args):
+    print(f"removed {console.store.compact_journal(args.keep)} journal entries")
+
+
+def journal_snapshot(console, args):
+    # Everything a console builds, search included, for the next start
+    console.warm()
+    for table in SEARCH_FIELDS:
+        console.search.index(table)
+    console.save_snapshot()
+    print(f"snapshot at journal entry {console.journal.cursor}")
+
+
+def batch(console, args):
+    # Every line runs in this process and in one transaction; a refused
+    # line is rolled back to its savepoint, reported and skipped without
+    # undoing the others.
+    parser = build_parser()
+    failed = 0
+    # Built before the transaction opens: a part built inside it would read
+    # rows that are not committed yet, then get their events again at commit
+    console.warm()
+    for table in SEARCH_FIELDS:
+        console.search.index(table)
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    with source, console.model.batch():
+        for number, line in enumerate(source, start=1):
+            words = shlex.split(line, comments=True)
+            if not words:
+                continue
+            try:
+                command = parser.parse_args(words)
+            except SystemExit:
+                # argparse has already printed what was wrong
+                failed += 1
+                print(f"line {number}: invalid command", file=sys.stderr)
+                continue
+            try:
+                if command.run is batch:
+                    raise ValidationError("batch files cannot nest")
+                with console.model.savepoint():
+                    command.run(console, command)
+            except (ValueError, sqlite3.IntegrityError) as exc:
+                # IntegrityError: clashes with an earlier line of this batch,
+                # which the in-memory checks only see once it commits
+                failed += 1
+                print(f"line {number}: {exc}", file=sys.stderr)
+    if failed:
+        raise ValidationError(f"{failed} line(s) failed")
+
+
+# ------------------- Parser -------------------
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="database file (default: YESWAY_DB or yesway.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="dashboard totals").set_defaults(run=stats)
+
+    client = commands.add_parser("client").add_subparsers(dest="action", required=True)
+    add = client.add_parser("add", help="create a client and print its code")
+    add.add_argument("name")
+    add.add_argument("--location", default="")
+    add.add_argument("--payment", default="")
+    add.add_argument("--computer", default="")
+    add.set_defaults(run=client_add)
+    show = client.add_parser("show", help="client details and payment history")
+    show.add_argument("name")
+    show.set_defaults(run=client_show)
+
+    payment = commands.add_parser("payment").add_subparsers(dest="action", required=True)
+    add = payment.add_parser("add", help="record a payment against a client")
+    add.add_argument("client")
+    add.add_argument("amount")
+    add.add_argument("--date", default="", help="e.g. 12 Jan 2025 (default: today)")
+    add.set_defaults(run=payment_add)
+
+    totals = commands.add_parser("revenue", help="total and monthly revenue")
+    totals.add_argument("--months", type=int, default=12)
+    totals.set_defaults(run=revenue)
+
+    service = commands.add_parser("service").add_subparsers(dest="action", required=True)
+    add = service.add_parser("add", help="record a service and print its id")
+    add.add_argument("client")
+    add.add_argument("task")
+    add.add_argument("status")
+    add.add_argument("--location", default="")
+    add.add_argument("--payment", default="")
+    add.add_argument("--priority", choices=PRIORITIES, default=PRIORITIES[0])
+    add.set_defaults(run=service_add)
+    for name, run in (("finish", service_finish), ("delete", service_delete)):
+        ids = service.add_parser(name, help=f"{name} services by id")
+        ids.add_argument("ids", nargs="+", type=int)
+        ids.set_defaults(run=run)
+
+    assign = commands.add_parser("dispatch", help="assign pending services to free workers")
+    assign.add_argument("--limit", type=int, help="assign at most this many")
+    assign.set_defaults(run=dispatch)
+
+    worker = commands.add_parser("worker").add_subparsers(dest="action", required=True)
+    add = worker.add_parser("add")
+    add.add_argument("name")
+    add.add_argument("location")
+    add.add_argument("status")
+    add.set_defaults(run=worker_add)
+    status = worker.add_parser("status")
+    status.add_argument("name")
+    status.add_argument("status")
+    status.set_defaults(run=worker_status)
+    delete = worker.add_parser("delete")
+    delete.add_argument("name")
+    delete.set_defaults(run=worker_delete)
+
+    find = commands.add_parser("search", help="word-prefix search")
+    find.add_argument("table", choices=sorted(ROWS))
+    find.add_argument("query")
+    find.add_argument("--limit", type=int, default=50)
+    find.set_defaults(run=search)
+
+    for name in ("import", "export"):
+        bulk = commands.add_parser(name, help=f"{name} CSV or JSONL records")
+        bulk.add_argument("table", choices=sorted(FIELDS))
+        bulk.add_argument("path")
+        bulk.add_argument("--format", choices=("csv", "jsonl"))
+        bulk.set_defaults(run=transfer)
+
+    journal = commands.add_parser("journal").add_subparsers(dest="action", required=True)
+    compact = journal.add_parser("compact", help="drop old change journal entries")
+    compact.add_argument("--keep", type=int, default=JOURNAL_KEEP,
+                         help=f"newest entries to keep (default {JOURNAL_KEEP})")
+    compact.set_defaults(run=journal_compact)
+    journal.add_parser("snapshot", help="save in-memory state for faster startup").set_defaults(
+        run=journal_snapshot)
+
+    script = commands.add_parser("batch", help="run commands from a file ('-' for stdin)")
+    script.add_argument("path")
+    script.set_defaults(run=batch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    console = Console(path=args.db)
+    try:
+        args.run(console, args)
+    except (ValueError, OSError) as exc:
+        # ValidationError, plus unreadable or malformed import files
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        console.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import asyncio
+import itertools
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+from model import RESET
+
+RDP_PORT = 3389
+
+STARTING = "Starting"
+RUNNING = "Running"
+CLOSED = "Closed"
+FAILED = "Failed"
+
+
+def default_command():
+    """Launcher template for this platform; override with YESWAY_RDP_COMMAND."""
+    command = os.environ.get("YESWAY_RDP_COMMAND")
+    if command:
+        return command
+    if sys.platform == "win32":
+        return "mstsc /v:{host}:{port}"
+    if sys.platform == "darwin":
+        return "open rdp://full%20address=s:{host}:{port}"
+    return "xfreerdp /v:{host}:{port}"
+
+
+def build_argv(command, host, port, client=""):
+    # command is a template string or a list of template arguments;
+    # {host}, {port} and {client} are filled in per session
+    if isinstance(command, str):
+        args = shlex.split(command, posix=sys.platform != "win32")
+    else:
+        args = list(command)
+    return [arg.format(host=host, port=port, client=client) for arg in args]
+
+
+# ------------------- Endpoint Registry -------------------
+# Remote desktop address per client, persisted in the store. Addresses set
+# on other consoles arrive as endpoints change events from the journal.
+class EndpointRegistry:
+    def __init__(self, store):
+        self.store = store
+        self._load()
+
+    def watch(self, model):
+        """Keep the map current with addresses other consoles set."""
+        model.subscribe("endpoints", self._on_change)
+
+    def _load(self):
+        self._by_client = {name: (host, port)
+                           for client_id, name, host, port in self.store.endpoints()}
+
+    def _on_change(self, change):
+        endpoint = change.record if change.record is not None else change.old
+        client = None
+        if change.kind != RESET:
+            client = next(iter(self.store.clients_by_ids([endpoint.client_id])), None)
+        if client is None:
+            # A reset, or the client went along with its address
+            self._load()
+        elif change.record is None:
+            self._by_client.pop(client.name, None)
+        else:
+            self._by_client[client.name] = (endpoint.host, endpoint.port)
+
+    def get(self, client):
+        return self._by_client.get(client)
+
+    def set(self, client, host, port=RDP_PORT):
+        client_id = self.store.client_id(client)
+        if client_id is None:
+            raise KeyError(client)
+        self.store.set_endpoint(client_id, host, int(port))
+        self._by_client[client] = (host, int(port))
+
+    def items(self):
+        return list(self._by_client.items())
+
+    def __len__(self):
+        return len(self._by_client)
+
+
+# ------------------- Sessions -------------------
+class Session:
+    __slots__ = ("id", "client", "host", "port", "state", "started", "ended",
+                 "returncode", "error", "process", "closing")
+
+    def __init__(self, session_id, client, host, port):
+        self.id = session_id
+        self.client = client
+        self.host = host
+        self.port = port
+        self.state = STARTING
+        self.started = time.monotonic()
+        self.ended = None
+        self.returncode = None
+        self.error = None
+        self.process = None
+        self.closing = False
+
+    @property
+    def elapsed(self):
+        return (self.ended or time.monotonic()) - self.started
+
+    @property
+    def active(self):
+        return self.state in (STARTING, RUNNING)
+
+
+# ------------------- Connection Manager -------------------
+# Launches one remote desktop client process per session on the background
+# loop, so the Tk thread never waits on a launcher. Any number of sessions
+# can run at once; the UI reads sessions() to show their live state.
+class ConnectionManager:
+    def __init__(self, background, command=None):
+        self.background = background
+        self.command = command or default_command()
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def connect(self, client, host, port=RDP_PORT):
+        session = Session(next(self._ids), client, host, int(port))
+        with self._lock:
+            self._sessions[session.id] = session
+        self.background.submit(self._run(session))
+        return session
+
+    async def _run(self, session):
+        argv = build_argv(self.command, session.host, session.port, session.client)
+        try:
+            session.process = await asyncio.create_subprocess_exec(
+                *argv, stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as exc:
+            session.error = str(exc)
+            session.state = FAILED
+            session.ended = time.monotonic()
+            return
+        session.state = RUNNING
+        session.returncode = await session.process.wait()
+        session.ended = time.monotonic()
+        ok = session.returncode == 0 or session.closing
+        session.state = CLOSED if ok else FAILED
+
+    def disconnect(self, session_id):
+        session = self.get(session_id)
+        if session is not None and session.process is not None and session.active:
+            session.closing = True
+            self.background.call_soon(_terminate, session.process)
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def clear_finished(self):
+        with self._lock:
+            for session_id in [s.id for s in self._sessions.values() if not s.active]:
+                del self._sessions[session_id]
+
+
+def _terminate(process):
+    if process.returncode is None:
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            pass
@@ -0,0 +1,410 @@
+import uuid
+from datetime import date
+
+from counters import Counters
+from dispatch import PRIORITIES, Dispatcher
+from indexes import Indexes
+from journal import Journal, load_snapshot, save_snapshot
+from ledger import (Ledger, format_amount, format_date, format_paid, is_month, parse_amount,
+                    parse_date, parse_payment)
+from model import AVAILABLE, DataModel, FINISHED, IN_PROGRESS, ON_TASK, PENDING
+from search import SearchIndex
+from sorting import SortIndex
+from storage import Store, today
+
+
+class ValidationError(ValueError):
+    """A request the console refuses; the message is meant for the user."""
+
+
+# ------------------- Console Core -------------------
+# The console's records and rules with no GUI attached: the Tk app, the
+# command line and benchmarks all go through this class. Only the store
+# and the model are opened up front. The in-memory indexes, search and
+# counters are built the first time something asks for them, so a
+# one-off scripted command never pays to load them.
+#
+# Other consoles may share the store; the journal applies their changes
+# to whatever has been built so far.
+class Console:
+    # In-memory structures, each built on first use
+    PARTS = ("indexes", "search", "counters", "ledger", "dispatcher", "sorting")
+
+    def __init__(self, store=None, path=None):
+        self.store = store if store is not None else Store(path)
+        self.model = DataModel(self.store)
+        # Nothing is built yet, so there is nothing to catch up on
+        self.journal = Journal(self.model, self.store.journal_head())
+        self._indexes = None
+        self._search = None
+        self._counters = None
+        self._ledger = None
+        self._dispatcher = None
+        self._sorting = None
+
+    @property
+    def indexes(self):
+        if self._indexes is None:
+            self._indexes = self._build(Indexes)
+        return self._indexes
+
+    @property
+    def search(self):
+        if self._search is None:
+            self._search = self._build(SearchIndex)
+        return self._search
+
+    @property
+    def counters(self):
+        if self._counters is None:
+            self._counters = self._build(Counters)
+        return self._counters
+
+    @property
+    def ledger(self):
+        if self._ledger is None:
+            self._ledger = self._build(Ledger)
+        return self._ledger
+
+    @property
+    def dispatcher(self):
+        if self._dispatcher is None:
+            self._dispatcher = self._build(Dispatcher)
+        return self._dispatcher
+
+    @property
+    def sorting(self):
+        if self._sorting is None:
+            self._sorting = self._build(SortIndex)
+        return self._sorting
+
+    def _build(self, cls):
+        # Read from the store as of the journal position it is caught up to
+        with self.model.reading():
+            return cls(self.model)
+
+    def warm(self):
+        # Build everything now. Anything subscribing to the model later
+        # (views) then sees the indexes already updated for each change.
+        # A saved snapshot stands in for reading every table, as long as
+        # nothing has been built yet to disagree with it.
+        if not any(self._built()):
+            snapshot = load_snapshot(self.store)
+            if snapshot is not None:
+                seq, parts = snapshot
+                for name, part in parts.items():
+                    setattr(self, f"_{name}", part.attach(self.model))
+                # Only the changes made since the snapshot are replayed
+                self.journal.cursor = seq
+                self.journal.sync()
+        return (self.indexes, self.search, self.counters, self.ledger, self.dispatcher,
+                self.sorting)
+
+    def _built(self):
+        # {name: structure} for those built so far
+        return {name: getattr(self, f"_{name}") for name in self.PARTS
+                if getattr(self, f"_{name}") is not None}
+
+    def sync(self):
+        """Apply changes other consoles made since the last sync."""
+        return self.journal.sync()
+
+    def save_snapshot(self):
+        """Save what has been built so far for the next start to load."""
+        parts = self._built()
+        if parts:
+            self.sync()
+            save_snapshot(self.store, self.journal.cursor, parts)
+
+    def close(self):
+        self.store.close()
+
+    # ---------------- Lookups ----------------
+    # Served from the in-memory indexes once they exist, else straight
+    # from the store's unique indexes.
+    def client_exists(self, name):
+        if self._indexes is not None:
+            return self._indexes.has_client(name)
+        return self.store.client_exists(name)
+
+    def code_exists(self, code):
+        return self.store.code_exists(code)
+
+    def worker_exists(self, name):
+        if self._indexes is not None:
+            return self._indexes.has_worker(name)
+        return self.store.worker_exists(name)
+
+    def worker_id(self, name):
+        if self._indexes is not None:
+            return self._indexes.worker_by_name.get(name)
+        return self.store.worker_id(name)
+
+    def payment_total(self, client_id):
+        if self._ledger is not None:
+            return self._ledger.client_total(client_id)
+        return self.store.payment_total(client_id)
+
+    def service_count(self, client):
+        if self._indexes is not None:
+            return self._indexes.service_count(client)
+        return self.store.service_count(client)
+
+    # ---------------- Clients ----------------
+    def new_client_code(self):
+        code = str(uuid.uuid4())[:8].upper()
+        while self.code_exists(code):
+            code = str(uuid.uuid4())[:8].upper()
+        return code
+
+    def create_client(self, name, location="", payment="", computer=""):
+        """Add a client with a fresh unique code; returns the code."""
+        name = name.strip()
+        if not name:
+            raise ValidationError("Please enter a username")
+        if self.client_exists(name):
+            raise ValidationError("Username already exists!")
+        payments = self.payment_entries(payment)
+        code = self.new_client_code()
+        self.model.add_client(name, code,
+                              location=location.strip() or "Unknown",
+                              joined=today(),
+                              computer=computer.strip() or "Not Registered",
+                              payments=payments)
+        return code
+
+    def client_details(self, name):
+        user = self.store.get_client(name)
+        if not user:
+            return None
+        paid, count = self.payment_total(user["id"])
+        history = [f"{format_amount(p['amount'])} - {format_paid(p['entry'], p['paid'])}"
+                   if p["amount"] is not None else p["entry"] for p in user["payments"]]
+        payments = "\n- ".join(history) if history else "No Payments"
+        return f"""
+Name: {name}
+Location: {user['location']}
+Joined: {user['joined']}
+Computer: {user['computer']}
+Services: {self.service_count(name)}
+Total Paid: {format_amount(paid)} ({count} payment{'s' if count != 1 else ''})
+Payment History:
+- {payments}
+"""
+
+    # ---------------- Payments ----------------
+    def payment_entries(self, text):
+        # A payment typed into a form, as the list of entries to store: it
+        # must start with an amount and is dated today unless it says otherwise
+        text = text.strip()
+        if not text:
+            return []
+        amount, paid = parse_payment(text)
+        if amount is None:
+            raise ValidationError("Payment must start with an amount, e.g. ₹500 - Jan 2025")
+        return [f"{format_amount(amount)} - {format_paid(text, paid or date.today().isoformat())}"]
+
+    def add_payment(self, client, amount, paid=""):
+        """Record a payment of `amount` (e.g. "1,250.50") on `paid` (default today)."""
+        client = client.strip()
+        if not self.client_exists(client):
+            raise ValidationError("Unknown client")
+        paise = parse_amount(amount)
+        if not paise:
+            raise ValidationError("Enter an amount such as 500 or 1,250.50")
+        day = parse_date(paid) if paid.strip() else date.today().isoformat()
+        if day is None:
+            raise ValidationError("Enter the date like 12 Jan 2025 or Jan 2025")
+        return self.model.add_payment(
+            client, f"{format_amount(paise)} - {format_date(day, month=is_month(paid))}")
+
+    # ---------------- Services ----------------
+    def add_service(self, client, task, status, location="", payment="", priority=0):
+        """Record a service; an unknown client is created on the spot."""
+        client, task, status = client.strip(), task.strip(), status.strip()
+        location, payment = location.strip(), payment.strip()
+        if not client or not task or not status:
+            raise ValidationError("Client, Task and Status are required")
+        if priority not in range(len(PRIORITIES)):
+            raise ValidationError(f"Priority must be one of {', '.join(PRIORITIES)}")
+        payments = self.payment_entries(payment)
+
+        with self.model.batch() as model:
+            service_id = model.add_service(client, task, status, priority)
+            if not self.client_exists(client):
+                model.add_client(client, self.new_client_code(),
+                                 location=location or "Unknown",
+                                 joined=today(),
+                                 payments=payments)
+            else:
+                if location:
+                    model.update_client_location(client, location)
+                for entry in payments:
+                    model.add_payment(client, entry)
+        return service_id
+
+    def update_service(self, service_id, client, task, status):
+        client, task, status = client.strip(), task.strip(), status.strip()
+        if not client or not task or not status:
+            raise ValidationError("Client, Task and Status are required")
+        with self.model.batch() as model:
+            service = self.store.get_service(service_id)
+            if service is None:
+                raise ValidationError("Service no longer exists")
+            model.update_service(service_id, client, task, status)
+            if service["worker_id"] is not None and status != IN_PROGRESS:
+                self._release(service, status)
+
+    def finish_service(self, service_id):
+        with self.model.batch() as model:
+            service = self.store.get_service(service_id)
+            if service is None:
+                return
+            model.set_service_status(service_id, FINISHED)
+            self._release(service, FINISHED)
+
+    def delete_service(self, service_id):
+        with self.model.batch() as model:
+            service = self.store.get_service(service_id)
+            if service is None:
+                return
+            model.delete_service(service_id)
+            self._release(service, None)
+
+    # Many services at once: one commit, one redraw of the views, however
+    # many rows are selected. Each returns how many services it changed.
+    def finish_services(self, service_ids):
+        return self.set_services_status(service_ids, FINISHED)
+
+    def set_services_status(self, service_ids, status):
+        fields = {"status": status}
+        if status == PENDING:
+            fields["worker_id"] = None
+        with self.model.batch() as model:
+            old = model.update_services(service_ids, **fields)
+            if status != IN_PROGRESS:
+                self._release_workers(s["worker_id"] for s in old)
+        return len(old)
+
+    def reassign_services(self, service_ids, worker_id):
+        """Put the services in a worker's hands, or back in the queue when worker_id is None."""
+        if worker_id is None:
+            return self.set_services_status(service_ids, PENDING)
+        with self.model.batch() as model:
+            worker = self.store.get_worker(worker_id)
+            if worker is None:
+                raise ValidationError("Worker no longer exists")
+            old = model.update_services(service_ids, status=IN_PROGRESS, worker_id=worker_id)
+            if old and worker["status"] != ON_TASK:
+                model.set_worker_status(worker_id, ON_TASK)
+            self._release_workers(s["worker_id"] for s in old if s["worker_id"] != worker_id)
+        return len(old)
+
+    def delete_services(self, service_ids):
+        with self.model.batch() as model:
+            old = model.delete_services(service_ids)
+            self._release_workers(s["worker_id"] for s in old)
+        return len(old)
+
+    def _release_workers(self, worker_ids):
+        # _release for many: workers left with no service become available
+        worker_ids = {w for w in worker_ids if w is not None}
+        if not worker_ids:
+            return
+        on_task = [w["id"] for w in self.store.workers_by_ids(sorted(worker_ids))
+                   if w["status"] == ON_TASK]
+        busy = self.store.busy_workers(on_task)
+        self.model.update_workers([w for w in on_task if w not in busy], status=AVAILABLE)
+
+    def _release(self, service, status):
+        # A service leaving In Progress frees its worker unless they are on
+        # another one; one sent back to Pending also forgets who had it.
+        worker_id = service["worker_id"]
+        if worker_id is None:
+            return
+        if status == PENDING:
+            self.model.set_service_worker(service["id"], None, PENDING)
+        worker = self.store.get_worker(worker_id)
+        if (worker is not None and worker["status"] == ON_TASK
+                and not self.store.worker_jobs(worker_id)):
+            self.model.set_worker_status(worker_id, AVAILABLE)
+
+    # ---------------- Dispatch ----------------
+    def dispatch(self, limit=None):
+        """Assign pending services to free workers; returns the (service id, worker id) pairs."""
+        dispatcher = self.dispatcher
+        assignments = []
+        try:
+            # Planned once the write lock is held and other consoles'
+            # changes are applied, so no one else can take the same service
+            # or worker in between
+            with self.model.batch() as model:
+                assignments = dispatcher.plan(limit)
+                for service_id, worker_id in assignments:
+                    model.set_service_worker(service_id, worker_id, IN_PROGRESS)
+                    model.set_worker_status(worker_id, ON_TASK)
+        except BaseException:
+            # plan() already took them off its queues
+            dispatcher.rebuild()
+            raise
+        return assignments
+
+    # ---------------- Workers ----------------
+    def add_worker(self, name, location, status):
+        name, location, status = name.strip(), location.strip(), status.strip()
+        if not name or not location or not status:
+            raise ValidationError("Name, Location, and Status are required")
+        if self.worker_exists(name):
+            raise ValidationError("Worker name already exists!")
+        return self.model.add_worker(name, location, status)
+
+    def update_worker(self, worker_id, name, location, status):
+        worker = self.store.get_worker(worker_id)
+        if worker is None:
+            raise ValidationError("Worker no longer exists")
+        name = name.strip()
+        if name != worker["name"] and self.worker_exists(name):
+            raise ValidationError("Worker name already exists!")
+        self.model.update_worker(worker_id, name, location.strip(), status.strip())
+
+    def delete_worker(self, worker_id):
+        # Whatever the worker was on goes back to the queue
+        with self.model.batch() as model:
+            for service_id in self.store.worker_jobs(worker_id):
+                model.set_service_worker(service_id, None, PENDING)
+            model.delete_worker(worker_id)
+
+    def delete_workers(self, worker_ids):
+        worker_ids = list(worker_ids)
+        with self.model.batch() as model:
+            model.update_services(self.store.jobs_of(worker_ids), status=PENDING, worker_id=None)
+            return len(model.delete_workers(worker_ids))
+
+    def set_workers_status(self, worker_ids, status):
+        status = status.strip()
+        if not status:
+            raise ValidationError("Status is required")
+        with self.model.batch() as model:
+            changed = [w["id"] for w in self.store.workers_by_ids(worker_ids)
+                       if w["status"] != status]
+            model.update_workers(changed, status=status)
+        return len(changed)
+
+    def set_worker_statuses(self, statuses):
+        """Apply {worker name: status} in one batch; returns how many workers changed."""
+        reported = {}
+        for name, status in statuses.items():
+            worker_id = self.worker_id(name)
+            if worker_id is not None and status:
+                reported[worker_id] = status
+        # A quick look first, so a tick of unchanged heartbeats never takes
+        # the write lock; the rows written are read again inside the batch,
+        # where another console's change can no longer slip in between
+        if all(w["status"] == reported[w["id"]] for w in self.store.workers_by_ids(reported)):
+            return 0
+        with self.model.batch() as model:
+            changed = [w for w in self.store.workers_by_ids(reported)
+                       if w["status"] != reported[w["id"]]]
+            for w in changed:
+                model.update_worker(w["id"], w["name"], w["location"], reported[w["id"]])
+        return len(changed)
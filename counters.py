@@ -0,0 +1,70 @@
+from collections import Counter
+
+from model import INSERT, DELETE, RESET, FINISHED, Subscriber
+
+COUNTED_TABLES = ("clients", "services", "orders", "workers")
+
+
+# ------------------- Dashboard Counters -------------------
+# Running totals for the dashboard. They are read from the store once and
+# then adjusted by every model change event, so reading them is free no
+# matter how many records there are.
+class Counters(Subscriber):
+    HANDLERS = {table: "_on_change" for table in COUNTED_TABLES}
+
+    def __init__(self, model):
+        self.model = model
+        self.totals = Counter()
+        self.services_by_status = Counter()
+        self.workers_by_status = Counter()
+
+        for table in COUNTED_TABLES:
+            self._load(table)
+        self.attach(model)
+
+    def _load(self, table):
+        store = self.model.store
+        self.totals[table] = store.count(table)
+        if table == "services":
+            self.services_by_status = Counter(store.count_by("services", "status"))
+        elif table == "workers":
+            self.workers_by_status = Counter(store.count_by("workers", "status"))
+
+    # ---------------- Readings ----------------
+    def total(self, table):
+        return self.totals[table]
+
+    def active_services(self):
+        return self.totals["services"] - self.services_by_status[FINISHED]
+
+    def finished_services(self):
+        return self.services_by_status[FINISHED]
+
+    def pending_orders(self):
+        # Orders have no status yet; every order on file is still pending
+        return self.totals["orders"]
+
+    def workers_with_status(self, status):
+        return self.workers_by_status[status]
+
+    # ---------------- Change handler ----------------
+    def _on_change(self, change):
+        table = change.table
+        if change.kind == RESET:
+            self._load(table)
+            return
+        if change.kind == INSERT:
+            self.totals[table] += 1
+        elif change.kind == DELETE:
+            self.totals[table] -= 1
+
+        by_status = {"services": self.services_by_status,
+                     "workers": self.workers_by_status}.get(table)
+        if by_status is None:
+            return
+        if change.old is not None:
+            by_status[change.old["status"]] -= 1
+            if by_status[change.old["status"]] <= 0:
+                del by_status[change.old["status"]]
+        if change.record is not None:
+            by_status[change.record["status"]] += 1
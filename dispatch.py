@@ -0,0 +1,205 @@
+import heapq
+from collections import defaultdict
+
+from model import AVAILABLE, IN_PROGRESS, PENDING, RESET, Subscriber
+from records import LOCATIONS
+
+# Urgency of a service, lowest first; a higher priority is dispatched first
+PRIORITIES = ("Normal", "High", "Urgent")
+
+
+# ------------------- Dispatcher -------------------
+# Matches pending services to available workers. Both sides are held in
+# memory and kept current from model change events:
+#
+#   pending    service id -> (priority, location, client)
+#   queues     location   -> heap of (-priority, service id)
+#   queue      heap of (-priority, service id) over every location
+#   available  location   -> {worker id, ...}  longest free first
+#   free       worker id  -> location          longest free first
+#   jobs       worker id  -> service id it is working on
+#
+# A service's location is its client's. Within a priority the lower id,
+# i.e. the older service, goes first. Heap entries are never removed in
+# place: one whose service was assigned or changed is skipped when it
+# reaches the top, and the heaps are rebuilt once stale entries clearly
+# outnumber live ones.
+#
+# plan() only decides and records the assignments; the console applies
+# them through the model, whose events then agree with what is recorded.
+class Dispatcher(Subscriber):
+    HANDLERS = {"services": "_on_service", "workers": "_on_worker", "clients": "_on_client"}
+
+    def __init__(self, model):
+        self.model = model
+        self.version = 0
+        self._load_services()
+        self._load_workers()
+        self.attach(model)
+
+    def _load_services(self):
+        self.pending = {}
+        for service_id, priority, location, client in self.model.store.dispatch_queue():
+            self.pending[service_id] = (priority, LOCATIONS(location), client)
+        self._rebuild_queues()
+        self.jobs = dict(self.model.store.assignments())
+
+    def _load_workers(self):
+        self.available = defaultdict(dict)
+        self.free = {}
+        for worker_id, location, status in self.model.store.scan(
+                "workers", "id", "location", "status"):
+            if status == AVAILABLE:
+                self._free(worker_id, LOCATIONS(location))
+
+    def rebuild(self):
+        self._load_services()
+        self._load_workers()
+        self.version += 1
+
+    def _rebuild_queues(self):
+        self.queues = defaultdict(list)
+        self.queue = []
+        for service_id, (priority, location, client) in self.pending.items():
+            self.queues[location].append((-priority, service_id))
+            self.queue.append((-priority, service_id))
+        for heap in self.queues.values():
+            heapq.heapify(heap)
+        heapq.heapify(self.queue)
+        self._entries = 2 * len(self.pending)
+
+    # ---------------- Queues ----------------
+    def _push(self, service_id, priority, location, client):
+        self.pending[service_id] = (priority, location, client)
+        entry = (-priority, service_id)
+        heapq.heappush(self.queues[location], entry)
+        heapq.heappush(self.queue, entry)
+        self._entries += 2
+        self._compact()
+
+    def _compact(self):
+        if self._entries > 4 * len(self.pending) + 1024:
+            self._rebuild_queues()
+
+    def _pop(self, heap, location=None):
+        # Most urgent live service in heap, taken out of pending
+        pending = self.pending
+        while heap:
+            priority, service_id = heapq.heappop(heap)
+            self._entries -= 1
+            queued = pending.get(service_id)
+            if (queued is not None and queued[0] == -priority
+                    and (location is None or queued[1] == location)):
+                del pending[service_id]
+                return service_id
+        return None
+
+    def _free(self, worker_id, location):
+        self.free[worker_id] = location
+        self.available[location][worker_id] = None
+
+    def _take(self, worker_id):
+        location = self.free.pop(worker_id, None)
+        if location is None:
+            return
+        bucket = self.available[location]
+        bucket.pop(worker_id, None)
+        if not bucket:
+            del self.available[location]
+
+    # ---------------- Dispatching ----------------
+    def ready(self):
+        """True when plan() would assign something."""
+        return bool(self.pending) and bool(self.free)
+
+    def plan(self, limit=None):
+        """[(service id, worker id)] to assign now, at most limit of them."""
+        assignments = []
+
+        def room():
+            return limit is None or len(assignments) < limit
+
+        # Each location with free workers first takes its own most urgent
+        # services. Only then do services elsewhere get whoever has been
+        # free longest, so a worker is never sent away from work at hand.
+        for location in [loc for loc in self.available if loc in self.queues]:
+            workers, heap = self.available[location], self.queues[location]
+            while workers and room():
+                service_id = self._pop(heap, location)
+                if service_id is None:
+                    break
+                worker_id = next(iter(workers))
+                self._take(worker_id)
+                assignments.append((service_id, worker_id))
+            if not heap:
+                del self.queues[location]
+        while self.free and room():
+            service_id = self._pop(self.queue)
+            if service_id is None:
+                break
+            worker_id = next(iter(self.free))
+            self._take(worker_id)
+            assignments.append((service_id, worker_id))
+
+        for service_id, worker_id in assignments:
+            self.jobs[worker_id] = service_id
+        if assignments:
+            self.version += 1
+            self._compact()
+        return assignments
+
+    def job_for(self, worker_id):
+        return self.jobs.get(worker_id)
+
+    # ---------------- Change handlers ----------------
+    def _on_service(self, change):
+        self.version += 1
+        if change.kind == RESET:
+            self._load_services()
+            return
+        old, new = change.old, change.record
+        if (old is not None and new is not None and old["status"] == new["status"] == PENDING
+                and old["priority"] == new["priority"] and old["client"] == new["client"]):
+            return
+        if old is not None:
+            self.pending.pop(change.id, None)
+            if old["worker_id"] is not None and self.jobs.get(old["worker_id"]) == change.id:
+                del self.jobs[old["worker_id"]]
+        if new is None:
+            return
+        if new["status"] == PENDING:
+            location = self.model.store.client_location(new["client"]) or "Unknown"
+            self._push(change.id, new["priority"], LOCATIONS(location), new["client"])
+        elif new["status"] == IN_PROGRESS and new["worker_id"] is not None:
+            self.jobs[new["worker_id"]] = change.id
+
+    def _on_worker(self, change):
+        self.version += 1
+        if change.kind == RESET:
+            self._load_workers()
+            return
+        old, new = change.old, change.record
+        if (old is not None and new is not None and old["status"] == new["status"]
+                and old["location"] == new["location"]):
+            return
+        if old is not None:
+            self._take(change.id)
+            if new is None:
+                self.jobs.pop(change.id, None)
+        if new is not None and new["status"] == AVAILABLE:
+            self._free(change.id, new["location"])
+
+    def _on_client(self, change):
+        if change.kind == RESET:
+            self._load_services()
+            self.version += 1
+            return
+        old, new = change.old, change.record
+        if old is None or new is None or old["location"] == new["location"]:
+            return
+        # Pending services follow their client to the new location
+        name, location = new["name"], LOCATIONS(new["location"])
+        for service_id, (priority, _, client) in list(self.pending.items()):
+            if client == name:
+                self._push(service_id, priority, location, client)
+        self.version += 1
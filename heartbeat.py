@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+from model import AVAILABLE, ON_TASK, RESET
+from prober import ONLINE
+
+# Loopback only unless widened: agents on other machines need
+# YESWAY_HEARTBEAT_HOST=0.0.0.0 (or the switch in Diagnostics)
+LOOPBACK = "127.0.0.1"
+ALL_INTERFACES = "0.0.0.0"
+DEFAULT_HOST = os.environ.get("YESWAY_HEARTBEAT_HOST", LOOPBACK)
+DEFAULT_PORT = int(os.environ.get("YESWAY_HEARTBEAT_PORT", "47800"))
+
+# Longest accepted heartbeat line/datagram; anything bigger is dropped
+MAX_MESSAGE = 4096
+
+CLIENT = "client"
+WORKER = "worker"
+
+IDLE = "Idle"
+AWAY = "Away"
+# Statuses an agent may report. A worker's status is written to its record,
+# so it must be one the dispatcher and the views understand.
+STATUSES = {
+    CLIENT: frozenset((ONLINE, IDLE, AWAY)),
+    WORKER: frozenset((AVAILABLE, ON_TASK, AWAY)),
+}
+
+
+# ------------------- Heartbeats -------------------
+# Agents send one JSON object per line (TCP) or per datagram (UDP):
+#
+#   {"code": "ALI12345", "status": "Online"}
+#
+# The code is the client's or worker's unique code; anything else is
+# rejected. Status is optional, but when given must be one of STATUSES for
+# that kind of sender, or the whole heartbeat is rejected.
+class Heartbeat:
+    __slots__ = ("kind", "name", "status", "seen")
+
+    def __init__(self, kind, name, status, seen):
+        self.kind = kind
+        self.name = name
+        self.status = status
+        self.seen = seen
+
+
+class _Datagrams(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        if len(data) <= MAX_MESSAGE:
+            self.server.receive(data)
+
+
+# ------------------- Heartbeat Server -------------------
+# Runs on the background loop and only records the latest heartbeat per
+# sender. The Tk thread calls take() a few times a second and applies the
+# coalesced batch, so a flood of heartbeats costs the UI one small batch
+# per frame rather than one update per message.
+class HeartbeatServer:
+    def __init__(self, background, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.background = background
+        self.host = host
+        self.port = port
+        self.model = None
+        self.codes = {}
+        self.presence = {}
+        self.error = None
+
+        self.received = 0
+        self.rejected = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._tcp = None
+        self._udp = None
+
+    # ---------------- Authentication ----------------
+    def watch(self, model):
+        """Load every client/worker code and keep the map current from model events."""
+        self.model = model
+        self._load(CLIENT)
+        self._load(WORKER)
+        model.subscribe("clients", lambda change: self._on_change(CLIENT, change))
+        model.subscribe("workers", lambda change: self._on_change(WORKER, change))
+
+    # receive() looks codes up on the background thread, so the map is only
+    # changed, or swapped for a reloaded one, under _lock.
+    def _load(self, kind):
+        table = "clients" if kind == CLIENT else "workers"
+        loaded = {code: (kind, name) for name, code in self.model.store.scan(table, "name", "code")}
+        with self._lock:
+            codes = {code: sender for code, sender in self.codes.items() if sender[0] != kind}
+            codes.update(loaded)
+            self.codes = codes
+
+    def _on_change(self, kind, change):
+        if change.kind == RESET:
+            self._load(kind)
+            return
+        old, new = change.old, change.record
+        if (old is not None and new is not None
+                and old["code"] == new["code"] and old["name"] == new["name"]):
+            return  # a status or location change; the sender is the same
+        with self._lock:
+            if old is not None:
+                self.codes.pop(old["code"], None)
+            if new is not None:
+                self.codes[new["code"]] = (kind, new["name"])
+
+    # ---------------- Network ----------------
+    def start(self):
+        return self.background.submit(self._start())
+
+    def restart(self, port, host=None):
+        """Stop listening and listen again on port (and host); the future says whether it worked."""
+        async def restart():
+            await self._close()
+            self.port = port
+            if host is not None:
+                self.host = host
+            return await self._start()
+        return self.background.submit(restart())
+
+    @property
+    def listening(self):
+        return self._tcp is not None
+
+    async def _start(self):
+        loop = asyncio.get_running_loop()
+        self.error = None
+        try:
+            self._tcp = await asyncio.start_server(
+                self._on_connection, self.host, self.port, limit=MAX_MESSAGE)
+            self._udp, _ = await loop.create_datagram_endpoint(
+                lambda: _Datagrams(self), local_addr=(self.host, self.port))
+        except OSError as exc:
+            self.error = str(exc)
+            await self._close()
+            return False
+        return True
+
+    def stop(self):
+        return self.background.submit(self._close())
+
+    async def _close(self):
+        if self._tcp is not None:
+            self._tcp.close()
+            await self._tcp.wait_closed()
+        if self._udp is not None:
+            self._udp.close()
+        self._tcp = self._udp = None
+
+    async def _on_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.receive(line)
+        except (ConnectionError, ValueError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    def receive(self, data):
+        self.received += 1
+        try:
+            message = json.loads(data)
+            with self._lock:
+                kind, name = self.codes[message["code"]]
+            status = message.get("status") or None
+            if status is not None and status not in STATUSES[kind]:
+                raise ValueError(status)
+        except (ValueError, KeyError, TypeError):
+            self.rejected += 1
+            return
+        beat = Heartbeat(kind, name, status, time.time())
+        with self._lock:
+            self._pending[(kind, name)] = beat
+
+    # ---------------- Tk side ----------------
+    def take(self):
+        """Latest heartbeat per sender since the last call."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        beats = list(pending.values())
+        for beat in beats:
+            self.presence[(beat.kind, beat.name)] = beat
+        return beats
+
+    def last_seen(self, kind, name):
+        return self.presence.get((kind, name))
+
+
+# ------------------- Load Generator -------------------
+async def generate_load(host, port, codes, connections=50, interval=1.0,
+                        duration=10.0, udp=False, status=ONLINE):
+    """Send one heartbeat per code every `interval` seconds; returns messages sent."""
+    codes = list(codes)
+    groups = [codes[i::connections] for i in range(connections)]
+    deadline = time.monotonic() + duration
+    sent = 0
+
+    async def tcp_sender(group):
+        nonlocal sent
+        reader, writer = await asyncio.open_connection(host, port)
+        lines = [json.dumps({"code": code, "status": status}).encode() + b"\n"
+                 for code in group]
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            writer.writelines(lines)
+            await writer.drain()
+            sent += len(lines)
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+        writer.close()
+
+    async def udp_sender(group):
+        nonlocal sent
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        packets = [json.dumps({"code": code, "status": status}).encode() for code in group]
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            for packet in packets:
+                sock.sendto(packet, (host, port))
+            sent += len(packets)
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+        sock.close()
+
+    sender = udp_sender if udp else tcp_sender
+    await asyncio.gather(*(sender(group) for group in groups if group))
+    return sent
+
+
+def _bench(args):
+    # Server on a background loop, a stand-in for the Tk flush on a timer
+    # thread, and the load generator on this thread.
+    from background import BackgroundLoop
+
+    codes = [f"AGENT{i:06d}" for i in range(args.agents)]
+    server = HeartbeatServer(BackgroundLoop(), "127.0.0.1", args.port)
+    server.codes = {code: (CLIENT, code) for code in codes}
+    if not server.start().result():
+        raise SystemExit(f"Cannot listen on port {args.port}: {server.error}")
+
+    flushes, flushed = [], 0
+    stop = threading.Event()
+
+    def flusher():
+        nonlocal flushed
+        while not stop.wait(args.flush_ms / 1000):
+            started = time.perf_counter()
+            flushed += len(server.take())
+            flushes.append(time.perf_counter() - started)
+
+    thread = threading.Thread(target=flusher, daemon=True)
+    thread.start()
+    started = time.perf_counter()
+    sent = asyncio.run(generate_load("127.0.0.1", args.port, codes, args.connections,
+                                     args.interval, args.seconds, args.udp))
+    elapsed = time.perf_counter() - started
+    time.sleep(args.flush_ms / 1000 * 2)
+    stop.set()
+    thread.join()
+
+    print(f"sent      {sent} heartbeats in {elapsed:.2f}s ({sent / elapsed:,.0f}/s)")
+    print(f"received  {server.received} ({server.received / elapsed:,.0f}/s), "
+          f"rejected {server.rejected}")
+    print(f"flushes   {len(flushes)}, {flushed} coalesced updates, "
+          f"max flush {max(flushes, default=0) * 1000:.2f} ms")
+
+
+def _load(args):
+    with open(args.codes_file, encoding="utf-8") as f:
+        codes = [line.strip() for line in f if line.strip()]
+    sent = asyncio.run(generate_load(args.host, args.port, codes, args.connections,
+                                     args.interval, args.seconds, args.udp, args.status))
+    print(f"sent {sent} heartbeats")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Heartbeat load generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("bench", help="measure local ingestion throughput")
+    bench.add_argument("--agents", type=int, default=5000)
+    bench.add_argument("--seconds", type=float, default=5.0)
+    bench.add_argument("--interval", type=float, default=0.1)
+    bench.add_argument("--connections", type=int, default=50)
+    bench.add_argument("--flush-ms", type=int, default=250)
+    bench.add_argument("--port", type=int, default=DEFAULT_PORT + 1)
+    bench.add_argument("--udp", action="store_true")
+    bench.set_defaults(run=_bench)
+
+    load = commands.add_parser("load", help="send heartbeats to a running console")
+    load.add_argument("codes_file", help="file with one client/worker code per line")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load.add_argument("--seconds", type=float, default=10.0)
+    load.add_argument("--interval", type=float, default=1.0)
+    load.add_argument("--connections", type=int, default=50)
+    load.add_argument("--udp", action="store_true")
+    load.add_argument("--status", default=ONLINE,
+                      help=f"status to report (clients: {', '.join(sorted(STATUSES[CLIENT]))}; "
+                           f"workers: {', '.join(sorted(STATUSES[WORKER]))})")
+    load.set_defaults(run=_load)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from collections import Counter, defaultdict
+
+from model import RESET, Subscriber
+from records import LOCATIONS, STATUSES
+
+
+# ------------------- Secondary Indexes -------------------
+# In-memory lookup tables kept in step with the data model:
+#
+#   client_by_name       name     -> client id
+#   worker_by_name       name     -> worker id
+#   worker_names         worker id -> name
+#   service_counts       client   -> number of services
+#   services_by_status   status   -> {service id, ...}
+#   workers_by_location  location -> {worker id, ...}
+#
+# The grouped indexes use dicts as insertion-ordered sets, so a filtered
+# view can page through them and a record that (re)joins a group always
+# appears at the end, just like a new row in the unfiltered view. Group
+# keys are interned through the shared status/location vocabularies.
+#
+# Only what a view pages through or a hot path looks up is kept here:
+# per-client service ids were only ever counted, and client codes are
+# only checked when minting a new one, which the store's unique index
+# answers just as well. At 500k records each costs over 60 MB.
+class Indexes(Subscriber):
+    HANDLERS = {"clients": "_on_client", "services": "_on_service", "workers": "_on_worker"}
+
+    def __init__(self, model):
+        self.model = model
+        self.client_by_name = {}
+        self.worker_by_name = {}
+        self.worker_names = {}
+        self.service_counts = Counter()
+        self.services_by_status = defaultdict(dict)
+        self.workers_by_location = defaultdict(dict)
+
+        self.rebuild()
+        self.attach(model)
+
+    def rebuild(self):
+        self._load_clients()
+        self._load_services()
+        self._load_workers()
+
+    def _load_clients(self):
+        # Refilled in place like the other maps: views hold on to them
+        self.client_by_name.clear()
+        self.client_by_name.update(self.model.store.scan("clients", "name", "id"))
+
+    def _load_services(self):
+        self.service_counts.clear()
+        self.services_by_status.clear()
+        for service_id, client, status in self.model.store.scan("services", "id", "client", "status"):
+            self.service_counts[client] += 1
+            self.services_by_status[STATUSES(status)][service_id] = None
+
+    def _load_workers(self):
+        self.worker_by_name.clear()
+        self.worker_names.clear()
+        self.workers_by_location.clear()
+        for worker_id, name, location in self.model.store.scan("workers", "id", "name", "location"):
+            self.worker_by_name[name] = worker_id
+            self.worker_names[worker_id] = name
+            self.workers_by_location[LOCATIONS(location)][worker_id] = None
+
+    # ---------------- Lookups ----------------
+    def has_client(self, name):
+        return name in self.client_by_name
+
+    def has_worker(self, name):
+        return name in self.worker_by_name
+
+    def worker_name(self, worker_id):
+        return self.worker_names.get(worker_id)
+
+    def service_count(self, client):
+        return self.service_counts[client]
+
+    def services_with_status(self, status):
+        return self.services_by_status.get(status, {})
+
+    def workers_at(self, location):
+        return self.workers_by_location.get(location, {})
+
+    def statuses(self):
+        return sorted(self.services_by_status)
+
+    def locations(self):
+        return sorted(self.workers_by_location)
+
+    # ---------------- Change handlers ----------------
+    def _on_client(self, change):
+        if change.kind == RESET:
+            self._load_clients()
+            return
+        if change.old is not None:
+            self.client_by_name.pop(change.old["name"], None)
+        if change.record is not None:
+            self.client_by_name[change.record["name"]] = change.id
+
+    def _on_service(self, change):
+        if change.kind == RESET:
+            self._load_services()
+            return
+        counts = self.service_counts
+        if change.old is not None:
+            counts[change.old["client"]] -= 1
+            if counts[change.old["client"]] <= 0:
+                del counts[change.old["client"]]
+        if change.record is not None:
+            counts[change.record["client"]] += 1
+        _move(self.services_by_status, change, "status")
+
+    def _on_worker(self, change):
+        if change.kind == RESET:
+            self._load_workers()
+            return
+        if change.old is not None:
+            self.worker_by_name.pop(change.old["name"], None)
+            self.worker_names.pop(change.id, None)
+        if change.record is not None:
+            self.worker_by_name[change.record["name"]] = change.id
+            self.worker_names[change.id] = change.record["name"]
+        _move(self.workers_by_location, change, "location")
+
+
+def _move(groups, change, field):
+    # Only touch a group when the record's key actually changed, so an
+    # unrelated edit keeps the record's position inside its group.
+    old = change.old[field] if change.old is not None else None
+    new = change.record[field] if change.record is not None else None
+    if change.old is not None and change.record is not None and old == new:
+        return
+    if change.old is not None:
+        group = groups.get(old)
+        if group is not None:
+            group.pop(change.id, None)
+            if not group:
+                del groups[old]
+    if change.record is not None:
+        groups[new][change.id] = None
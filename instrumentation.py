@@ -0,0 +1,223 @@
+import functools
+import http.server
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("YESWAY_METRICS", "") not in ("", "0")
+HTTP_PORT = int(os.environ.get("YESWAY_METRICS_PORT", "0"))
+TEXTFILE = os.environ.get("YESWAY_METRICS_FILE", "")
+
+# Metric names, with the label each one is broken down by
+VIEW_BUILD = "yesway_view_build_seconds"
+VIEW_REFRESH = "yesway_view_refresh_seconds"
+HANDLER = "yesway_handler_seconds"
+TIMER = "yesway_timer_seconds"
+MAINLOOP_LAG = "yesway_mainloop_lag_seconds"
+
+DEFINITIONS = {
+    VIEW_BUILD: ("view", "Time to build a view the first time it is shown"),
+    VIEW_REFRESH: ("view", "Time to refresh a stale cached view"),
+    HANDLER: ("handler", "Latency of button commands"),
+    TIMER: ("timer", "Time spent in periodic after() callbacks"),
+    MAINLOOP_LAG: (None, "How late after() callbacks run on the Tk mainloop"),
+}
+
+# Seconds; upper bounds of the histogram buckets (+Inf is implied)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ------------------- Histogram -------------------
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, capped
+        # by the largest value seen; good enough to spot a slow path
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+# ------------------- Metrics -------------------
+# Histograms keyed by (metric name, label value). Everything is recorded
+# on the Tk thread; the lock only guards against the HTTP exporter reading
+# a series while it is being created. When disabled, timed()/wrap() cost
+# one attribute check per call.
+class Metrics:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, label=None):
+        key = (name, label)
+        histogram = self._series.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._series.setdefault(key, Histogram())
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, name, label=None):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, label)
+
+    def wrap(self, name, label, func):
+        """func, timed under (name, label) whenever metrics are enabled."""
+        if getattr(func, "instrumented", False):
+            return func
+
+        @functools.wraps(func)
+        def timed_call(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(name, time.perf_counter() - started, label)
+
+        timed_call.instrumented = True
+        return timed_call
+
+    def series(self):
+        with self._lock:
+            return sorted(self._series.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        current = None
+        for (name, label), h in self.series():
+            label_name, help_text = DEFINITIONS.get(name, ("label", name))
+            if name != current:
+                current = name
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+            base = f'{label_name}="{_escape(label)}"' if label is not None else ""
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), h.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = f'{base},le="{le}"' if base else f'le="{le}"'
+                lines.append(f"{name}_bucket{{{labels}}} {cumulative}")
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{name}_sum{suffix} {h.sum:.6f}")
+            lines.append(f"{name}_count{suffix} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ------------------- Mainloop Lag -------------------
+# Asks the Tk loop to call back every `interval_ms` and records how late
+# each call arrives. Anything that blocks the mainloop (a slow handler, a
+# synchronous query) shows up here even when nothing else is timed. Runs
+# only while metrics are enabled.
+class LagMonitor:
+    def __init__(self, widget, metrics, interval_ms=100):
+        self.widget = widget
+        self.metrics = metrics
+        self.interval_ms = interval_ms
+        self.last = 0.0
+        self._expected = None
+        self._job = None
+
+    def start(self):
+        if self._job is None:
+            self._schedule(time.perf_counter())
+
+    def _schedule(self, now):
+        self._expected = now + self.interval_ms / 1000
+        self._job = self.widget.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.last = max(0.0, now - self._expected)
+        if not self.metrics.enabled:
+            self._job = None
+            return
+        self.metrics.observe(MAINLOOP_LAG, self.last)
+        self._schedule(now)
+
+
+# ------------------- Exporters -------------------
+def write_textfile(metrics, path):
+    # Written to a temp file and renamed, so a scraper never reads half a file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(metrics.render())
+    os.replace(tmp, path)
+
+
+class MetricsServer:
+    """GET /metrics on a local port, served from a daemon thread."""
+
+    def __init__(self, metrics, port=HTTP_PORT, host="127.0.0.1"):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="yesway-metrics",
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,186 @@
+import gc
+import hashlib
+import hmac
+import json
+import os
+import pickle
+
+from model import DELETE, INSERT, UPDATE, RESET, Change
+from records import RECORDS
+
+# Catching up on more entries than this re-reads the tables they touch
+# instead of replaying them one by one
+SYNC_RESET = int(os.environ.get("YESWAY_SYNC_RESET", "2000"))
+
+# Entries kept when the journal is compacted; a console further behind
+# than this re-reads everything
+JOURNAL_KEEP = int(os.environ.get("YESWAY_JOURNAL_KEEP", "100000"))
+
+# Bumped whenever a pickled structure changes shape, so an old snapshot
+# is ignored rather than loaded into code that no longer matches it
+SNAPSHOT_FORMAT = 2
+
+
+# ------------------- Change Journal -------------------
+# Every write to a record table is appended to the store's journal (see
+# storage.py) by the connection that made it. A console has already
+# applied its own writes through its model; sync() brings it up to date
+# with everyone else's by replaying their entries, in journal order, as
+# ordinary change events. The model also syncs right after taking the
+# write lock, so a console's own write never overtakes one it has not seen.
+#
+# cursor is the last journal entry this console's state reflects.
+class Journal:
+    def __init__(self, model, cursor=0):
+        self.model = model
+        self.cursor = cursor
+        self._syncing = False
+        model.catch_up = self.sync
+
+    def sync(self):
+        """Apply other consoles' changes since the last sync; returns how many entries were read."""
+        if self._syncing:
+            # A subscriber reading the store while we replay: it already
+            # sees the head we are catching up to
+            return 0
+        store = self.model.store
+        # One read transaction, so the head and the entries agree even if
+        # someone appends meanwhile
+        with store.transaction():
+            head = store.journal_head()
+            if head <= self.cursor:
+                return 0
+            self._syncing = True
+            try:
+                start = store.journal_start()
+                if start is None or start > self.cursor + 1:
+                    # Entries we never saw were compacted away
+                    self._reset(RECORDS)
+                elif head - self.cursor > SYNC_RESET:
+                    self._catch_up(head)
+                else:
+                    self._replay(store.journal_since(self.cursor, head))
+            finally:
+                self._syncing = False
+            read, self.cursor = head - self.cursor, head
+        return read
+
+    def _catch_up(self, head):
+        # Far behind: re-read the tables others changed. A gap that is
+        # mostly this console's own batch is replayed, which skips it.
+        store = self.model.store
+        tables = store.journal_tables(self.cursor, head, store.origin)
+        if sum(tables.values()) > SYNC_RESET:
+            self._reset(tables)
+        else:
+            self._replay(store.journal_since(self.cursor, head))
+
+    def _reset(self, tables):
+        self.model.publish([Change(table, RESET, None) for table in tables])
+
+    def _replay(self, entries):
+        # Published together, so views redraw once for the lot
+        changes, origin = [], self.model.store.origin
+        publish = changes.append
+        reset, paid = set(), set()
+        for seq, table, kind, record_id, old, new, entry_origin in entries:
+            if entry_origin == origin or table in reset:
+                continue
+            if kind == RESET:
+                # Later entries for the table are already in what it re-reads
+                reset.add(table)
+                publish(Change(table, RESET, None))
+                continue
+            record = RECORDS[table]
+            change = Change(table, kind, record_id,
+                            record(**json.loads(new)) if kind != DELETE else None,
+                            record(**json.loads(old)) if kind != INSERT else None)
+            publish(change)
+            if table == "payments" and change.record is not None:
+                paid.add(change.record.client_id)
+
+        # A payment changes its client's row in the views (total paid), as
+        # it does when this console records one
+        if paid and "clients" not in reset:
+            for client in self.model.store.clients_by_ids(sorted(paid)):
+                publish(Change("clients", UPDATE, client.id, client, client))
+        self.model.publish(changes)
+
+
+# ------------------- Snapshots -------------------
+# The console's in-memory structures pickled together with the journal
+# position they reflect. Loading one and replaying the journal tail since
+# then is much cheaper than scanning every table again. A snapshot is only
+# trusted for the database it came from (epoch), at the same schema
+# version, and while the journal still holds every entry after it.
+#
+# Unpickling runs whatever the file says, so a snapshot is only unpickled
+# if its SHA-256 matches the digest saved in the database along with it:
+# a file merely dropped next to the database is never loaded.
+def snapshot_path(store):
+    if store.path == ":memory:":
+        return None
+    return store.path + ".snapshot"
+
+
+def save_snapshot(store, seq, parts):
+    """Write {name: structure} as the snapshot for journal position seq."""
+    path = snapshot_path(store)
+    if path is None:
+        return
+    state = {
+        "format": SNAPSHOT_FORMAT,
+        "epoch": store.journal_epoch(),
+        "version": store.user_version(),
+        "seq": seq,
+        "parts": parts,
+    }
+    data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    # Several consoles may save at once; each replaces the file whole. If
+    # their digests and files cross, the mismatch only costs a full load.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    store.set_snapshot_digest(hashlib.sha256(data).hexdigest())
+
+
+def load_snapshot(store):
+    """(seq, {name: structure}) from a usable snapshot, else None."""
+    path = snapshot_path(store)
+    digest = store.snapshot_digest()
+    if path is None or digest is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not hmac.compare_digest(hashlib.sha256(data).hexdigest(), digest):
+        return None
+    # As when building them, the cyclic GC has nothing to find among the
+    # objects being loaded and would only slow it down.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        state = pickle.loads(data)
+    except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    finally:
+        if enabled:
+            gc.enable()
+    if (not isinstance(state, dict) or state.get("format") != SNAPSHOT_FORMAT
+            or state["epoch"] != store.journal_epoch()
+            or state["version"] != store.user_version()):
+        return None
+    start = store.journal_start()
+    seq = state["seq"]
+    if seq > store.journal_head() or (start is not None and start > seq + 1):
+        return None
+    if start is None and seq < store.journal_head():
+        return None
+    return seq, state["parts"]
@@ -0,0 +1,185 @@
+import heapq
+import re
+from array import array
+from collections import defaultdict
+from datetime import date, datetime
+from functools import lru_cache
+
+from model import INSERT, RESET, Subscriber
+
+# "₹500 - Jan 2025", "Rs. 1,250.50 - 12 Jan 2025", "800", ...
+PAYMENT = re.compile(r"\s*(?:₹|rs\.?|inr)?\s*(\d[\d,]*(?:\.\d{1,2})?)\s*(?:-\s*)?(.*)$", re.I)
+DATE_FORMATS = ("%b %Y", "%d %b %Y", "%B %Y", "%d %B %Y", "%Y-%m-%d", "%d/%m/%Y")
+MONTH_FORMATS = ("%b %Y", "%B %Y")
+
+
+# ------------------- Parsing / Formatting -------------------
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    """ISO date for the formats people type ("Jan 2025" means the 1st), else None."""
+    text = text.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def is_month(text):
+    """True for a date given only to the month ("Jan 2025"), which parse_date files under the 1st."""
+    text = text.strip()
+    for fmt in MONTH_FORMATS:
+        try:
+            datetime.strptime(text, fmt)
+            return True
+        except ValueError:
+            continue
+    return False
+
+
+def parse_amount(text):
+    """Integer paise from "₹1,250.50"-style text, else None."""
+    match = PAYMENT.match(text)
+    if not match or match.group(2).strip():
+        return None
+    return _paise(match.group(1))
+
+
+def parse_payment(entry, default_date=None):
+    """(paise, ISO date) for a payment entry; (None, None) when it has no amount."""
+    match = PAYMENT.match(entry)
+    if not match:
+        return None, None
+    return _paise(match.group(1)), parse_date(match.group(2)) or default_date
+
+
+def _paise(number):
+    rupees, _, fraction = number.replace(",", "").partition(".")
+    return int(rupees) * 100 + int(fraction.ljust(2, "0") or 0)
+
+
+def format_amount(paise):
+    rupees, fraction = divmod(paise, 100)
+    return f"₹{rupees:,}" + (f".{fraction:02}" if fraction else "")
+
+
+def format_date(iso, month=False):
+    if not iso:
+        return "Undated"
+    return date.fromisoformat(iso).strftime("%b %Y" if month else "%d %b %Y")
+
+
+def format_paid(entry, iso):
+    # A payment entry's date as precisely as it was written: "Jan 2025"
+    # stays a month rather than becoming the 1st
+    match = PAYMENT.match(entry)
+    return format_date(iso, month=bool(match) and is_month(match.group(2)))
+
+
+def format_month(month):
+    # month as yyyymm; 0 collects payments recorded without a date
+    if not month:
+        return "Undated"
+    return date(month // 100, month % 100, 1).strftime("%b %Y")
+
+
+def _day(iso):
+    # yyyymmdd as an int, 0 when undated
+    return int(iso.replace("-", "")) if iso else 0
+
+
+def _month():
+    # [paise, payments]; a named function so the ledger can be pickled
+    return [0, 0]
+
+
+# ------------------- Payment Ledger -------------------
+# In-memory, column-oriented copy of the typed payments: three parallel
+# arrays (client id, paise, yyyymmdd) instead of a row object per payment,
+# plus running aggregates updated on every insert:
+#
+#   totals[client_id]  paise paid by that client  (array indexed by id)
+#   counts[client_id]  number of payments
+#   months[yyyymm]     [paise, payments]
+#
+# Reading a client's total or the monthly rollup never touches the
+# payments themselves. Entries without a parseable amount stay in the
+# store as text and are left out.
+class Ledger(Subscriber):
+    HANDLERS = {"payments": "_on_change"}
+
+    def __init__(self, model):
+        self.model = model
+        self.version = 0
+        self._load()
+        self.attach(model)
+
+    def _load(self):
+        self.client_ids = array("q")
+        self.amounts = array("q")
+        self.days = array("l")
+        self.totals = array("q")
+        self.counts = array("l")
+        self.months = defaultdict(_month)
+        for client_id, amount, paid in self.model.store.scan(
+                "payments", "client_id", "amount", "paid"):
+            if amount is not None:
+                self._add(client_id, amount, _day(paid))
+
+    def _add(self, client_id, amount, day):
+        self.client_ids.append(client_id)
+        self.amounts.append(amount)
+        self.days.append(day)
+        if client_id >= len(self.totals):
+            grow = client_id + 1 - len(self.totals)
+            self.totals.extend([0] * grow)
+            self.counts.extend([0] * grow)
+        self.totals[client_id] += amount
+        self.counts[client_id] += 1
+        month = self.months[day // 100]
+        month[0] += amount
+        month[1] += 1
+
+    def _on_change(self, change):
+        self.version += 1
+        if change.kind == INSERT:
+            record = change.record
+            if record["amount"] is not None:
+                self._add(record["client_id"], record["amount"], _day(record["paid"]))
+        elif change.kind == RESET or change.old is not None:
+            # Payments are only ever added from the console; anything else
+            # (imports, removals) rebuilds from the store
+            self._load()
+
+    # ---------------- Aggregates ----------------
+    def __len__(self):
+        return len(self.amounts)
+
+    def client_total(self, client_id):
+        """(paise, payments) for one client."""
+        if client_id is None or client_id >= len(self.totals):
+            return 0, 0
+        return self.totals[client_id], self.counts[client_id]
+
+    def total(self):
+        return sum(month[0] for month in self.months.values())
+
+    def monthly(self):
+        """[(yyyymm, paise, payments)], newest month first."""
+        return sorted(((month, paise, n) for month, (paise, n) in self.months.items()),
+                      reverse=True)
+
+    def month_total(self, month):
+        return self.months[month][0] if month in self.months else 0
+
+    def since(self, day):
+        # Walks the date column; only used for on-screen summaries
+        return sum(amount for amount, d in zip(self.amounts, self.days) if d >= day)
+
+    def top_clients(self, n=20):
+        """[(client_id, paise, payments)] for the n highest-paying clients."""
+        totals = self.totals
+        ids = heapq.nlargest(n, (i for i in range(len(totals)) if totals[i]),
+                             key=totals.__getitem__)
+        return [(i, totals[i], self.counts[i]) for i in ids]
@@ -0,0 +1,300 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+# Emitted after bulk changes (imports, sync) where per-row events would
+# cost more than simply re-reading the table.
+RESET = "reset"
+
+# Service statuses the console itself sets
+PENDING = "Pending"
+IN_PROGRESS = "In Progress"
+# Status given to a service by the Finish Service button
+FINISHED = "Finished ✅"
+
+# Worker statuses the dispatcher reads and sets
+AVAILABLE = "Available"
+ON_TASK = "On Task"
+
+
+# ------------------- Change Events -------------------
+class Change:
+    __slots__ = ("table", "kind", "id", "record", "old")
+
+    def __init__(self, table, kind, record_id, record=None, old=None):
+        self.table = table
+        self.kind = kind
+        self.id = record_id
+        self.record = record
+        self.old = old
+
+    def __repr__(self):
+        return f"Change({self.table!r}, {self.kind!r}, {self.id!r})"
+
+
+# ------------------- Subscribers -------------------
+# Base for the in-memory structures kept current from change events. They
+# can be pickled into a startup snapshot: everything but the model goes
+# in, and attach() hooks a restored one up to a new model.
+class Subscriber:
+    # table -> name of the method handling its changes
+    HANDLERS = {}
+
+    def attach(self, model):
+        self.model = model
+        for table, handler in self.HANDLERS.items():
+            model.subscribe(table, getattr(self, handler))
+        return self
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("model", None)
+        return state
+
+
+def _writes(method):
+    # Runs a model mutation in its own batch unless it is part of one
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.batch():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# ------------------- Data Model -------------------
+# All writes from the console go through the model. It persists them in
+# the store and then tells subscribers exactly which record changed, keyed
+# by its stable database id, so views can patch a single row instead of
+# rebuilding. In-memory structures take changes one at a time; views can
+# instead take each commit's changes together and redraw once for them.
+class DataModel:
+    def __init__(self, store):
+        self.store = store
+        self._subscribers = defaultdict(list)
+        self._batch_subscribers = defaultdict(list)
+        self._pending = None
+        # Applies other consoles' committed changes (see journal.py). Called
+        # before any batch writes, once the write lock is held, and before
+        # in-memory state is built from the store.
+        self.catch_up = None
+
+    # ---------------- Subscriptions ----------------
+    def subscribe(self, table, callback):
+        self._subscribers[table].append(callback)
+
+    def subscribe_batch(self, table, callback):
+        # callback([change, ...]) once per commit that changed the table,
+        # after every per-change subscriber has seen those changes
+        self._batch_subscribers[table].append(callback)
+
+    def unsubscribe(self, table, callback):
+        for subscribers in (self._subscribers, self._batch_subscribers):
+            if callback in subscribers[table]:
+                subscribers[table].remove(callback)
+
+    def emit(self, change):
+        if self._pending is not None:
+            self._pending.append(change)
+            return
+        self.publish([change])
+
+    def publish(self, changes):
+        # Straight to the subscribers, even during a batch: for changes that
+        # are already committed, such as those read from the journal
+        by_table = defaultdict(list)
+        for change in changes:
+            for callback in list(self._subscribers[change.table]):
+                callback(change)
+            by_table[change.table].append(change)
+        for table, table_changes in by_table.items():
+            for callback in list(self._batch_subscribers[table]):
+                callback(table_changes)
+
+    @contextmanager
+    def batch(self):
+        # Groups several mutations into one store transaction. Events are
+        # held back until the commit succeeds, so subscribers never see a
+        # change that was rolled back.
+        if self._pending is not None:
+            with self.store.transaction():
+                yield self
+            return
+
+        self._pending = []
+        try:
+            with self.store.transaction(write=True):
+                if self.catch_up is not None:
+                    self.catch_up()
+                yield self
+        except BaseException:
+            self._pending = None
+            raise
+        pending, self._pending = self._pending, None
+        if pending:
+            self.publish(pending)
+
+    @contextmanager
+    def savepoint(self):
+        # Within a batch: a block that raises leaves neither its writes nor
+        # its held-back events behind, and the batch carries on
+        if self._pending is None:
+            raise RuntimeError("savepoint() outside a batch")
+        mark = len(self._pending)
+        try:
+            with self.store.savepoint():
+                yield self
+        except BaseException:
+            del self._pending[mark:]
+            raise
+
+    @contextmanager
+    def reading(self):
+        # One consistent read of the store that everything other consoles
+        # wrote up to it has already been applied to
+        with self.store.transaction():
+            if self.catch_up is not None:
+                self.catch_up()
+            yield self.store
+
+    def reset(self, table):
+        self.emit(Change(table, RESET, None))
+
+    # ---------------- Clients ----------------
+    @_writes
+    def add_client(self, name, code, location="Unknown", joined=None,
+                   computer="Not Registered", payments=()):
+        client_id = self.store.add_client(name, code, location, joined, computer, payments)
+        self.emit(Change("clients", INSERT, client_id, self.store.client_row(client_id)))
+        if payments:
+            for payment in self.store.client_payments(client_id):
+                self.emit(Change("payments", INSERT, payment["id"], payment))
+        return client_id
+
+    @_writes
+    def update_client_location(self, name, location):
+        client_id = self.store.client_id(name)
+        if client_id is None:
+            return
+        old = self.store.client_row(client_id)
+        self.store.update_client_location(name, location)
+        self.emit(Change("clients", UPDATE, client_id, self.store.client_row(client_id), old))
+
+    @_writes
+    def add_payment(self, name, entry):
+        client_id = self.store.client_id(name)
+        if client_id is None:
+            return None
+        payment_id = self.store.add_payment(client_id, entry)
+        self.emit(Change("payments", INSERT, payment_id, self.store.get_payment(payment_id)))
+        row = self.store.client_row(client_id)
+        self.emit(Change("clients", UPDATE, client_id, row, row))
+        return payment_id
+
+    # ---------------- Services ----------------
+    @_writes
+    def add_service(self, client, task, status, priority=0):
+        service_id = self.store.add_service(client, task, status, priority)
+        self.emit(Change("services", INSERT, service_id, self.store.get_service(service_id)))
+        return service_id
+
+    @_writes
+    def update_service(self, service_id, client, task, status):
+        old = self.store.get_service(service_id)
+        if old is None:
+            return
+        self.store.update_service(service_id, client, task, status)
+        self.emit(Change("services", UPDATE, service_id, self.store.get_service(service_id), old))
+
+    @_writes
+    def set_service_status(self, service_id, status):
+        old = self.store.get_service(service_id)
+        if old is None:
+            return
+        self.store.set_service_status(service_id, status)
+        self.emit(Change("services", UPDATE, service_id, self.store.get_service(service_id), old))
+
+    @_writes
+    def set_service_worker(self, service_id, worker_id, status):
+        old = self.store.get_service(service_id)
+        if old is None:
+            return
+        self.store.set_service_worker(service_id, worker_id, status)
+        self.emit(Change("services", UPDATE, service_id, self.store.get_service(service_id), old))
+
+    @_writes
+    def delete_service(self, service_id):
+        old = self.store.get_service(service_id)
+        if old is None:
+            return
+        self.store.delete_service(service_id)
+        self.emit(Change("services", DELETE, service_id, None, old))
+
+    @_writes
+    def update_services(self, service_ids, **fields):
+        # The same fields set on many services at once; returns the records
+        # as they were, for the ones that still existed
+        old = self.store.services_by_ids(service_ids)
+        new = [service.replace(**fields) for service in old]
+        self.store.update_services(new)
+        for before, after in zip(old, new):
+            self.emit(Change("services", UPDATE, after.id, after, before))
+        return old
+
+    @_writes
+    def delete_services(self, service_ids):
+        old = self.store.services_by_ids(service_ids)
+        self.store.delete_services([service.id for service in old])
+        for service in old:
+            self.emit(Change("services", DELETE, service.id, None, service))
+        return old
+
+    # ---------------- Workers ----------------
+    @_writes
+    def add_worker(self, name, location, status):
+        worker_id = self.store.add_worker(name, location, status)
+        self.emit(Change("workers", INSERT, worker_id, self.store.get_worker(worker_id)))
+        return worker_id
+
+    @_writes
+    def update_worker(self, worker_id, name, location, status):
+        old = self.store.get_worker(worker_id)
+        if old is None:
+            return
+        self.store.update_worker(worker_id, name, location, status)
+        self.emit(Change("workers", UPDATE, worker_id, self.store.get_worker(worker_id), old))
+
+    @_writes
+    def set_worker_status(self, worker_id, status):
+        old = self.store.get_worker(worker_id)
+        if old is None:
+            return
+        self.store.set_worker_status(worker_id, status)
+        self.emit(Change("workers", UPDATE, worker_id, self.store.get_worker(worker_id), old))
+
+    @_writes
+    def delete_worker(self, worker_id):
+        old = self.store.get_worker(worker_id)
+        if old is None:
+            return
+        self.store.delete_worker(worker_id)
+        self.emit(Change("workers", DELETE, worker_id, None, old))
+
+    @_writes
+    def update_workers(self, worker_ids, **fields):
+        old = self.store.workers_by_ids(worker_ids)
+        new = [worker.replace(**fields) for worker in old]
+        self.store.update_workers(new)
+        for before, after in zip(old, new):
+            self.emit(Change("workers", UPDATE, after.id, after, before))
+        return old
+
+    @_writes
+    def delete_workers(self, worker_ids):
+        old = self.store.workers_by_ids(worker_ids)
+        self.store.delete_workers([worker.id for worker in old])
+        for worker in old:
+            self.emit(Change("workers", DELETE, worker.id, None, worker))
+        return old
@@ -0,0 +1,96 @@
+import asyncio
+import queue
+import time
+
+ONLINE = "Online"
+OFFLINE = "Offline"
+
+
+# ------------------- Probe Results -------------------
+class ProbeResult:
+    __slots__ = ("client", "host", "port", "online", "latency", "error", "checked")
+
+    def __init__(self, client, host, port, online, latency=None, error=None):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.online = online
+        self.latency = latency  # milliseconds to complete the TCP handshake
+        self.error = error
+        self.checked = time.monotonic()
+
+    @property
+    def status(self):
+        return ONLINE if self.online else OFFLINE
+
+
+# ------------------- Reachability Prober -------------------
+# TCP-connects to every client's remote desktop port on the background
+# loop, at most `concurrency` at a time and each bounded by `timeout`.
+# Results are cached for `ttl` seconds and also pushed onto a queue that
+# the UI drains with after(), so rows update as answers come in instead of
+# when the slowest machine times out.
+class Prober:
+    def __init__(self, background, concurrency=64, timeout=1.5, ttl=30.0):
+        self.background = background
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.ttl = ttl
+        self.results = {}
+        self.updates = queue.SimpleQueue()
+        self._running = None
+
+    def cached(self, client):
+        result = self.results.get(client)
+        if result is not None and time.monotonic() - result.checked <= self.ttl:
+            return result
+        return None
+
+    @property
+    def busy(self):
+        return self._running is not None and not self._running.done()
+
+    def probe_all(self, endpoints, force=False):
+        """Probe (client, (host, port)) pairs; skips fresh cache entries unless forced."""
+        targets = [(client, host, port) for client, (host, port) in endpoints
+                   if force or self.cached(client) is None]
+        self._running = self.background.submit(self._probe_all(targets))
+        return self._running
+
+    def drain(self):
+        # Results that arrived since the last call, for the Tk thread
+        results = []
+        while True:
+            try:
+                results.append(self.updates.get_nowait())
+            except queue.Empty:
+                return results
+
+    async def _probe_all(self, targets):
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(client, host, port):
+            async with limit:
+                result = await self.probe(client, host, port)
+            self.results[client] = result
+            self.updates.put(result)
+            return result
+
+        return await asyncio.gather(*(bounded(*target) for target in targets))
+
+    async def probe(self, client, host, port):
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), self.timeout)
+        except asyncio.TimeoutError:
+            return ProbeResult(client, host, port, False, error="timed out")
+        except OSError as exc:
+            return ProbeResult(client, host, port, False, error=exc.strerror or str(exc))
+        latency = (time.perf_counter() - started) * 1000
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return ProbeResult(client, host, port, True, latency=latency)
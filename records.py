@@ -0,0 +1,136 @@
+from model import AVAILABLE, FINISHED, IN_PROGRESS, ON_TASK, PENDING
+
+
+# ------------------- Interned Values -------------------
+# Statuses and locations repeat across hundreds of thousands of rows, but
+# SQLite hands back a fresh string for every row it reads. A vocabulary
+# keeps one shared string per distinct value, so every record (and every
+# index key) holding "Pending" points at the same object.
+class Vocabulary:
+    __slots__ = ("_values",)
+
+    def __init__(self, values=()):
+        self._values = {value: value for value in values}
+
+    def __call__(self, value):
+        return self._values.setdefault(value, value)
+
+    def __contains__(self, value):
+        return value in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+
+STATUSES = Vocabulary((PENDING, IN_PROGRESS, FINISHED, AVAILABLE, ON_TASK))
+LOCATIONS = Vocabulary(("Unknown",))
+
+
+# ------------------- Records -------------------
+# Rows the store hands to the console. Each is a slotted object instead of
+# a dict or sqlite3.Row, and reads like a mapping (record["status"]) so
+# views, indexes and change handlers can treat any record the same way.
+# Selects that only need a few columns leave the rest as None.
+class Record:
+    __slots__ = ()
+    FIELDS = ()
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        # sqlite3 row_factory signature
+        return cls(*row)
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def keys(self):
+        return self.FIELDS
+
+    def replace(self, **fields):
+        # A copy with some fields changed
+        return type(self)(**{field: fields.get(field, getattr(self, field))
+                             for field in self.FIELDS})
+
+    def __repr__(self):
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+
+class Client(Record):
+    __slots__ = FIELDS = ("id", "name", "code", "location", "joined", "computer")
+
+    def __init__(self, id, name, code, location=None, joined=None, computer=None):
+        self.id = id
+        self.name = name
+        self.code = code
+        self.location = LOCATIONS(location) if location is not None else None
+        self.joined = joined
+        self.computer = computer
+
+
+class Payment(Record):
+    __slots__ = FIELDS = ("id", "client_id", "entry", "amount", "paid")
+
+    def __init__(self, id, client_id, entry, amount, paid):
+        self.id = id
+        self.client_id = client_id
+        self.entry = entry
+        self.amount = amount
+        self.paid = paid
+
+
+class Service(Record):
+    __slots__ = FIELDS = ("id", "client", "task", "status", "priority", "worker_id")
+
+    def __init__(self, id, client, task, status, priority=0, worker_id=None):
+        self.id = id
+        self.client = client
+        self.task = task
+        self.status = STATUSES(status)
+        self.priority = priority
+        self.worker_id = worker_id
+
+
+class Order(Record):
+    __slots__ = FIELDS = ("id", "type", "client", "date")
+
+    def __init__(self, id, type, client, date):
+        self.id = id
+        self.type = type
+        self.client = client
+        self.date = date
+
+
+class Worker(Record):
+    __slots__ = FIELDS = ("id", "name", "location", "status", "code")
+
+    def __init__(self, id, name, location, status, code):
+        self.id = id
+        self.name = name
+        self.location = LOCATIONS(location)
+        self.status = STATUSES(status)
+        self.code = code
+
+
+class Endpoint(Record):
+    # Keyed by its client: one remote desktop address per client machine
+    __slots__ = FIELDS = ("client_id", "host", "port")
+
+    def __init__(self, client_id, host, port):
+        self.client_id = client_id
+        self.host = host
+        self.port = port
+
+
+# Record class per table
+RECORDS = {
+    "clients": Client,
+    "payments": Payment,
+    "services": Service,
+    "orders": Order,
+    "workers": Worker,
+    "endpoints": Endpoint,
+}
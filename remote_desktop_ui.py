@@ -1,53 +1,117 @@
 import customtkinter as ctk
-from tkinter import messagebox, ttk
-import uuid
-import random
+from tkinter import Canvas, PhotoImage, filedialog, messagebox, ttk
+import asyncio
 import os
+import random
+import time
+from datetime import date, timedelta
+from itertools import islice
+
+from background import BackgroundLoop
+from bulk import FIELDS, Progress, export_file, import_file
+from connections import CLOSED, FAILED, ConnectionManager, EndpointRegistry, RDP_PORT
+from core import Console, ValidationError
+from dispatch import PRIORITIES
+from heartbeat import ALL_INTERFACES, LOOPBACK, HeartbeatServer, CLIENT, WORKER
+from instrumentation import (HANDLER, HTTP_PORT, TEXTFILE, TIMER, VIEW_BUILD, VIEW_REFRESH,
+                             LagMonitor, Metrics, MetricsServer, write_textfile)
+from journal import JOURNAL_KEEP
+from ledger import format_amount, format_month
+from prober import Prober
+from model import AVAILABLE, FINISHED, IN_PROGRESS, ON_TASK, PENDING, RESET
+from screen import SCREEN_PORT, ScreenViewer
+from search import MAX_RESULTS
+from storage import Store
+from transfer import QueueFull, TransferManager
+from virtual_tree import VirtualTree
+
+def format_elapsed(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes:02}:{seconds:02}"
+
+
+def format_seen(beat, status=False):
+    # Last Seen column: local time of the latest heartbeat, optionally with
+    # the status the agent reported
+    if beat is None:
+        return "—"
+    seen = time.strftime("%H:%M:%S", time.localtime(beat.seen))
+    return f"{seen} · {beat.status}" if status and beat.status else seen
+
 
 # ------------------- Admin App -------------------
 class AdminApp(ctk.CTk):
-    def __init__(self):
+    DASHBOARD_REFRESH_MS = 1000
+    SESSIONS_REFRESH_MS = 500
+    PROBE_POLL_MS = 100
+    HEARTBEAT_FLUSH_MS = 250
+    BULK_POLL_MS = 200
+    DIAGNOSTICS_REFRESH_MS = 1000
+    PAYMENTS_REFRESH_MS = 1000
+    DISPATCH_MS = 250
+    SCREEN_POLL_MS = 15
+    DISPATCH_BATCH = 200
+    PATCH_LIMIT = 20
+    JOURNAL_SYNC_MS = 250
+    JOURNAL_COMPACT_MS = 60000
+    METRICS_WRITE_MS = 10000
+    BULK_FILETYPES = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("All files", "*.*")]
+
+    def __init__(self, db_path=None):
         super().__init__()
 
         self.title("Yesway Admin Console")
         self.geometry("1200x700")
         self.configure(bg="white")
 
-        # === Clients with Extra Details ===
-        self.clients = {
-            "Ali": {
-                "code": "ALI12345",
-                "location": "Palode",
-                "joined": "12 Jan 2025",
-                "payments": ["₹500 - Jan 2025", "₹800 - Feb 2025"],
-                "computer": "Dell Inspiron 15, Windows 11"
-            },
-            "Amal": {
-                "code": "AMAL6789",
-                "location": "Channappetta",
-                "joined": "20 Feb 2025",
-                "payments": ["₹1000 - Feb 2025"],
-                "computer": "HP Elitebook, Windows 10"
-            }
-        }
-
-        # === Services ===
-        self.services = [
-            {"client": "Ali", "task": "Fix Laptop", "status": "Pending"},
-            {"client": "Amal", "task": "Install ERP", "status": "In Progress"},
-        ]
-
-        # === Orders ===
-        self.orders = [
-            {"type": "Computer", "client": "Rahul", "date": "25 Aug 2025"},
-            {"type": "CCTV Setup", "client": "Afsal", "date": "26 Aug 2025"},
-        ]
-
-        # === Workers ===
-        self.workers = [
-            {"name": "Deepu", "location": "Trivandrum", "status": "Available"},
-            {"name": "Joel", "location": "Kottiyam", "status": "On Task"},
-        ]
+        # === Console Core (records and rules; shared with the CLI) ===
+        self.core = Console(path=db_path)
+        self.core.warm()
+        # Persistent store; all writes go through the model so views get
+        # row-level change events
+        self.store = self.core.store
+        self.model = self.core.model
+        # In-memory lookups (names, codes, client/status/location groups)
+        self.indexes = self.core.indexes
+        # Type-ahead word-prefix search over names, codes, locations and tasks
+        self.search = self.core.search
+        # Dashboard totals maintained on every mutation
+        self.counters = self.core.counters
+        # Typed payments with per-client totals and monthly rollups
+        self.ledger = self.core.ledger
+        # Pending services matched to free workers (applied by run_dispatch)
+        self.dispatcher = self.core.dispatcher
+        # Sorted columns behind the clickable tree headings
+        self.sorting = self.core.sorting
+        self.auto_dispatch = True
+
+        # === Remote Connections (launched on a background asyncio loop) ===
+        self.background = BackgroundLoop()
+        self.endpoints = EndpointRegistry(self.store)
+        self.endpoints.watch(self.model)
+        self.connections = ConnectionManager(self.background)
+        self.prober = Prober(self.background)
+        # Files pushed to client agents, a few at a time, the rest queued
+        self.transfers = TransferManager(self.background)
+
+        # === Agent Heartbeats (received on the background loop, applied in batches) ===
+        self.heartbeats = HeartbeatServer(self.background)
+        self.heartbeats.watch(self.model)
+        self.heartbeats.start()
+        self.heartbeat_listeners = []
+
+        # === Instrumentation (off unless YESWAY_METRICS=1 or switched on in Diagnostics) ===
+        self.metrics = Metrics()
+        self.lag_monitor = LagMonitor(self, self.metrics)
+        self.metrics_server = None
+        if HTTP_PORT:
+            try:
+                self.metrics_server = MetricsServer(self.metrics).start()
+            except OSError:
+                pass  # port taken; Diagnostics shows the endpoint as unavailable
+        if self.metrics.enabled:
+            self.lag_monitor.start()
 
         # === Sidebar ===
         self.create_sidebar()
@@ -56,7 +120,19 @@ class AdminApp(ctk.CTk):
         self.main_frame = ctk.CTkFrame(self, fg_color="white", corner_radius=15)
         self.main_frame.pack(side="left", expand=True, fill="both", padx=15, pady=15)
 
-        self.show_dashboard()  # default
+        # === View Cache (each screen is built once, then shown/hidden) ===
+        self.views = {}
+        self.view_refreshers = {}
+        self.stale_views = set()
+        self.current_view = None
+
+        self.switch_menu(self.show_dashboard, "Dashboard")  # default
+        self.after(self.HEARTBEAT_FLUSH_MS, self.apply_heartbeats)
+        self.after(self.DISPATCH_MS, self.run_dispatch)
+        self.after(self.JOURNAL_SYNC_MS, self.sync_journal)
+        self.after(self.JOURNAL_COMPACT_MS, self.compact_journal)
+        if TEXTFILE:
+            self.after(self.METRICS_WRITE_MS, self.write_metrics)
 
     # ---------------- Sidebar ----------------
     def create_sidebar(self):
@@ -66,24 +142,32 @@ class AdminApp(ctk.CTk):
 
         # Sidebar menu buttons
         self.menu_buttons = {}
-        menu_items = {
+        self.menu_items = menu_items = {
             "Dashboard": self.show_dashboard,
             "User Creation": self.show_user_creation,
             "Services": self.show_services,
             "Orders": self.show_orders,
+            "Payments": self.show_payments,
             "Worker Status": self.show_worker_status,
             "Remote Desktop": self.show_remote_desktop,
+            "Import / Export": self.show_import_export,
+            "Diagnostics": self.show_diagnostics,
             "Quit": self.quit,
         }
 
         for text, cmd in menu_items.items():
+            if cmd == self.quit:
+                command = cmd
+            else:
+                command = lambda c=cmd, t=text: self.switch_menu(c, t)
             btn = ctk.CTkButton(
                 self.sidebar, text=text,
                 fg_color="white", text_color="black",
-                hover_color="#FFFACD", command=lambda c=cmd, t=text: self.switch_menu(c, t)
+                hover_color="#FFFACD", command=command
             )
             btn.pack(pady=10, padx=20, fill="x")
             self.menu_buttons[text] = btn
+        self.instrument_buttons(self.sidebar, "Sidebar")
 
     # ---------------- Menu Switching ----------------
     def switch_menu(self, command, text):
@@ -92,10 +176,250 @@ class AdminApp(ctk.CTk):
 
         self.menu_buttons[text].configure(fg_color="#FFA500", text_color="white")
 
-        for widget in self.main_frame.winfo_children():
-            widget.destroy()
-
-        command()
+        if self.current_view in self.views:
+            self.views[self.current_view].pack_forget()
+        self.current_view = text
+
+        # A view about to read the store must not then be handed changes
+        # from other consoles it already read
+        self.core.sync()
+        if text not in self.views:
+            frame = ctk.CTkFrame(self.main_frame, fg_color="white")
+            self.views[text] = frame
+            with self.metrics.timed(VIEW_BUILD, text):
+                refresh = command(frame)
+            self.instrument_buttons(frame, text)
+            if refresh:
+                self.view_refreshers[text] = refresh
+        elif text in self.stale_views:
+            self.refresh_views(text)
+
+        self.views[text].pack(expand=True, fill="both")
+
+    def refresh_views(self, *texts):
+        # Refresh the visible view right away; cached hidden views are only
+        # marked stale and catch up the next time they are shown.
+        for text in texts:
+            if text == self.current_view:
+                self.stale_views.discard(text)
+                refresh = self.view_refreshers.get(text)
+                if refresh:
+                    with self.metrics.timed(VIEW_REFRESH, text):
+                        refresh()
+            elif text in self.views:
+                self.stale_views.add(text)
+
+    def bind_tree(self, tree, table, row_values, matches=None):
+        # Keep a VirtualTree in step with the model by patching single rows.
+        # matches(record) tells whether a record belongs in a filtered view.
+        # A commit touching more than PATCH_LIMIT rows (a batch action, a
+        # burst from another console) redraws the window once instead, as
+        # does any row landing somewhere new in a sorted tree.
+        def shown(record):
+            return record is not None and (matches is None or matches(record))
+
+        def moves(change, field):
+            return shown(change.record) and not (
+                shown(change.old) and change.old[field] == change.record[field])
+
+        def on_changes(changes):
+            sort = tree.sort_by
+            if (len(changes) > self.PATCH_LIMIT or any(c.kind == RESET for c in changes)
+                    or sort is not None and any(moves(c, sort[0]) for c in changes)):
+                tree.deselect(c.id for c in changes
+                              if c.kind != RESET and not shown(c.record))
+                tree.refresh()
+                return
+            for change in changes:
+                was, now = shown(change.old), shown(change.record)
+                if was and now:
+                    tree.update_row(change.id, row_values(change.record))
+                elif was:
+                    tree.delete_row(change.id)
+                elif now:
+                    tree.insert_row(change.id, row_values(change.record))
+
+        self.model.subscribe_batch(table, on_changes)
+
+    def selection_label(self, parent, tree, noun):
+        # "3 services selected", kept current as the selection changes
+        label = ctk.CTkLabel(parent, text="", text_color="gray")
+
+        def update(event=None):
+            count = len(tree.selection())
+            label.configure(text=f"{count:,} {noun}{'' if count == 1 else 's'} selected"
+                            if count else "")
+
+        tree.bind("<<SelectionChanged>>", update, add="+")
+        return label
+
+    def choose(self, title, label, choices, on_choose):
+        # Small dialog picking one of choices; on_choose(choice) may raise
+        # ValidationError to keep it open
+        win = ctk.CTkToplevel(self)
+        win.title(title)
+        win.geometry("360x220")
+        ctk.CTkLabel(win, text=label).pack(pady=10)
+        var = ctk.StringVar(value=choices[0])
+        ctk.CTkComboBox(win, variable=var, values=choices, width=250).pack(pady=5)
+
+        def apply():
+            try:
+                on_choose(var.get())
+            except ValidationError as exc:
+                messagebox.showwarning("Error", str(exc))
+                return
+            win.destroy()
+
+        ctk.CTkButton(win, text="Apply", fg_color="#32CD32", text_color="white",
+                      command=apply).pack(pady=20)
+        self.instrument_buttons(win, title)
+
+    def apply_heartbeats(self):
+        # Runs a few times a second however fast heartbeats arrive: the
+        # server keeps only the latest one per sender, so each tick applies
+        # one small batch and the mainloop is never flooded.
+        with self.metrics.timed(TIMER, "heartbeats"):
+            beats = self.heartbeats.take()
+            if beats:
+                self.core.set_worker_statuses(
+                    {beat.name: beat.status for beat in beats if beat.kind == WORKER})
+                for listener in self.heartbeat_listeners:
+                    listener(beats)
+        self.after(self.HEARTBEAT_FLUSH_MS, self.apply_heartbeats)
+
+    def run_dispatch(self):
+        # Assignments are applied in bounded batches, so a backlog of
+        # thousands of services drains over a few ticks instead of
+        # stalling the mainloop in one go.
+        if self.auto_dispatch and self.dispatcher.ready():
+            with self.metrics.timed(TIMER, "dispatch"):
+                self.core.dispatch(self.DISPATCH_BATCH)
+        self.after(self.DISPATCH_MS, self.run_dispatch)
+
+    def sync_journal(self):
+        # Other consoles' changes arrive as ordinary change events, so the
+        # views patch their rows exactly as for local edits
+        with self.metrics.timed(TIMER, "journal"):
+            self.core.sync()
+        self.after(self.JOURNAL_SYNC_MS, self.sync_journal)
+
+    def compact_journal(self):
+        self.store.compact_journal(JOURNAL_KEEP)
+        self.after(self.JOURNAL_COMPACT_MS, self.compact_journal)
+
+    # ---------------- Instrumentation ----------------
+    def instrument_buttons(self, widget, scope):
+        # Time every button command under widget as "<scope>/<button text>"
+        for child in widget.winfo_children():
+            if isinstance(child, ctk.CTkButton):
+                command = child.cget("command")
+                if command is not None:
+                    label = f"{scope}/{child.cget('text')}"
+                    child.configure(command=self.metrics.wrap(HANDLER, label, command))
+            else:
+                self.instrument_buttons(child, scope)
+
+    def write_metrics(self):
+        try:
+            write_textfile(self.metrics, TEXTFILE)
+        except OSError:
+            pass
+        self.after(self.METRICS_WRITE_MS, self.write_metrics)
+
+    def show_last_seen(self, tree, kind, ids, status=False):
+        # Heartbeat listener patching the trailing Last Seen column of the
+        # loaded rows; rows fetched later read it from the server directly
+        def on_beats(beats):
+            for beat in beats:
+                record_id = ids.get(beat.name) if beat.kind == kind else None
+                values = tree.cached_values(record_id) if record_id is not None else None
+                if values:
+                    tree.update_row(record_id, tuple(values[:-1]) + (format_seen(beat, status),))
+
+        self.heartbeat_listeners.append(on_beats)
+
+    def table_source(self, table, page, by_ids, row_values, subset):
+        # fetch/count/ids for a VirtualTree. subset() returns None to page
+        # the whole table from the store, or an ordered collection of ids
+        # (an index group or search hits) to page through instead. A sorted
+        # tree gets the same rows from the maintained sorted column (see
+        # sorting.py), a page at a time.
+        def ordered(sort_by):
+            ids = subset()
+            if sort_by is None:
+                return ids, False
+            field, reverse = sort_by
+            return self.sorting.ids(table, field, reverse, ids), True
+
+        def fetch(offset, limit, sort_by=None):
+            ids, sliceable = ordered(sort_by)
+            if ids is None:
+                rows = page(offset, limit)
+            elif sliceable:
+                rows = by_ids(ids[offset:offset + limit])
+            else:
+                rows = by_ids(islice(ids, offset, offset + limit))
+            return [(row["id"], row_values(row)) for row in rows]
+
+        def count():
+            ids = subset()
+            return self.store.count(table) if ids is None else len(ids)
+
+        def ids(sort_by=None):
+            ids = ordered(sort_by)[0]
+            return (row[0] for row in self.store.scan(table, "id")) if ids is None else ids
+
+        return fetch, count, ids
+
+    def search_bar(self, parent, on_search, table, delay=150):
+        # Debounced: the search runs once typing pauses, not per keystroke.
+        # Hits are capped at MAX_RESULTS; when a query matches more, the
+        # bar says so, since Select All can only pick rows the view shows.
+        entry = ctk.CTkEntry(parent, placeholder_text="🔍 Search", width=260)
+        entry.pack(side="left", padx=(0, 10))
+        hint = ctk.CTkLabel(parent, text="", text_color="#B8860B")
+        hint.pack(side="left", padx=(0, 10))
+        pending = []
+
+        def run():
+            pending.clear()
+            on_search()
+            query = entry.get().strip()
+            hint.configure(text=f"Showing the first {MAX_RESULTS:,} matches; refine the search"
+                           if query and self.search.truncated(table, query) else "")
+
+        def on_key(event):
+            if pending:
+                self.after_cancel(pending.pop())
+            pending.append(self.after(delay, run))
+
+        entry.bind("<KeyRelease>", on_key)
+        return lambda: entry.get().strip()
+
+    def filter_menu(self, parent, label, choices, on_select):
+        # "All" plus whatever keys a secondary index currently holds
+        ctk.CTkLabel(parent, text=label, text_color="black").pack(side="left", padx=(0, 10))
+        var = ctk.StringVar(value="All")
+        menu = ctk.CTkOptionMenu(parent, variable=var, values=["All"] + choices(),
+                                 command=lambda value: on_select())
+        menu.pack(side="left")
+
+        def sync_choices(changes=None):
+            values = ["All"] + choices()
+            if values != menu.cget("values"):
+                menu.configure(values=values)
+            if var.get() not in values:
+                var.set("All")
+                on_select()
+
+        return var, sync_choices
+
+    # ---------------- Client Helpers ----------------
+    def show_client_details(self, username):
+        details = self.core.client_details(username)
+        if details:
+            messagebox.showinfo("User Details", details)
 
     # ---------------- Dashboard ----------------
     def show_dashboard(self, parent=None):
@@ -104,11 +428,36 @@ class AdminApp(ctk.CTk):
                            font=("Arial", 24, "bold"), text_color="black")
         lbl.pack(pady=20)
 
-        stats = f"Total Clients: {len(self.clients)}\nActive Services: {len(self.services)}\nPending Orders: {len(self.orders)}\nWorkers: {len(self.workers)}"
-        stat_lbl = ctk.CTkLabel(frame, text=stats,
+        stat_lbl = ctk.CTkLabel(frame, text="",
                                 font=("Arial", 16), text_color="black")
         stat_lbl.pack(pady=10)
 
+        def refresh():
+            c = self.counters
+            by_status = " · ".join(f"{status}: {n}" for status, n in
+                                   sorted(c.services_by_status.items()))
+            stats = (f"Total Clients: {c.total('clients')}\n"
+                     f"Active Services: {c.active_services()}\n"
+                     f"Finished Services: {c.finished_services()}\n"
+                     f"Services by Status: {by_status or 'None'}\n"
+                     f"Pending Orders: {c.pending_orders()}\n"
+                     f"Workers: {c.total('workers')} "
+                     f"({AVAILABLE}: {c.workers_with_status(AVAILABLE)}, "
+                     f"{ON_TASK}: {c.workers_with_status(ON_TASK)})")
+            if stats != stat_lbl.cget("text"):
+                stat_lbl.configure(text=stats)
+
+        def tick():
+            # Counters are O(1) to read, so polling is cheaper than
+            # wiring every mutation to the label
+            if self.current_view == "Dashboard":
+                refresh()
+            self.after(self.DASHBOARD_REFRESH_MS, tick)
+
+        refresh()
+        self.after(self.DASHBOARD_REFRESH_MS, tick)
+        return refresh
+
     # ---------------- User Creation ----------------
     def show_user_creation(self, parent=None):
         frame = parent if parent else self.main_frame
@@ -134,29 +483,16 @@ class AdminApp(ctk.CTk):
 
         def create_user():
             username = entry_username.get().strip()
-            location = entry_location.get().strip()
-            payment = entry_payment.get().strip()
-            computer = entry_computer.get().strip()
-
-            if not username:
-                messagebox.showwarning("Error", "Please enter a username")
-                return
-            if username in self.clients:
-                messagebox.showwarning("Error", "Username already exists!")
+            try:
+                unique_code = self.core.create_client(username, entry_location.get(),
+                                                      entry_payment.get(), entry_computer.get())
+            except ValidationError as exc:
+                messagebox.showwarning("Error", str(exc))
                 return
-
-            unique_code = str(uuid.uuid4())[:8].upper()
-            self.clients[username] = {
-                "code": unique_code,
-                "location": location if location else "Unknown",
-                "joined": "Today",
-                "payments": [payment] if payment else [],
-                "computer": computer if computer else "Not Registered"
-            }
             messagebox.showinfo("Success",
                                 f"User '{username}' created.\nUnique Code: {unique_code}")
 
-        btn = ctk.CTkButton(frame, Text="Generate User Code",
+        btn = ctk.CTkButton(frame, text="Generate User Code",
                             fg_color="#FFD700", text_color="black",
                             hover_color="#FFFACD", command=create_user)
         btn.pack(pady=10)
@@ -168,15 +504,85 @@ class AdminApp(ctk.CTk):
                            font=("Arial", 20, "bold"), text_color="black")
         lbl.pack(pady=20)
 
-        tree = ttk.Treeview(frame, columns=("Client", "Task", "Status"),
-                            show="headings", height=10)
+        def row_values(s):
+            worker = self.indexes.worker_name(s["worker_id"])
+            return (s["client"], s["task"], s["status"], PRIORITIES[s["priority"]], worker or "—")
+
+        def matches(s):
+            query = search_text()
+            return (status_filter.get() in ("All", s["status"])
+                    and (not query or self.search.matches("services", s, query)))
+
+        def subset():
+            status, query = status_filter.get(), search_text()
+            if query:
+                hits = self.search.search("services", query)
+                if status != "All":
+                    group = self.indexes.services_with_status(status)
+                    hits = [i for i in hits if i in group]
+                return hits
+            if status != "All":
+                return self.indexes.services_with_status(status)
+            return None
+
+        toolbar = ctk.CTkFrame(frame, fg_color="white")
+        toolbar.pack(fill="x", padx=20)
+        def refilter():
+            # Rows hidden by the new filter must not stay selected
+            tree.clear_selection()
+            tree.refresh()
+
+        search_text = self.search_bar(toolbar, refilter, "services")
+        status_filter, sync_statuses = self.filter_menu(
+            toolbar, "Status", self.indexes.statuses, refilter)
+
+        def toggle_dispatch():
+            self.auto_dispatch = auto.get()
+
+        auto = ctk.BooleanVar(value=self.auto_dispatch)
+        ctk.CTkSwitch(toolbar, text="Auto-dispatch", variable=auto,
+                      command=toggle_dispatch).pack(side="left", padx=20)
+        queue_lbl = ctk.CTkLabel(toolbar, text="", text_color="gray")
+        queue_lbl.pack(side="left")
+
+        fetch, count, ids = self.table_source("services", self.store.services,
+                                              self.store.services_by_ids, row_values, subset)
+        tree = VirtualTree(frame, columns=("Client", "Task", "Status", "Priority", "Worker"),
+                           height=10, fetch=fetch, count=count, ids=ids)
+        self.bind_tree(tree, "services", row_values, matches)
+        self.model.subscribe_batch("services", sync_statuses)
         tree.heading("Client", text="Client")
         tree.heading("Task", text="Task")
         tree.heading("Status", text="Status")
+        tree.heading("Priority", text="Priority")
+        tree.heading("Worker", text="Assigned To")
+        tree.sortable({"Client": "client", "Task": "task", "Status": "status",
+                       "Priority": "priority"})
         tree.pack(fill="x", padx=20, pady=10)
 
-        for idx, s in enumerate(self.services):
-            tree.insert("", "end", iid=idx, values=(s["client"], s["task"], s["status"]))
+        def on_workers(changes):
+            # Assigned To shows worker names; a rename is rare enough to reload for
+            if any(c.old is not None and c.record is not None
+                   and c.old["name"] != c.record["name"] for c in changes):
+                tree.refresh()
+
+        self.model.subscribe_batch("workers", on_workers)
+        selected_lbl = self.selection_label(toolbar, tree, "service")
+        selected_lbl.pack(side="right")
+
+        def update_queue():
+            d = self.dispatcher
+            text = f"{len(d.pending):,} waiting · {len(d.free):,} workers free"
+            if text != queue_lbl.cget("text"):
+                queue_lbl.configure(text=text)
+
+        def tick():
+            if self.current_view == "Services":
+                update_queue()
+            self.after(self.DISPATCH_MS, tick)
+
+        update_queue()
+        self.after(self.DISPATCH_MS, tick)
 
         btn_frame = ctk.CTkFrame(frame, fg_color="white")
         btn_frame.pack(pady=10)
@@ -184,7 +590,7 @@ class AdminApp(ctk.CTk):
         def add_service_manual():
             win = ctk.CTkToplevel(self)
             win.title("Add Service Manually")
-            win.geometry("400x500")
+            win.geometry("400x580")
 
             ctk.CTkLabel(win, text="Client Name").pack(pady=5)
             entry_client = ctk.CTkEntry(win, width=250)
@@ -206,38 +612,24 @@ class AdminApp(ctk.CTk):
             entry_payment = ctk.CTkEntry(win, width=250)
             entry_payment.pack(pady=5)
 
+            ctk.CTkLabel(win, text="Priority").pack(pady=5)
+            priority = ctk.StringVar(value=PRIORITIES[0])
+            ctk.CTkOptionMenu(win, variable=priority, values=list(PRIORITIES)).pack(pady=5)
+
             def save_service():
-                client = entry_client.get().strip()
-                task = entry_task.get().strip()
-                status = entry_status.get().strip()
-                location = entry_location.get().strip()
-                payment = entry_payment.get().strip()
-
-                if not client or not task or not status:
-                    messagebox.showwarning("Error", "Client, Task and Status are required")
+                try:
+                    self.core.add_service(entry_client.get(), entry_task.get(),
+                                          entry_status.get(), entry_location.get(),
+                                          entry_payment.get(),
+                                          PRIORITIES.index(priority.get()))
+                except ValidationError as exc:
+                    messagebox.showwarning("Error", str(exc))
                     return
-
-                self.services.append({"client": client, "task": task, "status": status})
-
-                if client not in self.clients:
-                    self.clients[client] = {
-                        "code": str(uuid.uuid4())[:8].upper(),
-                        "location": location if location else "Unknown",
-                        "joined": "Today",
-                        "payments": [payment] if payment else [],
-                        "computer": "Not Registered"
-                    }
-                else:
-                    if location:
-                        self.clients[client]["location"] = location
-                    if payment:
-                        self.clients[client]["payments"].append(payment)
-
-                self.switch_menu(self.show_services, "Services")
                 win.destroy()
 
             ctk.CTkButton(win, text="Save Service", fg_color="#32CD32", text_color="white",
                           command=save_service).pack(pady=20)
+            self.instrument_buttons(win, "Add Service Manually")
 
         def edit_service():
             selected = tree.selection()
@@ -245,8 +637,12 @@ class AdminApp(ctk.CTk):
                 messagebox.showwarning("Error", "Please select a service to edit")
                 return
 
-            idx = int(selected[0])
-            service = self.services[idx]
+            service_id = int(selected[0])
+            service = self.store.get_service(service_id)
+            if service is None:
+                # Deleted on another console since the view last synced
+                messagebox.showwarning("Error", "This service no longer exists")
+                return
 
             win = ctk.CTkToplevel(self)
             win.title("Edit Service")
@@ -268,53 +664,80 @@ class AdminApp(ctk.CTk):
             entry_status.pack(pady=5)
 
             def save_edit():
-                service["client"] = entry_client.get().strip()
-                service["task"] = entry_task.get().strip()
-                service["status"] = entry_status.get().strip()
-                self.switch_menu(self.show_services, "Services")
+                try:
+                    self.core.update_service(service_id, entry_client.get(),
+                                             entry_task.get(), entry_status.get())
+                except ValidationError as exc:
+                    messagebox.showerror("Error", str(exc))
+                    return
                 win.destroy()
 
             ctk.CTkButton(win, text="Save Changes", fg_color="#32CD32", text_color="white",
                           command=save_edit).pack(pady=20)
+            self.instrument_buttons(win, "Edit Service")
 
-        def finish_service():
+        # Batch actions: every selected service, in one commit
+        def selected_services(action):
             selected = tree.selection()
             if not selected:
-                messagebox.showwarning("Error", "Please select a service to mark as Finished")
-                return
-            idx = int(selected[0])
-            self.services[idx]["status"] = "Finished ✅"
-            self.switch_menu(self.show_services, "Services")
+                messagebox.showwarning("Error", f"Please select the services to {action}")
+            return [int(iid) for iid in selected]
+
+        def finish_service():
+            service_ids = selected_services("mark as Finished")
+            if service_ids:
+                self.core.finish_services(service_ids)
 
         def delete_service():
-            selected = tree.selection()
-            if not selected:
-                messagebox.showwarning("Error", "Please select a service to delete")
+            service_ids = selected_services("delete")
+            if not service_ids:
                 return
-            idx = int(selected[0])
-            confirm = messagebox.askyesno("Confirm", "Are you sure you want to delete this service?")
-            if confirm:
-                del self.services[idx]
-                self.switch_menu(self.show_services, "Services")
+            noun = "this service" if len(service_ids) == 1 else f"these {len(service_ids):,} services"
+            if messagebox.askyesno("Confirm", f"Are you sure you want to delete {noun}?"):
+                self.core.delete_services(service_ids)
+                tree.clear_selection()
+
+        def set_status():
+            service_ids = selected_services("change")
+            if not service_ids:
+                return
+            statuses = [PENDING, IN_PROGRESS, FINISHED]
+            statuses += [s for s in self.indexes.statuses() if s not in statuses]
+
+            def apply(status):
+                if not status.strip():
+                    raise ValidationError("Status is required")
+                self.core.set_services_status(service_ids, status.strip())
+
+            self.choose("Set Status", f"Status for {len(service_ids):,} services",
+                        statuses, apply)
+
+        def reassign():
+            service_ids = selected_services("reassign")
+            if not service_ids:
+                return
+            queue = "— Back to the queue —"
+
+            def apply(name):
+                if name == queue:
+                    self.core.reassign_services(service_ids, None)
+                    return
+                worker_id = self.core.worker_id(name.strip())
+                if worker_id is None:
+                    raise ValidationError("No worker by that name")
+                self.core.reassign_services(service_ids, worker_id)
+
+            self.choose("Reassign", f"Assign {len(service_ids):,} services to",
+                        [queue] + sorted(self.indexes.worker_by_name), apply)
 
         def show_details():
             selected = tree.selection()
             if not selected:
                 messagebox.showwarning("Error", "Please select a service")
                 return
-            idx = int(selected[0])
-            client_name = self.services[idx]["client"]
-            if client_name in self.clients:
-                user = self.clients[client_name]
-                details = f"""
-Name: {client_name}
-Location: {user['location']}
-Joined: {user['joined']}
-Computer: {user['computer']}
-Payment History:
-- {'\n- '.join(user['payments']) if user['payments'] else 'No Payments'}
-"""
-                messagebox.showinfo("User Details", details)
+            service = self.store.get_service(int(selected[0]))
+            if service:
+                self.show_client_details(service["client"])
 
         add_manual_btn = ctk.CTkButton(btn_frame, text="✍ Add Manual Service",
                                        fg_color="#FFD700", text_color="black",
@@ -341,6 +764,18 @@ Payment History:
                                     command=show_details)
         details_btn.grid(row=0, column=4, padx=10)
 
+        status_btn = ctk.CTkButton(btn_frame, text="⇄ Set Status",
+                                   fg_color="#6A5ACD", text_color="white",
+                                   command=set_status)
+        status_btn.grid(row=1, column=1, padx=10, pady=(10, 0))
+
+        reassign_btn = ctk.CTkButton(btn_frame, text="👷 Reassign",
+                                     fg_color="#20B2AA", text_color="white",
+                                     command=reassign)
+        reassign_btn.grid(row=1, column=2, padx=10, pady=(10, 0))
+
+        return tree.refresh
+
     # ---------------- Orders ----------------
     def show_orders(self, parent=None):
         frame = parent if parent else self.main_frame
@@ -348,11 +783,117 @@ Payment History:
                            font=("Arial", 20, "bold"), text_color="black")
         lbl.pack(pady=20)
 
-        for order in self.orders:
-            o_lbl = ctk.CTkLabel(frame,
-                                 text=f"• {order['date']} - {order['client']} ordered {order['type']}",
-                                 font=("Arial", 16), text_color="black")
-            o_lbl.pack(anchor="w", padx=20, pady=5)
+        list_frame = ctk.CTkFrame(frame, fg_color="white")
+        list_frame.pack(fill="x")
+
+        def refresh():
+            for widget in list_frame.winfo_children():
+                widget.destroy()
+            for order in self.store.orders():
+                o_lbl = ctk.CTkLabel(list_frame,
+                                     text=f"• {order['date']} - {order['client']} ordered {order['type']}",
+                                     font=("Arial", 16), text_color="black")
+                o_lbl.pack(anchor="w", padx=20, pady=5)
+
+        refresh()
+        return refresh
+
+    # ---------------- Payments ----------------
+    def show_payments(self, parent=None):
+        frame = parent if parent else self.main_frame
+        lbl = ctk.CTkLabel(frame, text="💰 Payments & Revenue",
+                           font=("Arial", 20, "bold"), text_color="black")
+        lbl.pack(pady=20)
+
+        summary_lbl = ctk.CTkLabel(frame, text="", font=("Arial", 16), text_color="black")
+        summary_lbl.pack(pady=5)
+
+        tables = ctk.CTkFrame(frame, fg_color="white")
+        tables.pack(fill="both", expand=True, padx=20, pady=10)
+
+        months = ttk.Treeview(tables, columns=("Month", "Revenue", "Payments"),
+                              show="headings", height=12)
+        clients = ttk.Treeview(tables, columns=("Client", "Paid", "Payments"),
+                               show="headings", height=12)
+        for tree in (months, clients):
+            for column in tree["columns"]:
+                tree.heading(column, text=column)
+                tree.column(column, width=140)
+        ctk.CTkLabel(tables, text="By Month", text_color="black").grid(row=0, column=0)
+        ctk.CTkLabel(tables, text="Top Clients", text_color="black").grid(row=0, column=1)
+        months.grid(row=1, column=0, sticky="nsew", padx=10)
+        clients.grid(row=1, column=1, sticky="nsew", padx=10)
+        tables.grid_columnconfigure((0, 1), weight=1)
+
+        shown_version = [None]
+
+        def refresh():
+            # Everything below reads the ledger's running aggregates; only
+            # the 30-day figure walks its date column
+            ledger = self.ledger
+            shown_version[0] = ledger.version
+            today = date.today()
+            this_month = today.year * 100 + today.month
+            last_30 = int((today - timedelta(days=30)).strftime("%Y%m%d"))
+            summary_lbl.configure(text=(
+                f"Total Revenue: {format_amount(ledger.total())} from {len(ledger):,} payments\n"
+                f"This Month: {format_amount(ledger.month_total(this_month))} · "
+                f"Last 30 Days: {format_amount(ledger.since(last_30))}"))
+
+            months.delete(*months.get_children())
+            for month, paise, n in ledger.monthly():
+                months.insert("", "end", values=(format_month(month), format_amount(paise), n))
+
+            top = ledger.top_clients()
+            names = {c["id"]: c["name"] for c in self.store.clients_by_ids([t[0] for t in top])}
+            clients.delete(*clients.get_children())
+            for client_id, paise, n in top:
+                clients.insert("", "end", values=(names.get(client_id, client_id),
+                                                  format_amount(paise), n))
+
+        def tick():
+            if self.current_view == "Payments" and self.ledger.version != shown_version[0]:
+                refresh()
+            self.after(self.PAYMENTS_REFRESH_MS, tick)
+
+        def add_payment():
+            win = ctk.CTkToplevel(self)
+            win.title("Add Payment")
+            win.geometry("400x350")
+
+            ctk.CTkLabel(win, text="Client").pack(pady=5)
+            entry_client = ctk.CTkEntry(win, width=250)
+            entry_client.pack(pady=5)
+
+            ctk.CTkLabel(win, text="Amount (₹)").pack(pady=5)
+            entry_amount = ctk.CTkEntry(win, width=250)
+            entry_amount.pack(pady=5)
+
+            ctk.CTkLabel(win, text="Date (blank for today)").pack(pady=5)
+            entry_date = ctk.CTkEntry(win, width=250)
+            entry_date.pack(pady=5)
+
+            def save_payment():
+                try:
+                    self.core.add_payment(entry_client.get(), entry_amount.get(),
+                                          entry_date.get())
+                except ValidationError as exc:
+                    messagebox.showwarning("Error", str(exc))
+                    return
+                win.destroy()
+                refresh()
+
+            ctk.CTkButton(win, text="Save Payment", fg_color="#32CD32", text_color="white",
+                          command=save_payment).pack(pady=20)
+            self.instrument_buttons(win, "Add Payment")
+
+        add_btn = ctk.CTkButton(frame, text="➕ Add Payment", fg_color="#32CD32",
+                                text_color="white", command=add_payment)
+        add_btn.pack(pady=10)
+
+        refresh()
+        self.after(self.PAYMENTS_REFRESH_MS, tick)
+        return refresh
 
     # ---------------- Worker Status ----------------
     def show_worker_status(self, parent=None):
@@ -361,15 +902,62 @@ Payment History:
                            font=("Arial", 20, "bold"), text_color="black")
         lbl.pack(pady=20)
 
-        tree = ttk.Treeview(frame, columns=("Name", "Location", "Status"),
-                            show="headings", height=10)
+        def row_values(w):
+            seen = self.heartbeats.last_seen(WORKER, w["name"])
+            return (w["name"], w["code"], w["location"], w["status"], job(w["id"]),
+                    format_seen(seen))
+
+        def job(worker_id):
+            service_id = self.dispatcher.job_for(worker_id)
+            service = self.store.get_service(service_id) if service_id is not None else None
+            return f"{service['task']} for {service['client']}" if service else "—"
+
+        def matches(w):
+            query = search_text()
+            return (location_filter.get() in ("All", w["location"])
+                    and (not query or self.search.matches("workers", w, query)))
+
+        def subset():
+            location, query = location_filter.get(), search_text()
+            if query:
+                hits = self.search.search("workers", query)
+                if location != "All":
+                    group = self.indexes.workers_at(location)
+                    hits = [i for i in hits if i in group]
+                return hits
+            if location != "All":
+                return self.indexes.workers_at(location)
+            return None
+
+        toolbar = ctk.CTkFrame(frame, fg_color="white")
+        toolbar.pack(fill="x", padx=20)
+        def refilter():
+            tree.clear_selection()
+            tree.refresh()
+
+        search_text = self.search_bar(toolbar, refilter, "workers")
+        location_filter, sync_locations = self.filter_menu(
+            toolbar, "Location", self.indexes.locations, refilter)
+
+        fetch, count, ids = self.table_source("workers", self.store.workers,
+                                              self.store.workers_by_ids, row_values, subset)
+        tree = VirtualTree(frame, columns=("Name", "Code", "Location", "Status", "Job",
+                                           "Last Seen"),
+                           height=10, fetch=fetch, count=count, ids=ids)
+        self.bind_tree(tree, "workers", row_values, matches)
+        self.show_last_seen(tree, WORKER, self.indexes.worker_by_name)
+        self.model.subscribe_batch("workers", sync_locations)
         tree.heading("Name", text="Name")
+        tree.heading("Code", text="Agent Code")
         tree.heading("Location", text="Location")
         tree.heading("Status", text="Status")
+        tree.heading("Job", text="Current Job")
+        tree.heading("Last Seen", text="Last Seen")
+        tree.sortable({"Name": "name", "Code": "code", "Location": "location",
+                       "Status": "status"})
         tree.pack(fill="x", padx=20, pady=10)
-
-        for idx, w in enumerate(self.workers):
-            tree.insert("", "end", iid=idx, values=(w["name"], w["location"], w["status"]))
+        selected_lbl = self.selection_label(toolbar, tree, "worker")
+        selected_lbl.pack(side="right")
 
         btn_frame = ctk.CTkFrame(frame, fg_color="white")
         btn_frame.pack(pady=10)
@@ -392,24 +980,17 @@ Payment History:
             entry_status.pack(pady=5)
 
             def save_worker():
-                name = entry_name.get().strip()
-                location = entry_location.get().strip()
-                status = entry_status.get().strip()
-
-                if not name or not location or not status:
-                    messagebox.showwarning("Error", "Name, Location, and Status are required")
-                    return
-
-                if any(w["name"] == name for w in self.workers):
-                    messagebox.showwarning("Error", "Worker name already exists!")
+                try:
+                    self.core.add_worker(entry_name.get(), entry_location.get(),
+                                         entry_status.get())
+                except ValidationError as exc:
+                    messagebox.showwarning("Error", str(exc))
                     return
-
-                self.workers.append({"name": name, "location": location, "status": status})
-                self.switch_menu(self.show_worker_status, "Worker Status")
                 win.destroy()
 
             ctk.CTkButton(win, text="Save Worker", fg_color="#32CD32", text_color="white",
                           command=save_worker).pack(pady=20)
+            self.instrument_buttons(win, "Add Worker")
 
         def edit_worker():
             selected = tree.selection()
@@ -417,8 +998,12 @@ Payment History:
                 messagebox.showwarning("Error", "Please select a worker to edit")
                 return
 
-            idx = int(selected[0])
-            worker = self.workers[idx]
+            worker_id = int(selected[0])
+            worker = self.store.get_worker(worker_id)
+            if worker is None:
+                # Deleted on another console since the view last synced
+                messagebox.showwarning("Error", "This worker no longer exists")
+                return
 
             win = ctk.CTkToplevel(self)
             win.title("Edit Worker")
@@ -440,30 +1025,38 @@ Payment History:
             entry_status.pack(pady=5)
 
             def save_edit():
-                name = entry_name.get().strip()
-                if name != worker["name"] and any(w["name"] == name for w in self.workers):
-                    messagebox.showwarning("Error", "Worker name already exists!")
+                try:
+                    self.core.update_worker(worker_id, entry_name.get(),
+                                            entry_location.get(), entry_status.get())
+                except ValidationError as exc:
+                    messagebox.showwarning("Error", str(exc))
                     return
-
-                worker["name"] = name
-                worker["location"] = entry_location.get().strip()
-                worker["status"] = entry_status.get().strip()
-                self.switch_menu(self.show_worker_status, "Worker Status")
                 win.destroy()
 
             ctk.CTkButton(win, text="Save Changes", fg_color="#32CD32", text_color="white",
                           command=save_edit).pack(pady=20)
+            self.instrument_buttons(win, "Edit Worker")
 
         def delete_worker():
             selected = tree.selection()
             if not selected:
-                messagebox.showwarning("Error", "Please select a worker to delete")
+                messagebox.showwarning("Error", "Please select the workers to delete")
+                return
+            worker_ids = [int(iid) for iid in selected]
+            noun = "this worker" if len(worker_ids) == 1 else f"these {len(worker_ids):,} workers"
+            if messagebox.askyesno("Confirm", f"Are you sure you want to delete {noun}?"):
+                self.core.delete_workers(worker_ids)
+                tree.clear_selection()
+
+        def set_status():
+            selected = tree.selection()
+            if not selected:
+                messagebox.showwarning("Error", "Please select the workers to change")
                 return
-            idx = int(selected[0])
-            confirm = messagebox.askyesno("Confirm", "Are you sure you want to delete this worker?")
-            if confirm:
-                del self.workers[idx]
-                self.switch_menu(self.show_worker_status, "Worker Status")
+            worker_ids = [int(iid) for iid in selected]
+            self.choose("Set Status", f"Status for {len(worker_ids):,} workers",
+                        [AVAILABLE, ON_TASK],
+                        lambda status: self.core.set_workers_status(worker_ids, status))
 
         add_btn = ctk.CTkButton(btn_frame, text="✍ Add Worker",
                                 fg_color="#FFD700", text_color="black",
@@ -480,6 +1073,13 @@ Payment History:
                                    command=delete_worker)
         delete_btn.grid(row=0, column=2, padx=10)
 
+        status_btn = ctk.CTkButton(btn_frame, text="⇄ Set Status",
+                                   fg_color="#6A5ACD", text_color="white",
+                                   command=set_status)
+        status_btn.grid(row=0, column=3, padx=10)
+
+        return tree.refresh
+
     # ---------------- Remote Desktop ----------------
     def show_remote_desktop(self, parent=None):
         frame = parent if parent else self.main_frame
@@ -487,14 +1087,106 @@ Payment History:
                            font=("Arial", 20, "bold"), text_color="black")
         lbl.pack(pady=20)
 
-        tree = ttk.Treeview(frame, columns=("Username", "Code"),
-                            show="headings", height=10)
+        def reachability(name):
+            result = self.prober.results.get(name)
+            if result is None:
+                return ("No address" if self.endpoints.get(name) is None else "—", "")
+            detail = f"{result.latency:.0f} ms" if result.online else (result.error or "")
+            return (result.status, detail)
+
+        def row_values(c):
+            seen = self.heartbeats.last_seen(CLIENT, c["name"])
+            return ((c["name"], c["code"]) + reachability(c["name"])
+                    + (c["location"], c["joined"], format_seen(seen, True)))
+
+        def matches(c):
+            query = search_text()
+            return not query or self.search.matches("clients", c, query)
+
+        def subset():
+            query = search_text()
+            return self.search.search("clients", query) if query else None
+
+        toolbar = ctk.CTkFrame(frame, fg_color="white")
+        toolbar.pack(fill="x", padx=20)
+        search_text = self.search_bar(toolbar, lambda: tree.refresh(), "clients")
+
+        fetch, count, ids = self.table_source("clients", self.store.client_codes,
+                                              self.store.clients_by_ids, row_values, subset)
+        tree = VirtualTree(frame, columns=("Username", "Code", "Status", "Latency", "Location",
+                                           "Joined", "Last Seen"),
+                           height=8, fetch=fetch, count=count, ids=ids)
+        self.bind_tree(tree, "clients", row_values, matches)
+        self.show_last_seen(tree, CLIENT, self.indexes.client_by_name, status=True)
         tree.heading("Username", text="Username")
         tree.heading("Code", text="Unique Code")
+        tree.heading("Status", text="Status")
+        tree.heading("Latency", text="Latency")
+        tree.heading("Location", text="Location")
+        tree.heading("Joined", text="Joined")
+        tree.heading("Last Seen", text="Last Seen")
+        tree.sortable({"Username": "name", "Code": "code", "Location": "location",
+                       "Joined": "joined"})
         tree.pack(fill="x", padx=20, pady=10)
 
-        for user, details in self.clients.items():
-            tree.insert("", "end", values=(user, details["code"]))
+        def show_reachability(name):
+            # Patch one row in place if it is loaded; unloaded rows pick up
+            # the cached result when they are fetched
+            client_id = self.indexes.client_by_name.get(name)
+            values = tree.cached_values(client_id) if client_id is not None else None
+            if values:
+                tree.update_row(client_id, tuple(values[:2]) + reachability(name)
+                                + tuple(values[4:]))
+
+        def on_endpoints(changes):
+            # Addresses another console set: the old probe result no longer
+            # applies to the row
+            if any(change.kind == RESET for change in changes):
+                tree.refresh()
+                return
+            for change in changes:
+                endpoint = change.record if change.record is not None else change.old
+                values = tree.cached_values(endpoint.client_id)
+                if values:
+                    self.prober.results.pop(values[0], None)
+                    show_reachability(values[0])
+
+        self.model.subscribe_batch("endpoints", on_endpoints)
+
+        def poll_probes():
+            for result in self.prober.drain():
+                show_reachability(result.client)
+            if self.prober.busy:
+                self.after(self.PROBE_POLL_MS, poll_probes)
+            else:
+                for result in self.prober.drain():
+                    show_reachability(result.client)
+
+        def check_online(force=True):
+            if self.prober.busy:
+                return
+            self.prober.probe_all(self.endpoints.items(), force=force)
+            self.after(self.PROBE_POLL_MS, poll_probes)
+
+        def ask_endpoint(username):
+            current = self.endpoints.get(username)
+            dialog = ctk.CTkInputDialog(
+                title="Client Address",
+                text=f"IP address for {username} (host or host:port)"
+                     + (f"\nCurrent: {current[0]}:{current[1]}" if current else ""))
+            value = (dialog.get_input() or "").strip()
+            if not value:
+                return None
+            host, _, port = value.partition(":")
+            if not port:
+                port = RDP_PORT
+            elif not port.isdigit():
+                messagebox.showwarning("Error", "Port must be a number")
+                return None
+            self.endpoints.set(username, host, int(port))
+            self.prober.results.pop(username, None)
+            show_reachability(username)
+            return self.endpoints.get(username)
 
         def connect_client():
             selected = tree.focus()
@@ -502,14 +1194,54 @@ Payment History:
                 messagebox.showwarning("Error", "Please select a client to connect")
                 return
 
-            values = tree.item(selected, "values")
-            username, code = values[0], values[1]
+            username = tree.item(selected, "values")[0]
+            endpoint = self.endpoints.get(username) or ask_endpoint(username)
+            if not endpoint:
+                return
+            host, port = endpoint
+            self.connections.connect(username, host, port)
+            refresh_sessions()
+
+        def view_screen():
+            selected = tree.focus()
+            if not selected:
+                messagebox.showwarning("Error", "Please select a client to view")
+                return
+            username = tree.item(selected, "values")[0]
+            endpoint = self.endpoints.get(username) or ask_endpoint(username)
+            client = self.store.get_client(username)
+            if endpoint and client:
+                self.show_screen(username, endpoint[0], client["code"])
 
-            client_ip = "192.168.1.100"  # Replace with real client IP
-            os.system(f"mstsc /v:{client_ip}")
+        def send_file():
+            selected = tree.focus()
+            if not selected:
+                messagebox.showwarning("Error", "Please select a client to send to")
+                return
+            username = tree.item(selected, "values")[0]
+            endpoint = self.endpoints.get(username) or ask_endpoint(username)
+            client = self.store.get_client(username)
+            if not endpoint or not client:
+                return
+            path = filedialog.askopenfilename(parent=self, title=f"Send a file to {username}")
+            if not path:
+                return
+            overwrite = messagebox.askyesno(
+                "Send File", f"Replace {os.path.basename(path)} on {username} if it is already there?")
+            try:
+                self.transfers.send(username, endpoint[0], client["code"], path,
+                                    overwrite=overwrite)
+            except (QueueFull, OSError) as exc:
+                messagebox.showwarning("Error", str(exc))
+                return
+            refresh_transfers()
 
-            messagebox.showinfo("Connecting",
-                                f"Attempting remote connection to {username} ({client_ip})")
+        def set_address():
+            selected = tree.focus()
+            if not selected:
+                messagebox.showwarning("Error", "Please select a client")
+                return
+            ask_endpoint(tree.item(selected, "values")[0])
 
         def show_details():
             selected = tree.focus()
@@ -518,32 +1250,474 @@ Payment History:
                 return
 
             values = tree.item(selected, "values")
-            username = values[0]
-            if username in self.clients:
-                user = self.clients[username]
-                details = f"""
-Name: {username}
-Location: {user['location']}
-Joined: {user['joined']}
-Computer: {user['computer']}
-Payment History:
-- {'\n- '.join(user['payments']) if user['payments'] else 'No Payments'}
-"""
-                messagebox.showinfo("User Details", details)
+            self.show_client_details(values[0])
+
+        btn_frame = ctk.CTkFrame(frame, fg_color="white")
+        btn_frame.pack(pady=10)
 
         connect_btn = ctk.CTkButton(
-            frame, text="🔗 Connect to Client",
+            btn_frame, text="🔗 Connect to Client",
             fg_color="#FFD700", text_color="black",
             command=connect_client
         )
-        connect_btn.pack(pady=10)
+        connect_btn.grid(row=0, column=0, padx=10, pady=5)
+
+        send_btn = ctk.CTkButton(
+            btn_frame, text="📤 Send File",
+            fg_color="#FFD700", text_color="black",
+            command=send_file
+        )
+        send_btn.grid(row=0, column=1, padx=10, pady=5)
+
+        address_btn = ctk.CTkButton(
+            btn_frame, text="🌐 Set Address",
+            fg_color="#FFA500", text_color="white",
+            command=set_address
+        )
+        address_btn.grid(row=1, column=0, padx=10, pady=5)
 
         details_btn = ctk.CTkButton(
-            frame, text="ℹ Show User Details",
+            btn_frame, text="ℹ Show User Details",
             fg_color="#1E90FF", text_color="white",
             command=show_details
         )
-        details_btn.pack(pady=10)
+        details_btn.grid(row=1, column=1, padx=10, pady=5)
+
+        probe_btn = ctk.CTkButton(
+            btn_frame, text="📡 Check Online",
+            fg_color="#32CD32", text_color="white",
+            command=check_online
+        )
+        probe_btn.grid(row=1, column=2, padx=10, pady=5)
+
+        screen_btn = ctk.CTkButton(
+            btn_frame, text="🖥 View Screen",
+            fg_color="#8A2BE2", text_color="white",
+            command=view_screen
+        )
+        screen_btn.grid(row=0, column=2, padx=10, pady=5)
+
+        # === Live Sessions ===
+        ctk.CTkLabel(frame, text="Sessions", font=("Arial", 16, "bold"),
+                     text_color="black").pack(pady=(10, 0))
+
+        sessions = ttk.Treeview(frame, columns=("Client", "Address", "State", "Elapsed"),
+                                show="headings", height=5)
+        for column in ("Client", "Address", "State", "Elapsed"):
+            sessions.heading(column, text=column)
+        sessions.pack(fill="x", padx=20, pady=10)
+
+        def refresh_sessions():
+            live = self.connections.sessions()
+            ids = {str(s.id) for s in live}
+            for iid in sessions.get_children():
+                if iid not in ids:
+                    sessions.delete(iid)
+            for s in live:
+                state = f"{s.state}: {s.error}" if s.error else s.state
+                values = (s.client, f"{s.host}:{s.port}", state, format_elapsed(s.elapsed))
+                if sessions.exists(str(s.id)):
+                    sessions.item(str(s.id), values=values)
+                else:
+                    sessions.insert("", "end", iid=str(s.id), values=values)
+
+        def tick():
+            if self.current_view == "Remote Desktop":
+                refresh_sessions()
+                refresh_transfers()
+            self.after(self.SESSIONS_REFRESH_MS, tick)
+
+        def disconnect():
+            selected = sessions.selection()
+            if not selected:
+                messagebox.showwarning("Error", "Please select a session to disconnect")
+                return
+            for iid in selected:
+                self.connections.disconnect(int(iid))
+
+        def clear_finished():
+            self.connections.clear_finished()
+            refresh_sessions()
+
+        session_btns = ctk.CTkFrame(frame, fg_color="white")
+        session_btns.pack(pady=5)
+
+        disconnect_btn = ctk.CTkButton(session_btns, text="⏹ Disconnect",
+                                       fg_color="red", text_color="white",
+                                       command=disconnect)
+        disconnect_btn.grid(row=0, column=0, padx=10)
+
+        clear_btn = ctk.CTkButton(session_btns, text="🧹 Clear Finished",
+                                  fg_color="#1E90FF", text_color="white",
+                                  command=clear_finished)
+        clear_btn.grid(row=0, column=1, padx=10)
+
+        # === File Transfers ===
+        ctk.CTkLabel(frame, text="File Transfers", font=("Arial", 16, "bold"),
+                     text_color="black").pack(pady=(10, 0))
+
+        transfers = ttk.Treeview(frame, columns=("Client", "File", "State", "Progress", "Rate"),
+                                 show="headings", height=3)
+        for column in ("Client", "File", "State", "Progress", "Rate"):
+            transfers.heading(column, text=column)
+        transfers.pack(fill="x", padx=20, pady=10)
+
+        def refresh_transfers():
+            live = self.transfers.transfers()
+            ids = {str(t.id) for t in live}
+            for iid in transfers.get_children():
+                if iid not in ids:
+                    transfers.delete(iid)
+            for t in live:
+                state = f"{t.state}: {t.error}" if t.error else t.state
+                progress = f"{t.fraction:.0%} ({t.done}/{t.chunks} chunks)"
+                rate = f"{t.rate / 2 ** 20:,.1f} MiB/s" if t.started else "—"
+                values = (t.client, t.name, state, progress, rate)
+                if transfers.exists(str(t.id)):
+                    transfers.item(str(t.id), values=values)
+                else:
+                    transfers.insert("", "end", iid=str(t.id), values=values)
+
+        def selected_transfers(action):
+            selected = transfers.selection()
+            if not selected:
+                messagebox.showwarning("Error", f"Please select a transfer to {action}")
+            return [int(iid) for iid in selected]
+
+        def cancel_transfers():
+            for transfer_id in selected_transfers("cancel"):
+                self.transfers.cancel(transfer_id)
+
+        def resume_transfers():
+            for transfer_id in selected_transfers("resume"):
+                self.transfers.resume(transfer_id)
+            refresh_transfers()
+
+        def clear_transfers():
+            self.transfers.clear_finished()
+            refresh_transfers()
+
+        transfer_btns = ctk.CTkFrame(frame, fg_color="white")
+        transfer_btns.pack(pady=5)
+
+        cancel_btn = ctk.CTkButton(transfer_btns, text="⏹ Cancel",
+                                   fg_color="red", text_color="white",
+                                   command=cancel_transfers)
+        cancel_btn.grid(row=0, column=0, padx=10)
+
+        resume_btn = ctk.CTkButton(transfer_btns, text="⏯ Resume",
+                                   fg_color="#32CD32", text_color="white",
+                                   command=resume_transfers)
+        resume_btn.grid(row=0, column=1, padx=10)
+
+        clear_transfers_btn = ctk.CTkButton(transfer_btns, text="🧹 Clear Finished",
+                                            fg_color="#1E90FF", text_color="white",
+                                            command=clear_transfers)
+        clear_transfers_btn.grid(row=0, column=2, padx=10)
+
+        self.after(self.SESSIONS_REFRESH_MS, tick)
+        check_online(force=False)
+        return tree.refresh
+
+    def show_screen(self, username, host, code, port=SCREEN_PORT):
+        # Native viewer for a client's screen agent (see screen.py). Frames
+        # are decoded on the background loop into the viewer's buffer; each
+        # tick copies only the regions that changed into one PhotoImage.
+        viewer = ScreenViewer(self.background, host, code, port)
+        viewer.connect()
+
+        win = ctk.CTkToplevel(self)
+        win.title(f"Screen · {username}")
+        status = ctk.CTkLabel(win, text=f"Connecting to {host}:{port}...", text_color="black")
+        status.pack(pady=5)
+        canvas = Canvas(win, width=640, height=360, bg="black", highlightthickness=0)
+        canvas.pack(padx=10, pady=(0, 10))
+        image = {}
+        moved = {}
+
+        def draw():
+            if not win.winfo_exists():
+                return
+            with self.metrics.timed(TIMER, "screen"):
+                if "photo" not in image and viewer.size:
+                    width, height = viewer.size
+                    image["photo"] = PhotoImage(master=win, width=width, height=height)
+                    canvas.configure(width=width, height=height)
+                    canvas.create_image(0, 0, image=image["photo"], anchor="nw")
+                started = time.perf_counter()
+                tiles, frames, number = viewer.take()
+                photo = image.get("photo")
+                for x, y, w, h in tiles:
+                    photo.tk.call(photo.name, "put", viewer.decoder.ppm(x, y, w, h),
+                                  "-format", "ppm", "-to", x, y)
+                viewer.rendered(frames, number, time.perf_counter() - started)
+                if moved:
+                    viewer.send_input(dict(moved, type="move"))
+                    moved.clear()
+            if viewer.state in (CLOSED, FAILED):
+                status.configure(text=f"{viewer.state}: {viewer.error}" if viewer.error
+                                 else viewer.state)
+                return
+            if viewer.frames:
+                status.configure(text=f"{viewer.measured_fps} fps (asking {viewer.fps}) · "
+                                      f"{viewer.bytes_per_frame / 1024:,.1f} KiB/frame")
+            self.after(self.SCREEN_POLL_MS, draw)
+
+        # Input goes to the agent as it happens, except mouse moves, which
+        # are coalesced to the latest position once per tick
+        def on_move(event):
+            moved.update(x=event.x, y=event.y)
+
+        def on_click(event):
+            canvas.focus_set()
+            viewer.send_input({"type": "click", "x": event.x, "y": event.y, "button": event.num})
+
+        def on_key(event):
+            viewer.send_input({"type": "key", "key": event.keysym})
+
+        def close():
+            viewer.close()
+            win.destroy()
+
+        canvas.bind("<Motion>", on_move)
+        canvas.bind("<ButtonPress>", on_click)
+        canvas.bind("<KeyPress>", on_key)
+        win.protocol("WM_DELETE_WINDOW", close)
+        self.after(self.SCREEN_POLL_MS, draw)
+
+    # ---------------- Import / Export ----------------
+    def show_import_export(self, parent=None):
+        frame = parent if parent else self.main_frame
+        lbl = ctk.CTkLabel(frame, text="📦 Import / Export",
+                           font=("Arial", 20, "bold"), text_color="black")
+        lbl.pack(pady=20)
+
+        toolbar = ctk.CTkFrame(frame, fg_color="white")
+        toolbar.pack(pady=10)
+        ctk.CTkLabel(toolbar, text="Records", text_color="black").pack(side="left", padx=(0, 10))
+        table_var = ctk.StringVar(value="clients")
+        ctk.CTkOptionMenu(toolbar, variable=table_var, values=sorted(FIELDS)).pack(side="left")
+
+        progress_bar = ctk.CTkProgressBar(frame, width=500)
+        progress_bar.set(0)
+        progress_bar.pack(pady=10)
+
+        status = ctk.CTkLabel(frame, text="CSV with a header row, or JSONL with one record per line",
+                              text_color="black")
+        status.pack(pady=5)
+
+        errors_box = ctk.CTkTextbox(frame, width=700, height=250)
+        errors_box.pack(pady=10)
+
+        job = {}
+
+        def run(action, path):
+            # The file is streamed on a worker thread with its own connection;
+            # the Tk thread only polls the shared Progress
+            table = table_var.get()
+            progress = Progress(table)
+            transfer = import_file if action == "import" else export_file
+            db_path = self.store.path
+
+            def work():
+                store = Store(db_path, seed=False)
+                # Journaled as this console's own, which then resets once
+                # when the import is done rather than on every chunk
+                store.origin = self.store.origin
+                try:
+                    return transfer(store, table, path, progress=progress)
+                finally:
+                    store.close()
+
+            job.update(action=action, progress=progress,
+                       future=self.background.submit(asyncio.to_thread(work)))
+            errors_box.delete("1.0", "end")
+            progress_bar.set(0)
+            set_busy(True)
+            self.after(self.BULK_POLL_MS, poll)
+
+        def poll():
+            action, progress, future = job["action"], job["progress"], job["future"]
+            verb = "imported" if action == "import" else "exported"
+            progress_bar.set(progress.fraction)
+            status.configure(text=f"{progress.imported:,} {progress.table} {verb}, "
+                                  f"{progress.error_count:,} error(s)")
+            if not future.done():
+                self.after(self.BULK_POLL_MS, poll)
+                return
+
+            set_busy(False)
+            error = future.exception()
+            if error is not None:
+                status.configure(text=f"{action.capitalize()} failed: {error}")
+            else:
+                stopped = " (cancelled)" if progress.cancelled else ""
+                status.configure(text=f"{progress.imported:,} {progress.table} {verb} in "
+                                      f"{progress.elapsed:.1f}s, {progress.error_count:,} "
+                                      f"error(s){stopped}")
+            lines = [f"line {line}: {message}" for line, message in sorted(progress.errors)]
+            if progress.error_count > len(progress.errors):
+                lines.append(f"... and {progress.error_count - len(progress.errors):,} more")
+            errors_box.insert("end", "\n".join(lines))
+
+            if action == "import" and progress.imported:
+                # Indexes, search, counters and table views reload once
+                with self.model.reading():
+                    self.model.reset(progress.table)
+                    if progress.table == "clients":
+                        # Imported clients bring their payments with them
+                        self.model.reset("payments")
+                    elif progress.table == "services":
+                        # and services put the workers they name On Task
+                        self.model.reset("workers")
+                self.refresh_views("Orders")
+
+        def start_import():
+            path = filedialog.askopenfilename(parent=self, filetypes=self.BULK_FILETYPES)
+            if path:
+                run("import", path)
+
+        def start_export():
+            path = filedialog.asksaveasfilename(parent=self, filetypes=self.BULK_FILETYPES,
+                                                defaultextension=".csv",
+                                                initialfile=f"{table_var.get()}.csv")
+            if path:
+                run("export", path)
+
+        def cancel():
+            if job:
+                job["progress"].cancel()
+
+        def set_busy(busy):
+            import_btn.configure(state="disabled" if busy else "normal")
+            export_btn.configure(state="disabled" if busy else "normal")
+            cancel_btn.configure(state="normal" if busy else "disabled")
+
+        btn_frame = ctk.CTkFrame(frame, fg_color="white")
+        btn_frame.pack(pady=10)
+
+        import_btn = ctk.CTkButton(btn_frame, text="📥 Import File",
+                                   fg_color="#32CD32", text_color="white",
+                                   command=start_import)
+        import_btn.grid(row=0, column=0, padx=10)
+
+        export_btn = ctk.CTkButton(btn_frame, text="📤 Export File",
+                                   fg_color="#1E90FF", text_color="white",
+                                   command=start_export)
+        export_btn.grid(row=0, column=1, padx=10)
+
+        cancel_btn = ctk.CTkButton(btn_frame, text="⏹ Cancel",
+                                   fg_color="red", text_color="white",
+                                   state="disabled", command=cancel)
+        cancel_btn.grid(row=0, column=2, padx=10)
+
+    # ---------------- Diagnostics ----------------
+    def show_diagnostics(self, parent=None):
+        frame = parent if parent else self.main_frame
+        lbl = ctk.CTkLabel(frame, text="🩺 Diagnostics",
+                           font=("Arial", 20, "bold"), text_color="black")
+        lbl.pack(pady=20)
+
+        toolbar = ctk.CTkFrame(frame, fg_color="white")
+        toolbar.pack(fill="x", padx=20)
+
+        def toggle():
+            self.metrics.enabled = enabled.get()
+            if self.metrics.enabled:
+                self.lag_monitor.start()
+            refresh()
+
+        enabled = ctk.BooleanVar(value=self.metrics.enabled)
+        ctk.CTkSwitch(toolbar, text="Record timings", variable=enabled,
+                      command=toggle).pack(side="left")
+        lag_lbl = ctk.CTkLabel(toolbar, text="", text_color="black")
+        lag_lbl.pack(side="left", padx=20)
+
+        if self.metrics_server is not None:
+            export = f"Prometheus: http://127.0.0.1:{self.metrics_server.port}/metrics"
+        elif HTTP_PORT:
+            export = f"Prometheus: port {HTTP_PORT} unavailable"
+        elif TEXTFILE:
+            export = f"Prometheus: {TEXTFILE}"
+        else:
+            export = "Prometheus export: set YESWAY_METRICS_PORT or YESWAY_METRICS_FILE"
+        ctk.CTkLabel(toolbar, text=export, text_color="gray").pack(side="right")
+
+        # Heartbeat listener: where it listens, or why it can't, a port to
+        # move it to when the default one is taken, and whether agents on
+        # other machines may reach it (loopback only by default)
+        listener = ctk.CTkFrame(frame, fg_color="white")
+        listener.pack(fill="x", padx=20, pady=(10, 0))
+        heartbeat_lbl = ctk.CTkLabel(listener, text="", text_color="black")
+        heartbeat_lbl.pack(side="left")
+        port_entry = ctk.CTkEntry(listener, width=80)
+        port_entry.insert(0, str(self.heartbeats.port))
+
+        def listen():
+            try:
+                port = int(port_entry.get())
+                if not 0 < port < 65536:
+                    raise ValueError
+            except ValueError:
+                messagebox.showwarning("Error", "Port must be a number from 1 to 65535")
+                return
+            self.heartbeats.restart(port, ALL_INTERFACES if remote.get() else LOOPBACK)
+            heartbeat_lbl.configure(text=f"Heartbeats: starting on port {port}...",
+                                    text_color="black")
+
+        ctk.CTkButton(listener, text="Listen", width=80, fg_color="#1E90FF", text_color="white",
+                      command=listen).pack(side="right")
+        port_entry.pack(side="right", padx=5)
+        ctk.CTkLabel(listener, text="Heartbeat port", text_color="gray").pack(side="right")
+        remote = ctk.BooleanVar(value=self.heartbeats.host != LOOPBACK)
+        ctk.CTkCheckBox(listener, text="Accept from other machines", variable=remote,
+                        text_color="black").pack(side="right", padx=10)
+
+        columns = ("Metric", "Label", "Count", "p50", "p95", "Max", "Mean")
+        tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=260 if column == "Label" else 90)
+        tree.pack(fill="both", expand=True, padx=20, pady=10)
+
+        def ms(seconds):
+            return f"{seconds * 1000:.1f} ms"
+
+        def refresh():
+            # A few dozen series at most, so rebuilding the rows is fine
+            tree.delete(*tree.get_children())
+            for (name, label), h in self.metrics.series():
+                short = name.removeprefix("yesway_").removesuffix("_seconds")
+                tree.insert("", "end", values=(
+                    short, label or "", h.count, ms(h.quantile(0.5)), ms(h.quantile(0.95)),
+                    ms(h.max), ms(h.sum / h.count if h.count else 0.0)))
+            lag = ms(self.lag_monitor.last) if self.metrics.enabled else "off"
+            lag_lbl.configure(text=f"Mainloop lag: {lag}")
+            hb = self.heartbeats
+            if hb.error:
+                heartbeat_lbl.configure(text=f"Heartbeats: cannot listen on {hb.host}:{hb.port} "
+                                             f"({hb.error})", text_color="red")
+            elif hb.listening:
+                heartbeat_lbl.configure(text=f"Heartbeats: listening on {hb.host}:{hb.port} · "
+                                             f"{hb.received:,} received, {hb.rejected:,} rejected",
+                                        text_color="black")
+
+        def tick():
+            if self.current_view == "Diagnostics":
+                refresh()
+            self.after(self.DIAGNOSTICS_REFRESH_MS, tick)
+
+        def reset():
+            self.metrics.reset()
+            refresh()
+
+        reset_btn = ctk.CTkButton(frame, text="🧹 Reset", fg_color="#1E90FF",
+                                  text_color="white", command=reset)
+        reset_btn.pack(pady=10)
+
+        refresh()
+        self.after(self.DIAGNOSTICS_REFRESH_MS, tick)
+        return refresh
 
 
 # ------------------- Run -------------------
@@ -552,3 +1726,5 @@ if __name__ == "__main__":
     ctk.set_default_color_theme("green")
     app = AdminApp()
     app.mainloop()
+    # The next start loads this instead of reading every table
+    app.core.save_snapshot()
@@ -0,0 +1,547 @@
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+from connections import CLOSED, FAILED, RUNNING, STARTING
+
+SCREEN_PORT = int(os.environ.get("YESWAY_SCREEN_PORT", "47900"))
+
+# Frames are cut into square tiles; only those that changed are sent
+TILE = 64
+# zlib level for tiles: screen content compresses well even at the
+# fastest level, and encoding time is what limits the frame rate
+COMPRESSION = 1
+
+MAX_FPS = 30
+MIN_FPS = 2
+# Frames an agent sends ahead of the viewer's acknowledgements. Keeps the
+# pipe full without letting a slow viewer queue up stale frames.
+IN_FLIGHT = 2
+
+# Largest message either side accepts; a full 4K frame of incompressible
+# tiles still fits
+MAX_PAYLOAD = 64 * 1024 * 1024
+MAX_INPUT = 4096
+MAX_CODE = 64
+
+
+# ------------------- Wire Format -------------------
+# Every message is a header (kind, payload length) and a payload:
+#
+#   AUTH   viewer -> agent  the client's code, UTF-8; must come first
+#   HELLO  agent -> viewer  width, height, tile size (RGB, 3 bytes a pixel)
+#   FRAME  agent -> viewer  frame number, tile count, then per tile its
+#                           column, row, length and zlib-compressed pixels
+#   ACK    viewer -> agent  last frame shown, frame rate the viewer wants
+#   INPUT  viewer -> agent  one input event as JSON, e.g.
+#                           {"type": "click", "x": 10, "y": 20, "button": 1}
+#
+# A tile's pixels are its rows top to bottom; tiles on the right and
+# bottom edges are cut to the screen.
+HELLO, FRAME, ACK, INPUT, AUTH = 1, 2, 3, 4, 5
+
+HEADER = struct.Struct("!BI")
+HELLO_BODY = struct.Struct("!HHH")
+FRAME_BODY = struct.Struct("!IH")
+TILE_HEADER = struct.Struct("!HHI")
+ACK_BODY = struct.Struct("!IH")
+
+
+async def read_message(reader):
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_PAYLOAD:
+        raise ValueError(f"message of {length} bytes")
+    return kind, await reader.readexactly(length)
+
+
+def message(kind, *parts):
+    # Header and payload parts, ready for writer.writelines()
+    return [HEADER.pack(kind, sum(len(part) for part in parts)), *parts]
+
+
+def tile_grid(width, height, tile=TILE):
+    """(column, row, x, y, tile width, tile height) for every tile, band by band."""
+    return [(col, row, x, y, min(tile, width - x), min(tile, height - y))
+            for row, y in enumerate(range(0, height, tile))
+            for col, x in enumerate(range(0, width, tile))]
+
+
+# ------------------- Tile Encoder -------------------
+# Keeps the last frame it sent and returns only the tiles that differ
+# from it. Each band of tiles (TILE scanlines) is compared in one go
+# first, so a still screen costs a dozen memcmps per frame. Comparisons
+# use bytearray.startswith() against memoryview slices, which compares in
+# place instead of copying the slices out.
+class TileEncoder:
+    def __init__(self, width, height, tile=TILE, level=COMPRESSION):
+        self.width = width
+        self.height = height
+        self.level = level
+        self.stride = width * 3
+        self.previous = None
+        stride = self.stride
+        self.bands = []
+        for y in range(0, height, tile):
+            rows = min(tile, height - y)
+            tiles = []
+            for col, row, x, _, w, h in tile_grid(width, height, tile):
+                if row * tile == y:
+                    # byte offset of each of the tile's rows, row length in bytes
+                    tiles.append((col, row, [(y + r) * stride + x * 3 for r in range(h)], w * 3))
+            self.bands.append((y * stride, (y + rows) * stride, tiles))
+
+    def encode(self, frame):
+        """[(column, row, compressed pixels)] for the tiles changed since the last call."""
+        frame = memoryview(frame).cast("B")
+        if len(frame) != self.stride * self.height:
+            raise ValueError(f"frame of {len(frame)} bytes, expected {self.stride * self.height}")
+        first = self.previous is None
+        if first:
+            self.previous = bytearray(frame)
+        previous, compress, level = self.previous, zlib.compress, self.level
+        changed = []
+        for start, end, tiles in self.bands:
+            if not first and previous.startswith(frame[start:end], start):
+                continue
+            for col, row, offsets, length in tiles:
+                if not first and all(previous.startswith(frame[o:o + length], o) for o in offsets):
+                    continue
+                rows = [frame[o:o + length] for o in offsets]
+                if not first:
+                    for o, pixels in zip(offsets, rows):
+                        previous[o:o + length] = pixels
+                changed.append((col, row, compress(b"".join(rows), level)))
+        return changed
+
+
+# ------------------- Tile Decoder -------------------
+# The viewer's copy of the remote screen: one preallocated RGB buffer that
+# every frame's tiles are written into row by row through memoryviews, so
+# the payload is never sliced into copies. The buffer is the only place
+# pixels are kept: the UI reads each changed region back out of it with
+# ppm(), so a tile that changed in several frames since the last draw is
+# drawn once, from its newest pixels. Writing a frame and reading a region
+# hold the same lock, so a region is never read half-written.
+class TileDecoder:
+    def __init__(self, width, height, tile=TILE):
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.stride = width * 3
+        self.buffer = bytearray(self.stride * height)
+        self.view = memoryview(self.buffer)
+        self.lock = threading.Lock()
+
+    def decode(self, payload):
+        """(frame number, [(x, y, w, h)]) from a FRAME payload, applied to buffer."""
+        data = memoryview(payload)
+        number, count = FRAME_BODY.unpack_from(data, 0)
+        position = FRAME_BODY.size
+        decoded = []
+        tile = self.tile
+        # Decompress outside the lock; only the copies into the buffer hold it
+        for _ in range(count):
+            col, row, length = TILE_HEADER.unpack_from(data, position)
+            position += TILE_HEADER.size
+            pixels = zlib.decompress(data[position:position + length])
+            position += length
+            x, y = col * tile, row * tile
+            w, h = min(tile, self.width - x), min(tile, self.height - y)
+            if w <= 0 or h <= 0 or len(pixels) != w * h * 3:
+                raise ValueError(f"bad tile {col},{row}")
+            decoded.append((x, y, w, h, pixels))
+        view, stride = self.view, self.stride
+        with self.lock:
+            for x, y, w, h, pixels in decoded:
+                source, row_bytes = memoryview(pixels), w * 3
+                offset = y * stride + x * 3
+                for r in range(0, h * row_bytes, row_bytes):
+                    view[offset:offset + row_bytes] = source[r:r + row_bytes]
+                    offset += stride
+        return number, [region[:4] for region in decoded]
+
+    def ppm(self, x, y, w, h):
+        """The region as a binary PPM image, its rows read straight from the buffer."""
+        view, stride, row_bytes = self.view, self.stride, w * 3
+        start = y * stride + x * 3
+        with self.lock:
+            return b"".join([b"P6 %d %d 255\n" % (w, h)] +
+                            [view[o:o + row_bytes] for o in range(start, start + h * stride, stride)])
+
+
+# ------------------- Synthetic Screen -------------------
+# A frame source for trying the viewer anywhere: a static gradient, a box
+# bouncing across it, a seconds bar along the top and a cursor square that
+# follows the forwarded mouse. Only what moved is redrawn each frame, much
+# like a real desktop. A capture source needs the same members: width,
+# height, grab() returning the screen as RGB bytes and handle(event).
+class SyntheticScreen:
+    def __init__(self, width=1280, height=720, box=96, speed=240):
+        self.width = width
+        self.height = height
+        self.box = box
+        self.speed = speed
+        self.started = time.monotonic()
+        self.events = 0
+        self.clicks = 0
+        self.cursor = None
+        stride = width * 3
+        self.background = bytearray(stride * height)
+        for y in range(height):
+            shade = 40 + 120 * y // max(1, height - 1)
+            self.background[y * stride:(y + 1) * stride] = bytes((shade // 3, shade // 2, shade)) * width
+        self.frame = bytearray(self.background)
+        self._drawn = []
+
+    def _fill(self, x, y, w, h, color):
+        x, y = max(0, x), max(0, y)
+        w, h = min(w, self.width - x), min(h, self.height - y)
+        if w <= 0 or h <= 0:
+            return
+        stride, line = self.width * 3, bytes(color) * w
+        for row in range(y, y + h):
+            start = row * stride + x * 3
+            self.frame[start:start + w * 3] = line
+        self._drawn.append((x, y, w, h))
+
+    def _restore(self):
+        stride = self.width * 3
+        for x, y, w, h in self._drawn:
+            for row in range(y, y + h):
+                start = row * stride + x * 3
+                self.frame[start:start + w * 3] = self.background[start:start + w * 3]
+        self._drawn = []
+
+    def grab(self):
+        elapsed = time.monotonic() - self.started
+        self._restore()
+        # Bounce along both axes
+        span_x, span_y = self.width - self.box, self.height - self.box
+        x = int(elapsed * self.speed) % (2 * span_x or 1)
+        y = int(elapsed * self.speed * 0.6) % (2 * span_y or 1)
+        x, y = (x if x <= span_x else 2 * span_x - x), (y if y <= span_y else 2 * span_y - y)
+        color = (255, 200, 0) if self.clicks % 2 == 0 else (0, 200, 255)
+        self._fill(x, y, self.box, self.box, color)
+        self._fill(0, 0, int(self.width * (elapsed % 10) / 10), 8, (255, 255, 255))
+        if self.cursor is not None:
+            self._fill(self.cursor[0] - 4, self.cursor[1] - 4, 8, 8, (255, 0, 0))
+        return bytes(self.frame)
+
+    def handle(self, event):
+        self.events += 1
+        if "x" in event and "y" in event:
+            self.cursor = (int(event["x"]), int(event["y"]))
+        if event.get("type") == "click":
+            self.clicks += 1
+
+
+# ------------------- Screen Agent -------------------
+# Runs on the client machine and serves its screen to viewers that know
+# the client's code, the same secret its heartbeats carry. A viewer that
+# does not open with the right AUTH is dropped before it sees a frame or
+# can send input. Only loopback is served unless a host is given. Each
+# viewer gets its own encoder and pace: a frame is sent only while fewer
+# than IN_FLIGHT are unacknowledged, and no faster than the rate the
+# viewer last asked for.
+class ScreenAgent:
+    def __init__(self, source, code, host="127.0.0.1", port=SCREEN_PORT, max_fps=MAX_FPS):
+        if not code:
+            raise ValueError("a screen agent needs the client's code")
+        self.source = source
+        self.code = code.encode()
+        self.host = host
+        self.port = port
+        self.max_fps = max_fps
+        self.server = None
+        self.frames = 0
+        self.bytes = 0
+        self.encode_time = 0.0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._on_viewer, self.host, self.port)
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+    async def _authenticate(self, reader):
+        kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+        if kind != AUTH or length > MAX_CODE:
+            return False
+        return hmac.compare_digest(await reader.readexactly(length), self.code)
+
+    async def _on_viewer(self, reader, writer):
+        try:
+            allowed = await asyncio.wait_for(self._authenticate(reader), 10)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            allowed = False
+        if not allowed:
+            writer.close()
+            return
+        source = self.source
+        encoder = TileEncoder(source.width, source.height)
+        state = {"acked": 0, "fps": self.max_fps}
+        credit = asyncio.Event()
+
+        async def receive():
+            try:
+                while True:
+                    kind, payload = await read_message(reader)
+                    if kind == ACK:
+                        acked, fps = ACK_BODY.unpack(payload)
+                        state["acked"] = max(state["acked"], acked)
+                        state["fps"] = max(MIN_FPS, min(self.max_fps, fps))
+                        credit.set()
+                    elif kind == INPUT and len(payload) <= MAX_INPUT:
+                        source.handle(json.loads(payload))
+            finally:
+                # Wakes the sender to notice the viewer has gone
+                credit.set()
+
+        receiving = asyncio.ensure_future(receive())
+        try:
+            writer.writelines(message(HELLO, HELLO_BODY.pack(source.width, source.height, TILE)))
+            number = 0
+            loop = asyncio.get_running_loop()
+            while not receiving.done():
+                while number - state["acked"] >= IN_FLIGHT and not receiving.done():
+                    credit.clear()
+                    await credit.wait()
+                if receiving.done():
+                    break
+                started = loop.time()
+                frame = source.grab()
+                # zlib releases the GIL; input keeps flowing while encoding
+                tiles = await asyncio.to_thread(encoder.encode, frame)
+                self.encode_time += loop.time() - started
+                if tiles:
+                    number += 1
+                    parts = [FRAME_BODY.pack(number, len(tiles))]
+                    for col, row, pixels in tiles:
+                        parts += (TILE_HEADER.pack(col, row, len(pixels)), pixels)
+                    writer.writelines(message(FRAME, *parts))
+                    await writer.drain()
+                    self.frames += 1
+                    self.bytes += HEADER.size + sum(len(part) for part in parts)
+                await asyncio.sleep(max(0.0, 1 / state["fps"] - (loop.time() - started)))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            receiving.cancel()
+            writer.close()
+
+
+# ------------------- Screen Viewer -------------------
+# The console's end of a screen session. Frames are read and decoded on
+# the background loop; the Tk thread calls take() on a timer for the
+# tiles changed since its last call (only the newest copy of each tile,
+# however many frames arrived, read from the decoder's buffer with
+# decoder.ppm()) and then rendered(), which acknowledges
+# them and adapts the frame rate: it drops by a quarter when the UI fell
+# behind (frames were skipped, or drawing took over half a frame's time)
+# and creeps back up by one while it keeps up.
+class ScreenViewer:
+    def __init__(self, background, host, code, port=SCREEN_PORT, max_fps=MAX_FPS):
+        self.background = background
+        self.host = host
+        self.code = code
+        self.port = port
+        self.max_fps = max_fps
+        self.fps = max_fps
+        self.state = STARTING
+        self.error = None
+        self.decoder = None
+        self.size = None
+
+        self.frames = 0
+        self.bytes = 0
+        self.tiles = 0
+        self.decode_time = 0.0
+        self._arrivals = deque(maxlen=4 * MAX_FPS)
+        self._pending = {}
+        self._received = 0
+        self._last = 0
+        self._lock = threading.Lock()
+        self._writer = None
+
+    def connect(self):
+        return self.background.submit(self._run())
+
+    async def _run(self):
+        try:
+            reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._writer.writelines(message(AUTH, self.code.encode()))
+            try:
+                kind, payload = await read_message(reader)
+            except asyncio.IncompleteReadError:
+                raise ValueError("agent refused the client code") from None
+            if kind != HELLO:
+                raise ValueError("agent did not say hello")
+            width, height, tile = HELLO_BODY.unpack(payload)
+            self.decoder = TileDecoder(width, height, tile)
+            self.size = (width, height)
+            self.state = RUNNING
+            while True:
+                kind, payload = await read_message(reader)
+                if kind != FRAME:
+                    continue
+                started = time.perf_counter()
+                number, tiles = await asyncio.to_thread(self.decoder.decode, payload)
+                self.decode_time += time.perf_counter() - started
+                with self._lock:
+                    for tile in tiles:
+                        self._pending[tile[:2]] = tile
+                    self._received += 1
+                    self._last = number
+                self.frames += 1
+                self.tiles += len(tiles)
+                self.bytes += HEADER.size + len(payload)
+                self._arrivals.append(time.monotonic())
+        except asyncio.IncompleteReadError:
+            self.state = CLOSED
+        except (OSError, ValueError, zlib.error) as exc:
+            self.error = str(exc)
+            self.state = FAILED
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            if self.state in (STARTING, RUNNING):
+                self.state = CLOSED
+
+    # ---------------- Tk side ----------------
+    def take(self):
+        """(regions to draw, frames they cover, newest frame number) since the last call."""
+        with self._lock:
+            tiles, self._pending = list(self._pending.values()), {}
+            received, self._received = self._received, 0
+            return tiles, received, self._last
+
+    def rendered(self, frames, number, spent):
+        """Acknowledge frame `number`, `frames` of them drawn in `spent` seconds."""
+        if not frames:
+            return
+        if frames > 1 or spent > 0.5 / self.fps:
+            self.fps = max(MIN_FPS, self.fps * 3 // 4)
+        else:
+            self.fps = min(self.max_fps, self.fps + 1)
+        self._send(message(ACK, ACK_BODY.pack(number, self.fps)))
+
+    def send_input(self, event):
+        self._send(message(INPUT, json.dumps(event).encode()))
+
+    def _send(self, parts):
+        if self._writer is not None and self.state == RUNNING:
+            self.background.call_soon(self._writer.writelines, parts)
+
+    def close(self):
+        if self._writer is not None:
+            self.background.call_soon(self._writer.close)
+
+    @property
+    def measured_fps(self):
+        # Frames received over the last second
+        since = time.monotonic() - 1.0
+        return sum(1 for arrival in self._arrivals if arrival >= since)
+
+    @property
+    def bytes_per_frame(self):
+        return self.bytes / self.frames if self.frames else 0.0
+
+
+def _agent(args):
+    async def serve():
+        agent = ScreenAgent(SyntheticScreen(args.width, args.height), args.code, args.host,
+                            args.port, args.max_fps)
+        server = await agent.start()
+        print(f"synthetic {args.width}x{args.height} screen on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def _bench(args):
+    # Agent and viewer on separate loops over loopback, with this thread
+    # standing in for the Tk timer that draws and acknowledges frames
+    from background import BackgroundLoop
+
+    source = SyntheticScreen(args.width, args.height)
+    agent = ScreenAgent(source, "BENCH", "127.0.0.1", args.port, args.max_fps)
+    agent_loop = BackgroundLoop("screen-agent")
+    agent_loop.submit(agent.start()).result()
+    viewer = ScreenViewer(BackgroundLoop("screen-viewer"), "127.0.0.1", "BENCH", args.port,
+                          args.max_fps)
+    viewer.connect()
+
+    deadline = time.monotonic() + args.seconds
+    draws, moves = 0, 0
+    while time.monotonic() < deadline:
+        time.sleep(args.draw_ms / 1000)
+        started = time.perf_counter()
+        tiles, frames, number = viewer.take()
+        for region in tiles:
+            viewer.decoder.ppm(*region)
+        draws += len(tiles)
+        viewer.rendered(frames, number, time.perf_counter() - started)
+        if viewer.state == RUNNING:
+            moves += 1
+            viewer.send_input({"type": "move", "x": moves * 7 % args.width,
+                               "y": moves * 3 % args.height})
+        elif viewer.state in (CLOSED, FAILED):
+            break
+    viewer.close()
+    agent_loop.call_soon(agent.close)
+
+    if not viewer.frames:
+        raise SystemExit(f"No frames received: {viewer.error or viewer.state}")
+    raw = args.width * args.height * 3
+    print(f"frames    {viewer.frames} in {args.seconds:.1f}s ({viewer.frames / args.seconds:.1f} fps, "
+          f"{viewer.measured_fps} in the last second, asking for {viewer.fps})")
+    print(f"bytes     {viewer.bytes_per_frame / 1024:,.1f} KiB per frame "
+          f"(raw frame {raw / 1024:,.0f} KiB), {viewer.bytes * 8 / args.seconds / 1e6:.2f} Mbit/s")
+    print(f"tiles     {viewer.tiles / viewer.frames:.1f} per frame of {len(tile_grid(args.width, args.height))}, "
+          f"{draws} drawn")
+    print(f"encode    {agent.encode_time / max(1, agent.frames) * 1000:.2f} ms per frame, "
+          f"decode {viewer.decode_time / viewer.frames * 1000:.2f} ms per frame")
+    print(f"input     {moves} events sent, {source.events} applied by the agent")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tile-based remote screen streaming")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, run, port in (("agent", _agent, SCREEN_PORT), ("bench", _bench, SCREEN_PORT + 1)):
+        command = commands.add_parser(
+            name, help="serve a synthetic screen" if run is _agent
+            else "stream a synthetic screen over loopback and report fps and bytes per frame")
+        command.add_argument("--width", type=int, default=1280)
+        command.add_argument("--height", type=int, default=720)
+        command.add_argument("--max-fps", type=int, default=MAX_FPS)
+        command.add_argument("--port", type=int, default=port)
+        command.set_defaults(run=run)
+        if run is _agent:
+            command.add_argument("--code", required=True,
+                                 help="the client's code; viewers must present it")
+            command.add_argument("--host", default="127.0.0.1",
+                                 help="address to serve on; 0.0.0.0 for every interface")
+        else:
+            command.add_argument("--seconds", type=float, default=5.0)
+            command.add_argument("--draw-ms", type=float, default=16,
+                                 help="how often the stand-in UI draws")
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
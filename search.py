@@ -0,0 +1,253 @@
+import gc
+import re
+from bisect import bisect_left, insort
+
+from model import RESET, Subscriber
+
+TOKEN = re.compile(r"\w+")
+
+# Fields searched for each table
+SEARCH_FIELDS = {
+    "clients": ("name", "code", "location"),
+    "services": ("client", "task"),
+    "workers": ("name", "location"),
+}
+
+# Type-ahead only needs the first screens of hits; stopping early keeps a
+# one-letter query as cheap as a precise one.
+MAX_RESULTS = 1000
+
+# A secondary query word is turned into a set of ids when it has at most
+# this many times the postings of the word being walked.
+SET_FACTOR = 4
+
+
+def tokenize(*fields):
+    return set(TOKEN.findall(" ".join(map(str, fields)).casefold()))
+
+
+# ------------------- Prefix Index -------------------
+# Sorted list of distinct word tokens plus a posting list per token. A
+# query term is answered by bisecting to the first token with that prefix
+# and walking forward, so it never looks at records that cannot match.
+# Most tokens (names, codes) belong to a single record, so their posting
+# is the bare record id; a list only appears once a second record shares
+# the token. Each record's tokens point at the vocabulary's own strings,
+# so a location or task word shared by 10k records is stored once.
+#
+# Removing an id from a long posting list only notes it in stale; the list
+# is filtered once, the next time it is read. Deleting 10k records that
+# share a word is then one pass over its list rather than 10k. A list
+# always keeps at least two live ids, so the vocabulary never changes on
+# a read.
+class PrefixIndex:
+    def __init__(self):
+        self.tokens = []
+        self.postings = {}
+        self.docs = {}
+        self.stale = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def load(self, items):
+        # items: (record id, tokens); sorts the vocabulary once at the end
+        postings, docs = self.postings, self.docs
+        shared = {}
+        for record_id, tokens in items:
+            doc = []
+            for token in tokens:
+                posting = postings.get(token)
+                if posting is None:
+                    postings[token] = record_id
+                    shared[token] = token
+                else:
+                    token = shared[token]
+                    if type(posting) is int:
+                        postings[token] = [posting, record_id]
+                    else:
+                        posting.append(record_id)
+                doc.append(token)
+            docs[record_id] = tuple(doc)
+        self.tokens = sorted(postings)
+
+    def add(self, record_id, tokens):
+        postings, vocabulary = self.postings, self.tokens
+        shared = []
+        for token in tokens:
+            posting = postings.get(token)
+            if posting is None:
+                postings[token] = record_id
+                insort(vocabulary, token)
+            else:
+                token = vocabulary[bisect_left(vocabulary, token)]
+                stale = self.stale.get(token)
+                if type(posting) is int:
+                    postings[token] = [posting, record_id]
+                elif stale is not None and record_id in stale:
+                    # Removed and added back before the list was filtered
+                    stale.discard(record_id)
+                else:
+                    posting.append(record_id)
+            shared.append(token)
+        self.docs[record_id] = tuple(shared)
+
+    def remove(self, record_id):
+        postings, stale = self.postings, self.stale
+        for token in self.docs.pop(record_id, ()):
+            posting = postings[token]
+            if type(posting) is int:
+                del postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+                continue
+            removed = stale.setdefault(token, set())
+            removed.add(record_id)
+            if len(posting) - len(removed) == 1:
+                del stale[token]
+                postings[token] = next(i for i in posting if i not in removed)
+
+    def _live(self, token):
+        # A token's posting with any stale ids filtered out
+        posting = self.postings[token]
+        removed = self.stale.pop(token, None)
+        if removed:
+            posting[:] = [i for i in posting if i not in removed]
+        return posting
+
+    def ids(self, token):
+        posting = self._live(token)
+        return (posting,) if type(posting) is int else posting
+
+    def _span(self, term):
+        # Range of vocabulary entries starting with term: two bisects, so
+        # the selectivity of every query word is known before any walking.
+        tokens = self.tokens
+        return bisect_left(tokens, term), bisect_left(tokens, term + "\U0010ffff")
+
+    def _size(self, span, cap):
+        # Number of postings under a span, giving up once it exceeds cap
+        live, tokens = self._live, self.tokens
+        total = 0
+        for i in range(*span):
+            posting = live(tokens[i])
+            total += 1 if type(posting) is int else len(posting)
+            if total > cap:
+                break
+        return total
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Ids of records where every query word prefixes one of their words."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        spans = {term: self._span(term) for term in terms}
+
+        # Walk the word with the fewest postings. The others are resolved to
+        # a set of ids when they are comparably small, otherwise checked
+        # against each candidate record's own tokens.
+        first, first_size = None, None
+        for term in sorted(terms, key=lambda t: spans[t][1] - spans[t][0]):
+            size = self._size(spans[term], first_size if first is not None else float("inf"))
+            if first is None or size < first_size:
+                first, first_size = term, size
+        sets, prefixes = [], []
+        for term in terms:
+            if term == first:
+                continue
+            lo, hi = spans[term]
+            if self._size(spans[term], SET_FACTOR * first_size) <= SET_FACTOR * first_size:
+                sets.append(set().union(*(self.ids(t) for t in self.tokens[lo:hi])))
+            else:
+                prefixes.append(term)
+        sets.sort(key=len)
+
+        docs, live = self.docs, self._live
+        hits = set()
+        lo, hi = spans[first]
+        for token in self.tokens[lo:hi]:
+            posting = live(token)
+            for record_id in (posting,) if type(posting) is int else posting:
+                if record_id in hits:
+                    continue
+                if not all(record_id in ids for ids in sets):
+                    continue
+                if prefixes and not all(any(t.startswith(p) for t in docs[record_id])
+                                        for p in prefixes):
+                    continue
+                hits.add(record_id)
+                if len(hits) >= limit:
+                    return sorted(hits)
+        return sorted(hits)
+
+
+# ------------------- Search Index -------------------
+# One prefix index per searchable table, built the first time a view asks
+# for it and then kept current from model change events.
+class SearchIndex(Subscriber):
+    HANDLERS = {table: "_on_change" for table in SEARCH_FIELDS}
+
+    def __init__(self, model):
+        self.model = model
+        self.tables = {}
+        self._last = {}
+        self.versions = {table: 0 for table in SEARCH_FIELDS}
+        self.attach(model)
+
+    def index(self, table):
+        index = self.tables.get(table)
+        if index is None:
+            index = self.tables[table] = self._build(table)
+        return index
+
+    def _build(self, table):
+        fields = SEARCH_FIELDS[table]
+        index = PrefixIndex()
+        # Hundreds of thousands of small containers are created here; the
+        # cyclic GC would otherwise rescan them repeatedly during the load.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with self.model.reading() as store:
+                index.load((row[0], tokenize(*row[1:])) for row in store.scan(table, "id", *fields))
+        finally:
+            if enabled:
+                gc.enable()
+        return index
+
+    def search(self, table, query, limit=MAX_RESULTS):
+        # A view asks for the same hits several times per refresh (count,
+        # then each page); reuse them until the query or the table changes.
+        # One hit past the limit tells a full result from a cut-off one.
+        key = (query, limit, self.versions[table])
+        last = self._last.get(table)
+        if last is None or last[0] != key:
+            hits = self.index(table).search(query, limit + 1)
+            last = self._last[table] = (key, hits[:limit], len(hits) > limit)
+        return last[1]
+
+    def truncated(self, table, query, limit=MAX_RESULTS):
+        """True when more than `limit` records match, so search() left some out."""
+        self.search(table, query, limit)
+        return self._last[table][2]
+
+    def matches(self, table, record, query):
+        terms = tokenize(query)
+        tokens = tokenize(*(record[field] for field in SEARCH_FIELDS[table]))
+        return all(any(t.startswith(term) for t in tokens) for term in terms)
+
+    def _on_change(self, change):
+        self.versions[change.table] += 1
+        index = self.tables.get(change.table)
+        if index is None:
+            return
+        if change.kind == RESET:
+            del self.tables[change.table]
+            return
+        fields = SEARCH_FIELDS[change.table]
+        if change.old is not None and change.record is not None and all(
+                change.old[field] == change.record[field] for field in fields):
+            return
+        if change.old is not None:
+            index.remove(change.id)
+        if change.record is not None:
+            index.add(change.id, tokenize(*(change.record[field] for field in fields)))
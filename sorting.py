@@ -0,0 +1,212 @@
+import gc
+from bisect import bisect_left, insort
+
+from ledger import parse_date
+from model import RESET, UPDATE, Subscriber
+
+# Below this many pending changes a sorted column is patched entry by
+# entry; above it the changed entries are dropped and re-added in one sort,
+# which Python's sort does in close to linear time on a list that is
+# already almost in order.
+PATCH_LIMIT = 64
+
+# A filter holding fewer than 1/SORT_MEMBERS of a column's records is
+# sorted on its own rather than picked out of the whole column
+SORT_MEMBERS = 8
+
+
+# ------------------- Sort Keys -------------------
+# Computed once per record as it enters a column, never per comparison.
+def text_key(value):
+    return (value or "").casefold()
+
+
+_dates = {}
+
+
+def date_key(value):
+    # Joined dates are stored as "05 Jan 2025"; a handful of distinct days
+    # cover every client, so each is parsed once
+    key = _dates.get(value)
+    if key is None:
+        key = _dates[value] = parse_date(value or "") or ""
+    return key
+
+
+def number_key(value):
+    return value if value is not None else -1
+
+
+# (table, field) -> sort key for the values of that column
+SORT_KEYS = {
+    ("services", "client"): text_key,
+    ("services", "task"): text_key,
+    ("services", "status"): text_key,
+    ("services", "priority"): number_key,
+    ("workers", "name"): text_key,
+    ("workers", "code"): text_key,
+    ("workers", "location"): text_key,
+    ("workers", "status"): text_key,
+    ("clients", "name"): text_key,
+    ("clients", "code"): text_key,
+    ("clients", "location"): text_key,
+    ("clients", "joined"): date_key,
+}
+
+
+# ------------------- Sorted Column -------------------
+# Every record of a table as (sort key, id), kept in order. Ties fall back
+# to the id, so equal keys keep insertion order and the order is total.
+# Changes are noted as they arrive and applied the next time the column is
+# read: a batch touching 20k rows costs one pass, not 20k list shifts.
+#
+# A filtered view (members) is served without walking the whole column
+# when it can be: a small member set is sorted by the keys kept per id,
+# and a large one is walked once and reused until the table changes.
+class SortedColumn:
+    __slots__ = ("key", "order", "keys", "version", "_old", "_new", "_filtered")
+
+    def __init__(self, key, rows):
+        # rows: (id, field value)
+        self.key = key
+        self.keys = {record_id: key(value) for record_id, value in rows}
+        self.order = sorted((k, record_id) for record_id, k in self.keys.items())
+        # Bumped by every change to the table, not just to this field: a
+        # change elsewhere can still move records in or out of a filter
+        self.version = 0
+        self._old = {}
+        self._new = {}
+        self._filtered = None
+
+    def __len__(self):
+        self._apply()
+        return len(self.order)
+
+    def note(self, record_id, old, new):
+        # old/new: the record's sort key before and after (None: not there)
+        if record_id not in self._old:
+            self._old[record_id] = old
+        self._new[record_id] = new
+
+    def _apply(self):
+        if not self._new:
+            return
+        old, new, order, keys = self._old, self._new, self.order, self.keys
+        for record_id, key in new.items():
+            if key is None:
+                keys.pop(record_id, None)
+            else:
+                keys[record_id] = key
+        if len(new) <= PATCH_LIMIT:
+            for record_id, key in old.items():
+                if key is not None:
+                    i = bisect_left(order, (key, record_id))
+                    if i < len(order) and order[i] == (key, record_id):
+                        del order[i]
+            for record_id, key in new.items():
+                if key is not None:
+                    insort(order, (key, record_id))
+        else:
+            order[:] = [entry for entry in order if entry[1] not in new]
+            order.extend((key, record_id) for record_id, key in new.items() if key is not None)
+            order.sort()
+        old.clear()
+        new.clear()
+
+    def ids(self, reverse=False, members=None):
+        """Ids in sort order; only those in members when given."""
+        self._apply()
+        if members is None:
+            return SortedIds(self.order, reverse)
+        cached = self._filtered
+        if (cached is not None and cached[0] is members and cached[1] == reverse
+                and cached[2] == self.version):
+            return cached[3]
+        keys = self.keys
+        if len(members) * SORT_MEMBERS < len(keys):
+            ids = sorted((record_id for record_id in members if record_id in keys),
+                         key=lambda record_id: (keys[record_id], record_id), reverse=reverse)
+        else:
+            lookup = members
+            if not isinstance(lookup, (dict, set, frozenset)):
+                lookup = set(lookup)
+            entries = reversed(self.order) if reverse else self.order
+            ids = [record_id for key, record_id in entries if record_id in lookup]
+        # Held with the members object itself, so its id cannot be reused
+        self._filtered = (members, reverse, self.version, ids)
+        return ids
+
+
+class SortedIds:
+    # A column's ids in order (or reversed) without copying them out;
+    # slicing one page costs the page, not the table
+    __slots__ = ("order", "reverse")
+
+    def __init__(self, order, reverse):
+        self.order = order
+        self.reverse = reverse
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, index):
+        start, stop, step = index.indices(len(self.order))
+        if self.reverse:
+            end = len(self.order)
+            entries = self.order[end - stop:end - start][::-1]
+        else:
+            entries = self.order[start:stop]
+        return [record_id for key, record_id in entries[::step]]
+
+    def __iter__(self):
+        entries = reversed(self.order) if self.reverse else self.order
+        return (record_id for key, record_id in entries)
+
+
+# ------------------- Sort Index -------------------
+# The sorted columns the views have asked for so far. A column is read from
+# the store and sorted once, the first time its heading is clicked; after
+# that flipping the direction or paging is a slice of a list that change
+# events keep in order.
+class SortIndex(Subscriber):
+    HANDLERS = {table: "_on_change" for table in {table for table, field in SORT_KEYS}}
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = {}
+        self.attach(model)
+
+    def column(self, table, field):
+        column = self.columns.get((table, field))
+        if column is None:
+            column = self.columns[table, field] = self._build(table, field)
+        return column
+
+    def _build(self, table, field):
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with self.model.reading() as store:
+                return SortedColumn(SORT_KEYS[table, field], store.scan(table, "id", field))
+        finally:
+            if enabled:
+                gc.enable()
+
+    def ids(self, table, field, reverse=False, members=None):
+        return self.column(table, field).ids(reverse, members)
+
+    def _on_change(self, change):
+        table = change.table
+        for (column_table, field), column in list(self.columns.items()):
+            if column_table != table:
+                continue
+            if change.kind == RESET:
+                del self.columns[table, field]
+                continue
+            column.version += 1
+            key = column.key
+            old = key(change.old[field]) if change.old is not None else None
+            new = key(change.record[field]) if change.record is not None else None
+            if change.kind == UPDATE and old == new:
+                continue
+            column.note(change.id, old, new)
@@ -0,0 +1,719 @@
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import date
+
+from ledger import parse_payment
+from model import IN_PROGRESS, ON_TASK, PENDING
+from records import RECORDS, Client, Order, Payment, Service, Worker
+
+DEFAULT_DB_PATH = os.environ.get("YESWAY_DB", "yesway.db")
+
+# Batched inserts are chunked so a single huge import never holds one
+# enormous statement list in memory.
+BATCH_SIZE = 5000
+
+# Ids bound into one "WHERE id IN (...)"; SQLite caps the parameters a
+# statement may take
+IDS_PER_QUERY = 900
+
+
+def today():
+    return date.today().strftime("%d %b %Y")
+
+
+# ------------------- Seed Data -------------------
+# Written into a brand new database so a fresh install looks like the old
+# hardcoded console.
+SEED_CLIENTS = [
+    ("Ali", "ALI12345", "Palode", "12 Jan 2025", "Dell Inspiron 15, Windows 11",
+     ["₹500 - Jan 2025", "₹800 - Feb 2025"]),
+    ("Amal", "AMAL6789", "Channappetta", "20 Feb 2025", "HP Elitebook, Windows 10",
+     ["₹1000 - Feb 2025"]),
+]
+
+SEED_SERVICES = [
+    ("Ali", "Fix Laptop", "Pending"),
+    ("Amal", "Install ERP", "In Progress"),
+]
+
+SEED_ORDERS = [
+    ("Computer", "Rahul", "25 Aug 2025"),
+    ("CCTV Setup", "Afsal", "26 Aug 2025"),
+]
+
+SEED_WORKERS = [
+    ("Deepu", "Trivandrum", "Available"),
+    ("Joel", "Kottiyam", "On Task"),
+]
+
+
+def _type_payments(conn):
+    # Payments were free text ("₹500 - Jan 2025"); give each one a typed
+    # amount in paise and an ISO date parsed from that text. Entries that
+    # cannot be parsed keep their text and a NULL amount.
+    conn.execute("ALTER TABLE payments ADD COLUMN amount INTEGER")
+    conn.execute("ALTER TABLE payments ADD COLUMN paid TEXT")
+    rows = conn.execute("SELECT id, entry FROM payments").fetchall()
+    conn.executemany("UPDATE payments SET amount = ?, paid = ? WHERE id = ?",
+                     [parse_payment(entry) + (payment_id,) for payment_id, entry in rows])
+
+
+def _journal_triggers(conn):
+    # Every insert, update and delete on a record table appends the row
+    # as JSON (before and/or after, with the columns of its record class)
+    # to the journal, in the same transaction as the write itself. They
+    # are TEMP triggers, created by each Store connection along with the
+    # journal_origin() function they call; while it returns NULL (bulk
+    # writes) rows are not journaled one by one. Other tools, like the
+    # sqlite3 shell, write without journaling. Rows are identified by
+    # rowid, which is the id column of every table but endpoints, where it
+    # is client_id.
+    for table, record in RECORDS.items():
+        def row(prefix):
+            pairs = ", ".join(f"'{field}', {prefix}.{field}" for field in record.FIELDS)
+            return f"json_object({pairs})"
+
+        for kind, event, values in (
+                ("insert", "INSERT", f"NEW.rowid, NULL, {row('NEW')}"),
+                ("update", "UPDATE", f"NEW.rowid, {row('OLD')}, {row('NEW')}"),
+                ("delete", "DELETE", f"OLD.rowid, {row('OLD')}, NULL")):
+            conn.execute(
+                f"CREATE TEMP TRIGGER journal_{table}_{kind} AFTER {event} ON main.{table} "
+                f"WHEN journal_origin() IS NOT NULL BEGIN "
+                f"INSERT INTO journal (tbl, kind, record_id, old, new, origin) "
+                f"VALUES ('{table}', '{kind}', {values}, journal_origin()); END")
+
+
+def _add_journal(conn):
+    # Append-only change journal shared by every console on this file
+    conn.execute("""
+        CREATE TABLE journal (
+            seq       INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl       TEXT NOT NULL,
+            kind      TEXT NOT NULL,
+            record_id INTEGER,
+            old       TEXT,
+            new       TEXT,
+            origin    TEXT
+        )""")
+    # Tells snapshots of one database apart from those of another
+    conn.execute("CREATE TABLE journal_meta (epoch TEXT NOT NULL)")
+    conn.execute("INSERT INTO journal_meta VALUES (lower(hex(randomblob(8))))")
+
+
+# ------------------- Schema -------------------
+# Each entry upgrades the database by one version (tracked in PRAGMA
+# user_version), so existing files are migrated in place on open. An
+# entry is an SQL script, or a function of the connection when the
+# upgrade needs Python.
+MIGRATIONS = [
+    """
+    CREATE TABLE clients (
+        id       INTEGER PRIMARY KEY,
+        name     TEXT NOT NULL,
+        code     TEXT NOT NULL,
+        location TEXT NOT NULL DEFAULT 'Unknown',
+        joined   TEXT NOT NULL,
+        computer TEXT NOT NULL DEFAULT 'Not Registered'
+    );
+    CREATE UNIQUE INDEX idx_clients_name ON clients(name);
+    CREATE UNIQUE INDEX idx_clients_code ON clients(code);
+
+    CREATE TABLE payments (
+        id        INTEGER PRIMARY KEY,
+        client_id INTEGER NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+        entry     TEXT NOT NULL
+    );
+    CREATE INDEX idx_payments_client ON payments(client_id);
+
+    CREATE TABLE services (
+        id     INTEGER PRIMARY KEY,
+        client TEXT NOT NULL,
+        task   TEXT NOT NULL,
+        status TEXT NOT NULL
+    );
+    CREATE INDEX idx_services_status ON services(status);
+    CREATE INDEX idx_services_client ON services(client);
+
+    CREATE TABLE orders (
+        id     INTEGER PRIMARY KEY,
+        type   TEXT NOT NULL,
+        client TEXT NOT NULL,
+        date   TEXT NOT NULL
+    );
+
+    CREATE TABLE workers (
+        id       INTEGER PRIMARY KEY,
+        name     TEXT NOT NULL,
+        location TEXT NOT NULL,
+        status   TEXT NOT NULL
+    );
+    CREATE UNIQUE INDEX idx_workers_name ON workers(name);
+    CREATE INDEX idx_workers_location ON workers(location);
+    """,
+    # Remote desktop address of each client machine
+    """
+    CREATE TABLE endpoints (
+        client_id INTEGER PRIMARY KEY REFERENCES clients(id) ON DELETE CASCADE,
+        host      TEXT NOT NULL,
+        port      INTEGER NOT NULL
+    );
+    """,
+    # Workers get a unique code too, so their field agents can authenticate
+    """
+    ALTER TABLE workers ADD COLUMN code TEXT;
+    UPDATE workers SET code = upper(hex(randomblob(8)));
+    CREATE UNIQUE INDEX idx_workers_code ON workers(code);
+    """,
+    _type_payments,
+    # Dispatch: how urgent each service is and the worker it went to
+    """
+    ALTER TABLE services ADD COLUMN priority INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE services ADD COLUMN worker_id INTEGER REFERENCES workers(id) ON DELETE SET NULL;
+    CREATE INDEX idx_services_worker ON services(worker_id);
+    """,
+    _add_journal,
+    # Digest of the last snapshot saved, checked before one is loaded
+    "ALTER TABLE journal_meta ADD COLUMN snapshot TEXT",
+]
+
+TABLES = ("clients", "payments", "services", "orders", "workers", "endpoints")
+GROUPABLE = {("services", "status"), ("services", "client"),
+             ("workers", "status"), ("workers", "location")}
+
+# Bulk import/export column order per table. Clients carry their payment
+# entries along; a worker without a code gets a generated one.
+IMPORT_INSERTS = {
+    "clients": "INSERT INTO clients (name, code, location, joined, computer) VALUES (?, ?, ?, ?, ?)",
+    # Workers are named by their unique code, which means the same worker
+    # in every database. Only an In Progress service keeps its worker; one
+    # whose code matches no worker here goes back to the queue as Pending.
+    # import_rows appends the two statuses (?6 In Progress, ?7 Pending).
+    "services": "INSERT INTO services (client, task, status, priority, worker_id) "
+                "SELECT ?1, ?2, CASE WHEN ?3 = ?6 AND w.id IS NULL THEN ?7 ELSE ?3 END, "
+                "?4, CASE WHEN ?3 = ?6 THEN w.id END "
+                "FROM (SELECT 1) LEFT JOIN workers w ON w.code = ?5",
+    "orders": "INSERT INTO orders (type, client, date) VALUES (?, ?, ?)",
+    "workers": "INSERT INTO workers (name, location, status, code) "
+               "VALUES (?, ?, ?, coalesce(?, upper(hex(randomblob(8)))))",
+}
+EXPORT_SELECTS = {
+    "clients": "SELECT name, code, location, joined, computer, "
+               "(SELECT json_group_array(entry) FROM "
+               "(SELECT entry FROM payments WHERE client_id = clients.id ORDER BY id)) "
+               "FROM clients ORDER BY id",
+    "services": "SELECT s.client, s.task, s.status, s.priority, w.code "
+                "FROM services s LEFT JOIN workers w ON w.id = s.worker_id ORDER BY s.id",
+    "orders": "SELECT type, client, date FROM orders ORDER BY id",
+    "workers": "SELECT name, location, status, code FROM workers ORDER BY id",
+}
+
+
+SERVICE_COLUMNS = "id, client, task, status, priority, worker_id"
+INSERT_PAYMENT = "INSERT INTO payments (client_id, entry, amount, paid) VALUES (?, ?, ?, ?)"
+
+
+def _payment(client_id, entry):
+    return (client_id, entry) + parse_payment(entry)
+
+
+def _chunks(rows, size=BATCH_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ------------------- Store -------------------
+class Store:
+    def __init__(self, path=None, seed=True):
+        self.path = path or DEFAULT_DB_PATH
+        # Autocommit mode: single statements commit on their own and
+        # transaction() groups writes explicitly.
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self._depth = 0
+        # Tags this connection's journal entries, so a console can skip
+        # its own changes when it reads the journal back
+        self.origin = uuid.uuid4().hex[:12]
+        self.conn.create_function("journal_origin", 0, lambda: self.origin)
+
+        if self.path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+
+        created = self._migrate()
+        _journal_triggers(self.conn)
+        if created and seed:
+            self._seed()
+
+    def close(self):
+        self.conn.close()
+
+    def _migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self.transaction():
+                if callable(script):
+                    script(self.conn)
+                else:
+                    for statement in script.split(";"):
+                        if statement.strip():
+                            self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version={number}")
+        return version == 0
+
+    def _seed(self):
+        with self.bulk():
+            self.add_clients(SEED_CLIENTS)
+            self.add_services(SEED_SERVICES)
+            self.add_orders(SEED_ORDERS)
+            self.add_workers(SEED_WORKERS)
+
+    @contextmanager
+    def transaction(self, write=False):
+        # Nested calls join the outermost transaction, so callers can batch
+        # several store methods into one commit. A write transaction takes
+        # the database's write lock up front, so nothing another console
+        # commits can land between what it reads and what it writes.
+        if self._depth == 0:
+            self.conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute("COMMIT")
+
+    @contextmanager
+    def savepoint(self):
+        # Inside a transaction: undo just what ran in the block if it raises,
+        # keeping the rest of the transaction
+        name = f"sp{self._depth}"
+        self.conn.execute(f"SAVEPOINT {name}")
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.conn.execute(f"ROLLBACK TO {name}")
+            raise
+        finally:
+            self._depth -= 1
+            self.conn.execute(f"RELEASE {name}")
+
+    def _records(self, record, sql, params=()):
+        # Rows of a record table as slotted records (see records.py)
+        cur = self.conn.cursor()
+        cur.row_factory = record.from_row
+        return cur.execute(sql, params)
+
+    @contextmanager
+    def bulk(self, *tables):
+        # Writes inside are journaled as one reset per table rather than an
+        # entry per row, which would swamp every peer after a big import.
+        with self.transaction():
+            origin, self.origin = self.origin, None
+            try:
+                yield self
+            finally:
+                self.origin = origin
+            if origin is not None:
+                self.conn.executemany(
+                    "INSERT INTO journal (tbl, kind, origin) VALUES (?, 'reset', ?)",
+                    [(table, origin) for table in tables])
+
+    def _by_ids(self, record, select, ids):
+        # Fetch rows by id, returned in the order the ids were given
+        ids = list(ids)
+        rows = {}
+        for chunk in _chunks(ids, IDS_PER_QUERY):
+            placeholders = ", ".join("?" * len(chunk))
+            rows.update((row.id, row) for row in self._records(
+                record, f"{select} WHERE id IN ({placeholders})", chunk))
+        return [rows[i] for i in ids if i in rows]
+
+    def scan(self, table, *columns):
+        # Plain tuples rather than sqlite3.Row: cheaper when building
+        # in-memory indexes over a whole table.
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        return cur.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+
+    def count(self, table):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def count_by(self, table, column):
+        # {value: rows}; served from the column's index where there is one
+        if (table, column) not in GROUPABLE:
+            raise ValueError(f"Cannot group {table} by {column}")
+        return dict(self.conn.execute(
+            f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column}").fetchall())
+
+    # ---------------- Bulk Import / Export ----------------
+    def import_rows(self, table, rows):
+        """Insert one chunk of import rows; returns (position, error) for each row the schema refused."""
+        insert = IMPORT_INSERTS[table]
+        rejected = []
+        tables = {"clients": ("clients", "payments"), "services": ("services", "workers")}
+        with self.bulk(*tables.get(table, (table,))):
+            if table == "services":
+                # No unique columns, so nothing can be refused row by row.
+                # Workers handed a job by the file are now On Task.
+                last = self.conn.execute("SELECT coalesce(max(id), 0) FROM services").fetchone()[0]
+                self.conn.executemany(insert, [row + (IN_PROGRESS, PENDING) for row in rows])
+                self.conn.execute(
+                    "UPDATE workers SET status = ? WHERE status != ? AND id IN "
+                    "(SELECT worker_id FROM services WHERE id > ? AND worker_id IS NOT NULL)",
+                    (ON_TASK, ON_TASK, last))
+                return rejected
+            if table == "orders":
+                self.conn.executemany(insert, rows)
+                return rejected
+            entries = []
+            for position, row in enumerate(rows):
+                try:
+                    cur = self.conn.execute(insert, row[:5] if table == "clients" else row)
+                except sqlite3.IntegrityError as exc:
+                    rejected.append((position, str(exc)))
+                    continue
+                if table == "clients":
+                    entries.extend(_payment(cur.lastrowid, entry) for entry in row[5])
+            self.conn.executemany(INSERT_PAYMENT, entries)
+        return rejected
+
+    def export_rows(self, table):
+        # Streaming cursor of plain tuples in IMPORT_INSERTS column order;
+        # client payments come back as a JSON array
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        return cur.execute(EXPORT_SELECTS[table])
+
+    def existing_clients(self, names):
+        names = list(names)
+        if not names:
+            return set()
+        placeholders = ", ".join("?" * len(names))
+        return {row[0] for row in self.conn.execute(
+            f"SELECT name FROM clients WHERE name IN ({placeholders})", names)}
+
+    # ---------------- Clients ----------------
+    def client_exists(self, name):
+        row = self.conn.execute("SELECT 1 FROM clients WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def code_exists(self, code):
+        row = self.conn.execute("SELECT 1 FROM clients WHERE code = ?", (code,)).fetchone()
+        return row is not None
+
+    def client_codes(self, offset=0, limit=-1):
+        return self._records(
+            Client, "SELECT id, name, code, location, joined FROM clients "
+            "ORDER BY id LIMIT ? OFFSET ?",
+            (limit, offset)).fetchall()
+
+    def clients_by_ids(self, ids):
+        return self._by_ids(Client, "SELECT id, name, code, location, joined FROM clients", ids)
+
+    def client_row(self, client_id):
+        return self._records(
+            Client, "SELECT id, name, code, location, joined, computer FROM clients WHERE id = ?",
+            (client_id,)).fetchone()
+
+    def client_location(self, name):
+        row = self.conn.execute("SELECT location FROM clients WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def client_id(self, name):
+        row = self.conn.execute("SELECT id FROM clients WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def get_client(self, name):
+        client = self._records(
+            Client, "SELECT id, name, code, location, joined, computer FROM clients WHERE name = ?",
+            (name,)).fetchone()
+        if client is None:
+            return None
+        return dict(client, payments=self.client_payments(client["id"]))
+
+    def add_client(self, name, code, location="Unknown", joined=None,
+                   computer="Not Registered", payments=()):
+        with self.transaction():
+            cur = self.conn.execute(
+                "INSERT INTO clients (name, code, location, joined, computer) VALUES (?, ?, ?, ?, ?)",
+                (name, code, location, joined or today(), computer))
+            self.conn.executemany(INSERT_PAYMENT,
+                                  [_payment(cur.lastrowid, entry) for entry in payments])
+        return cur.lastrowid
+
+    def add_clients(self, rows):
+        # rows: (name, code, location, joined, computer, payments)
+        insert = self.conn.execute
+        with self.bulk("clients", "payments"):
+            for chunk in _chunks(rows):
+                entries = []
+                for name, code, location, joined, computer, payments in chunk:
+                    cur = insert(
+                        "INSERT INTO clients (name, code, location, joined, computer) VALUES (?, ?, ?, ?, ?)",
+                        (name, code, location or "Unknown", joined or today(),
+                         computer or "Not Registered"))
+                    entries.extend(_payment(cur.lastrowid, entry) for entry in payments)
+                self.conn.executemany(INSERT_PAYMENT, entries)
+
+    def update_client_location(self, name, location):
+        self.conn.execute("UPDATE clients SET location = ? WHERE name = ?", (location, name))
+
+    # ---------------- Payments ----------------
+    def add_payment(self, client_id, entry):
+        return self.conn.execute(INSERT_PAYMENT, _payment(client_id, entry)).lastrowid
+
+    def get_payment(self, payment_id):
+        return self._records(
+            Payment, "SELECT id, client_id, entry, amount, paid FROM payments WHERE id = ?",
+            (payment_id,)).fetchone()
+
+    def client_payments(self, client_id):
+        return self._records(
+            Payment, "SELECT id, client_id, entry, amount, paid FROM payments "
+            "WHERE client_id = ? ORDER BY id", (client_id,)).fetchall()
+
+    def payment_total(self, client_id):
+        # (paise, payments) straight from the table, for when no ledger is loaded
+        return tuple(self.conn.execute(
+            "SELECT coalesce(sum(amount), 0), count(amount) FROM payments WHERE client_id = ?",
+            (client_id,)).fetchone())
+
+    # ---------------- Endpoints ----------------
+    def endpoints(self):
+        return self.conn.execute(
+            "SELECT e.client_id, c.name, e.host, e.port FROM endpoints e "
+            "JOIN clients c ON c.id = e.client_id ORDER BY e.client_id").fetchall()
+
+    def set_endpoint(self, client_id, host, port):
+        self.conn.execute(
+            "INSERT INTO endpoints (client_id, host, port) VALUES (?, ?, ?) "
+            "ON CONFLICT(client_id) DO UPDATE SET host = excluded.host, port = excluded.port",
+            (client_id, host, port))
+
+    # ---------------- Services ----------------
+    def services(self, offset=0, limit=-1):
+        return self._records(
+            Service, f"SELECT {SERVICE_COLUMNS} FROM services ORDER BY id LIMIT ? OFFSET ?",
+            (limit, offset)).fetchall()
+
+    def get_service(self, service_id):
+        return self._records(
+            Service, f"SELECT {SERVICE_COLUMNS} FROM services WHERE id = ?",
+            (service_id,)).fetchone()
+
+    def services_by_ids(self, ids):
+        return self._by_ids(Service, f"SELECT {SERVICE_COLUMNS} FROM services", ids)
+
+    def service_count(self, client):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM services WHERE client = ?", (client,)).fetchone()[0]
+
+    def add_service(self, client, task, status, priority=0):
+        cur = self.conn.execute(
+            "INSERT INTO services (client, task, status, priority) VALUES (?, ?, ?, ?)",
+            (client, task, status, priority))
+        return cur.lastrowid
+
+    def add_services(self, rows):
+        with self.bulk("services"):
+            for chunk in _chunks(rows):
+                self.conn.executemany(
+                    "INSERT INTO services (client, task, status) VALUES (?, ?, ?)", chunk)
+
+    def update_service(self, service_id, client, task, status):
+        self.conn.execute(
+            "UPDATE services SET client = ?, task = ?, status = ? WHERE id = ?",
+            (client, task, status, service_id))
+
+    def set_service_status(self, service_id, status):
+        self.conn.execute("UPDATE services SET status = ? WHERE id = ?", (status, service_id))
+
+    def set_service_worker(self, service_id, worker_id, status):
+        self.conn.execute("UPDATE services SET worker_id = ?, status = ? WHERE id = ?",
+                          (worker_id, status, service_id))
+
+    def dispatch_queue(self):
+        # (id, priority, client location, client) of every pending service
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        return cur.execute(
+            "SELECT s.id, s.priority, coalesce(c.location, 'Unknown'), s.client FROM services s "
+            "LEFT JOIN clients c ON c.name = s.client WHERE s.status = ? ORDER BY s.id",
+            (PENDING,))
+
+    def assignments(self):
+        # (worker id, service id) for every service a worker is on
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        return cur.execute(
+            "SELECT worker_id, id FROM services WHERE status = ? AND worker_id IS NOT NULL "
+            "ORDER BY id", (IN_PROGRESS,))
+
+    def worker_jobs(self, worker_id):
+        # Ids of the services a worker is currently on
+        return [row[0] for row in self.conn.execute(
+            "SELECT id FROM services WHERE worker_id = ? AND status = ? ORDER BY id",
+            (worker_id, IN_PROGRESS))]
+
+    def jobs_of(self, worker_ids):
+        # Ids of the services any of the given workers are on
+        jobs = []
+        for chunk in _chunks(worker_ids, IDS_PER_QUERY):
+            placeholders = ", ".join("?" * len(chunk))
+            jobs.extend(row[0] for row in self.conn.execute(
+                f"SELECT id FROM services WHERE status = ? AND worker_id IN ({placeholders})",
+                [IN_PROGRESS, *chunk]))
+        return sorted(jobs)
+
+    def busy_workers(self, worker_ids):
+        # Those of the given workers still on at least one service
+        busy = set()
+        for chunk in _chunks(worker_ids, IDS_PER_QUERY):
+            placeholders = ", ".join("?" * len(chunk))
+            busy.update(row[0] for row in self.conn.execute(
+                f"SELECT DISTINCT worker_id FROM services "
+                f"WHERE status = ? AND worker_id IN ({placeholders})",
+                [IN_PROGRESS, *chunk]))
+        return busy
+
+    def delete_service(self, service_id):
+        self.conn.execute("DELETE FROM services WHERE id = ?", (service_id,))
+
+    def update_services(self, services):
+        # Write whole Service records back, one statement for the lot
+        self.conn.executemany(
+            "UPDATE services SET client = ?, task = ?, status = ?, priority = ?, "
+            "worker_id = ? WHERE id = ?",
+            [(s.client, s.task, s.status, s.priority, s.worker_id, s.id) for s in services])
+
+    def delete_services(self, service_ids):
+        self.conn.executemany("DELETE FROM services WHERE id = ?",
+                              [(service_id,) for service_id in service_ids])
+
+    # ---------------- Orders ----------------
+    def orders(self):
+        return self._records(
+            Order, "SELECT id, type, client, date FROM orders ORDER BY id").fetchall()
+
+    def add_orders(self, rows):
+        with self.bulk("orders"):
+            for chunk in _chunks(rows):
+                self.conn.executemany(
+                    "INSERT INTO orders (type, client, date) VALUES (?, ?, ?)", chunk)
+
+    # ---------------- Workers ----------------
+    def workers(self, offset=0, limit=-1):
+        return self._records(
+            Worker, "SELECT id, name, location, status, code FROM workers ORDER BY id LIMIT ? OFFSET ?",
+            (limit, offset)).fetchall()
+
+    def get_worker(self, worker_id):
+        return self._records(
+            Worker, "SELECT id, name, location, status, code FROM workers WHERE id = ?",
+            (worker_id,)).fetchone()
+
+    def workers_by_ids(self, ids):
+        return self._by_ids(Worker, "SELECT id, name, location, status, code FROM workers", ids)
+
+    def worker_exists(self, name):
+        row = self.conn.execute("SELECT 1 FROM workers WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def worker_id(self, name):
+        row = self.conn.execute("SELECT id FROM workers WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def add_worker(self, name, location, status):
+        cur = self.conn.execute(
+            "INSERT INTO workers (name, location, status, code) "
+            "VALUES (?, ?, ?, upper(hex(randomblob(8))))",
+            (name, location, status))
+        return cur.lastrowid
+
+    def add_workers(self, rows):
+        with self.bulk("workers"):
+            for chunk in _chunks(rows):
+                self.conn.executemany(
+                    "INSERT INTO workers (name, location, status, code) "
+                    "VALUES (?, ?, ?, upper(hex(randomblob(8))))", chunk)
+
+    def update_worker(self, worker_id, name, location, status):
+        self.conn.execute(
+            "UPDATE workers SET name = ?, location = ?, status = ? WHERE id = ?",
+            (name, location, status, worker_id))
+
+    def set_worker_status(self, worker_id, status):
+        self.conn.execute("UPDATE workers SET status = ? WHERE id = ?", (status, worker_id))
+
+    def delete_worker(self, worker_id):
+        self.conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def update_workers(self, workers):
+        # Write whole Worker records back, one statement for the lot
+        self.conn.executemany(
+            "UPDATE workers SET name = ?, location = ?, status = ? WHERE id = ?",
+            [(w.name, w.location, w.status, w.id) for w in workers])
+
+    def delete_workers(self, worker_ids):
+        self.conn.executemany("DELETE FROM workers WHERE id = ?",
+                              [(worker_id,) for worker_id in worker_ids])
+
+    # ---------------- Journal ----------------
+    def user_version(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def journal_epoch(self):
+        return self.conn.execute("SELECT epoch FROM journal_meta").fetchone()[0]
+
+    def snapshot_digest(self):
+        return self.conn.execute("SELECT snapshot FROM journal_meta").fetchone()[0]
+
+    def set_snapshot_digest(self, digest):
+        self.conn.execute("UPDATE journal_meta SET snapshot = ?", (digest,))
+
+    def journal_head(self):
+        # Last sequence number ever handed out, even if compacted away since
+        row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'journal'").fetchone()
+        return row[0] if row else 0
+
+    def journal_start(self):
+        # First sequence number still in the journal (None when empty)
+        return self.conn.execute("SELECT min(seq) FROM journal").fetchone()[0]
+
+    def journal_since(self, seq, head):
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        return cur.execute(
+            "SELECT seq, tbl, kind, record_id, old, new, origin FROM journal "
+            "WHERE seq > ? AND seq <= ? ORDER BY seq", (seq, head))
+
+    def journal_tables(self, seq, head, origin):
+        # {table: entries} between seq and head written by anyone but origin
+        return dict(self.conn.execute(
+            "SELECT tbl, COUNT(*) FROM journal WHERE seq > ? AND seq <= ? "
+            "AND origin IS NOT ? GROUP BY tbl", (seq, head, origin)))
+
+    def compact_journal(self, keep):
+        """Drop all but the newest `keep` entries; returns how many went."""
+        return self.conn.execute("DELETE FROM journal WHERE seq <= ?",
+                                 (self.journal_head() - keep,)).rowcount
@@ -0,0 +1,37 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from background import BackgroundLoop  # noqa: E402
+
+
+@pytest.fixture
+def background():
+    loop = BackgroundLoop("test-io")
+    yield loop
+    # Servers' connection handlers finish before the loop goes away
+    loop.submit(settle()).result(timeout=10)
+    loop.stop()
+
+
+async def settle(timeout=5.0):
+    current = asyncio.current_task()
+    tasks = [task for task in asyncio.all_tasks() if task is not current]
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+    for task in tasks:
+        task.cancel()
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting")
+        time.sleep(0.01)
@@ -0,0 +1,181 @@
+import pytest
+
+from bulk import export_file, import_file
+from core import Console
+from model import AVAILABLE, IN_PROGRESS, ON_TASK, PENDING
+from storage import Store
+
+TABLES = ("clients", "workers", "orders", "services")
+
+
+@pytest.fixture
+def stores(tmp_path):
+    opened = []
+
+    def open_store(name):
+        store = Store(str(tmp_path / f"{name}.db"), seed=False)
+        opened.append(store)
+        return store
+
+    yield open_store
+    for store in opened:
+        store.close()
+
+
+@pytest.fixture
+def source(stores):
+    console = Console(store=stores("source"))
+    console.create_client("Ali", "Kochi", "₹500 - Jan 2025", "Dell, \"Latitude\" 5420")
+    console.create_client("Zoë", payment="1,250.50 - 12 Feb 2025")
+    console.add_payment("Zoë", "300", "Mar 2025")
+    console.add_worker("Deepu", "Office", "Available")
+    console.add_worker("Joel", "Remote", "On Task")
+    console.store.add_orders([("Laptop repair", "Ali", "2025-01-02"),
+                              ("New PC, tower", "Zoë", "2025-02-03")])
+    console.add_service("Ali", "Install Office", PENDING, priority=2)
+    assigned = console.add_service("Zoë", "Backup", PENDING)
+    console.reassign_services([assigned], console.worker_id("Deepu"))
+    return console.store
+
+
+def exported(store, table, path):
+    progress = export_file(store, table, str(path))
+    assert progress.finished and not progress.cancelled
+    return path.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_round_trip_keeps_every_field(stores, source, tmp_path, fmt):
+    copy = stores(f"copy-{fmt}")
+    for table in TABLES:
+        first = tmp_path / f"{table}.{fmt}"
+        text = exported(source, table, first)
+        progress = import_file(copy, table, str(first))
+        assert progress.errors == []
+        assert progress.imported == source.count(table)
+        assert exported(copy, table, tmp_path / f"{table}-copy.{fmt}") == text
+
+
+def test_payments_come_back_as_entries(stores, source, tmp_path):
+    copy = stores("copy")
+    path = tmp_path / "clients.jsonl"
+    exported(source, "clients", path)
+    import_file(copy, "clients", str(path))
+    def payments(store):
+        return [(p.entry, p.amount, p.paid) for p in store.get_client("Zoë")["payments"]]
+    assert payments(copy) == payments(source)
+    assert [amount for _, amount, _ in payments(copy)] == [125050, 30000]
+
+
+def test_bad_records_are_rejected_by_line(stores, tmp_path):
+    store = stores("target")
+    path = tmp_path / "clients.jsonl"
+    path.write_text('{"name": "Ali", "code": "A1"}\n'
+                    '{"name": "Ali", "code": "A2"}\n'
+                    '{"name": "Bina"}\n'
+                    'not json\n'
+                    '["Cyrus", "C1"]\n'
+                    '{"name": "Dev", "code": "D1", "payments": 5}\n'
+                    '{"name": "Esha", "code": "E1"}\n', encoding="utf-8")
+    progress = import_file(store, "clients", str(path))
+    assert progress.imported == 2
+    messages = dict(progress.errors)
+    assert sorted(messages) == [2, 3, 4, 5, 6]
+    assert messages[2] == "duplicate name"
+    assert messages[3] == "missing code"
+    assert messages[4].startswith("invalid JSON")
+    assert messages[5] == "expected a JSON object"
+    assert messages[6] == "payments must be a list"
+
+
+def test_csv_without_required_columns_is_refused(stores, tmp_path):
+    path = tmp_path / "workers.csv"
+    path.write_text("name,location\nDeepu,Office\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="status"):
+        import_file(stores("target"), "workers", str(path))
+
+
+def test_undecodable_line_is_rejected_alone(stores, tmp_path):
+    store = stores("target")
+    path = tmp_path / "workers.csv"
+    path.write_bytes(b"name,location,status\n"
+                     b"Deepu,Office,Available\n"
+                     b"J\xffel,Remote,Available\n"
+                     b"Mira,Remote,Available\n")
+    progress = import_file(store, "workers", str(path))
+    assert progress.imported == 2
+    assert progress.errors == [(3, "not valid UTF-8 text")]
+
+
+def services(store):
+    return [(s["client"], s["task"], s["status"], s["priority"],
+             store.get_worker(s["worker_id"])["name"] if s["worker_id"] else None)
+            for s in (store.get_service(i) for i, in store.scan("services", "id"))]
+
+
+def worker_status(store, name):
+    return next(w["status"] for w in store.workers() if w["name"] == name)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_services_keep_priority_and_worker(stores, source, tmp_path, fmt):
+    copy = stores("copy")
+    for table in TABLES:
+        path = tmp_path / f"{table}.{fmt}"
+        exported(source, table, path)
+        if table == "workers":
+            # The worker comes back by code, free until the services arrive
+            path.write_text(path.read_text(encoding="utf-8").replace(ON_TASK, AVAILABLE),
+                            encoding="utf-8")
+        import_file(copy, table, str(path))
+    assert services(copy) == [("Ali", "Install Office", PENDING, 2, None),
+                              ("Zoë", "Backup", IN_PROGRESS, 0, "Deepu")]
+    assert worker_status(copy, "Deepu") == ON_TASK
+
+
+def test_service_with_unknown_worker_comes_in_pending(stores, tmp_path):
+    console = Console(store=stores("target"))
+    console.create_client("Ali")
+    console.add_worker("Deepu", "Office", AVAILABLE)
+    code = console.store.workers()[0]["code"]
+    path = tmp_path / "services.jsonl"
+    path.write_text(
+        f'{{"client": "Ali", "task": "A", "status": "{IN_PROGRESS}", "worker": "NOPE"}}\n'
+        f'{{"client": "Ali", "task": "B", "status": "{IN_PROGRESS}"}}\n'
+        f'{{"client": "Ali", "task": "C", "status": "{PENDING}", "worker": "{code}"}}\n'
+        f'{{"client": "Ali", "task": "D", "status": "{IN_PROGRESS}", "worker": "{code}"}}\n',
+        encoding="utf-8")
+    progress = import_file(console.store, "services", str(path))
+    assert progress.errors == []
+    # Only an In Progress service keeps its worker
+    assert services(console.store) == [("Ali", "A", PENDING, 0, None),
+                                       ("Ali", "B", PENDING, 0, None),
+                                       ("Ali", "C", PENDING, 0, None),
+                                       ("Ali", "D", IN_PROGRESS, 0, "Deepu")]
+    assert worker_status(console.store, "Deepu") == ON_TASK
+
+
+def test_services_without_priority_or_worker_columns(stores, tmp_path):
+    console = Console(store=stores("target"))
+    console.create_client("Ali")
+    path = tmp_path / "services.csv"
+    path.write_text("client,task,status\nAli,Install Office,Pending\n", encoding="utf-8")
+    progress = import_file(console.store, "services", str(path))
+    assert progress.imported == 1
+    assert services(console.store) == [("Ali", "Install Office", PENDING, 0, None)]
+
+
+def test_bad_services_are_rejected(stores, tmp_path):
+    console = Console(store=stores("target"))
+    console.create_client("Ali")
+    path = tmp_path / "services.csv"
+    path.write_text("client,task,status,priority,worker\n"
+                    "Ali,A,Pending,9,\n"
+                    "Ali,B,Pending,high,\n"
+                    "Nobody,C,Pending,0,\n"
+                    "Ali,D,Pending,1,\n", encoding="utf-8")
+    progress = import_file(console.store, "services", str(path))
+    assert progress.imported == 1
+    assert progress.errors == [(2, "priority must be 0-2"),
+                               (3, "priority must be a whole number"),
+                               (4, "unknown client 'Nobody'")]
@@ -0,0 +1,93 @@
+import pytest
+
+import cli
+from model import PENDING
+from storage import Store
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "yesway.db")
+    Store(path, seed=False).close()
+    return path
+
+
+@pytest.fixture
+def run(db, capsys):
+    def run(*argv):
+        code = cli.main(["--db", db, *argv])
+        out, err = capsys.readouterr()
+        return code, out, err
+    return run
+
+
+def names(db):
+    store = Store(db)
+    try:
+        return sorted(name for name, in store.scan("clients", "name"))
+    finally:
+        store.close()
+
+
+def test_command_succeeds_with_exit_code_0(run):
+    code, out, err = run("client", "add", "Ali", "--location", "Kochi")
+    assert code == 0
+    assert len(out.strip()) == 8
+    assert err == ""
+    code, out, _ = run("client", "show", "Ali")
+    assert code == 0
+    assert "Location: Kochi" in out
+
+
+def test_refused_command_exits_1_with_the_reason(run):
+    run("client", "add", "Ali")
+    code, out, err = run("client", "add", "Ali")
+    assert code == 1
+    assert out == ""
+    assert err == "error: Username already exists!\n"
+    assert run("client", "show", "Nobody")[0] == 1
+    assert run("worker", "status", "Nobody", PENDING)[0] == 1
+
+
+def test_missing_import_file_exits_1(run, tmp_path):
+    code, _, err = run("import", "clients", str(tmp_path / "missing.csv"))
+    assert code == 1
+    assert err.startswith("error: ")
+
+
+def test_usage_error_exits_2(run):
+    with pytest.raises(SystemExit) as exc:
+        run("service", "add", "Ali")
+    assert exc.value.code == 2
+
+
+def test_batch_keeps_good_lines_and_reports_bad_ones(run, db, tmp_path):
+    script = tmp_path / "jobs.txt"
+    script.write_text("# clients for the new branch\n"
+                      "client add Ali\n"
+                      "client add Ali\n"
+                      "client add Bina --payment lots\n"
+                      "no such command\n"
+                      "service add Cyrus 'Install Office' Pending\n"
+                      "batch jobs.txt\n", encoding="utf-8")
+    code, _, err = run("batch", str(script))
+    assert code == 1
+    lines = err.splitlines()
+    # A clash with an earlier line is caught by the store's unique index
+    assert "line 3: UNIQUE constraint failed: clients.name" in lines
+    assert any(line.startswith("line 4: Payment must start") for line in lines)
+    assert "line 5: invalid command" in lines
+    assert "line 7: batch files cannot nest" in lines
+    assert lines[-1] == "error: 4 line(s) failed"
+    assert names(db) == ["Ali", "Cyrus"]
+
+
+def test_batch_of_good_lines_exits_0(run, db, tmp_path):
+    script = tmp_path / "jobs.txt"
+    script.write_text("client add Ali\nworker add Deepu Office Available\n", encoding="utf-8")
+    assert run("batch", str(script))[0] == 0
+    assert names(db) == ["Ali"]
+    code, out, _ = run("stats")
+    assert code == 0
+    assert "clients\t1\n" in out
+    assert "workers\t1\n" in out
@@ -0,0 +1,82 @@
+import sys
+import time
+
+from conftest import wait_until
+from connections import CLOSED, FAILED, RUNNING, ConnectionManager, build_argv
+
+
+def python(code):
+    # A stand-in launcher: this interpreter running a one-liner
+    return [sys.executable, "-c", code]
+
+
+def finished(session):
+    wait_until(lambda: not session.active)
+    return session
+
+
+def test_build_argv_fills_template():
+    assert build_argv("xfreerdp /v:{host}:{port} /t:{client}", "10.0.0.5", 3390, "Ali") == \
+        ["xfreerdp", "/v:10.0.0.5:3390", "/t:Ali"]
+    assert build_argv(["tool", "{host}"], "pc1", 3389) == ["tool", "pc1"]
+
+
+def test_session_closes_when_launcher_exits_cleanly(background):
+    manager = ConnectionManager(background, python("import sys; sys.exit(0)"))
+    session = finished(manager.connect("Ali", "127.0.0.1", 3389))
+    assert session.state == CLOSED
+    assert session.returncode == 0
+    assert session.ended is not None
+
+
+def test_session_fails_when_launcher_exits_with_error(background):
+    manager = ConnectionManager(background, python("import sys; sys.exit(3)"))
+    session = finished(manager.connect("Ali", "127.0.0.1", 3389))
+    assert session.state == FAILED
+    assert session.returncode == 3
+
+
+def test_session_fails_when_launcher_is_missing(background):
+    manager = ConnectionManager(background, ["yesway-no-such-launcher", "{host}"])
+    session = finished(manager.connect("Ali", "127.0.0.1", 3389))
+    assert session.state == FAILED
+    assert session.error
+    assert session.process is None
+
+
+def test_launcher_gets_host_port_and_client(background, tmp_path):
+    out = tmp_path / "argv.txt"
+    manager = ConnectionManager(background, python(
+        f"import sys; open({str(out)!r}, 'w').write(' '.join(sys.argv[1:]))") +
+        ["{host}", "{port}", "{client}"])
+    finished(manager.connect("Amal", "192.0.2.7", "3390"))
+    assert out.read_text() == "192.0.2.7 3390 Amal"
+
+
+def test_sessions_run_side_by_side(background):
+    manager = ConnectionManager(background, python("import time; time.sleep(0.5)"))
+    started = time.monotonic()
+    sessions = [manager.connect(f"client{i}", "127.0.0.1", 3389) for i in range(8)]
+    for session in sessions:
+        finished(session)
+    assert all(session.state == CLOSED for session in sessions)
+    # Eight half-second launchers in well under eight half-seconds
+    assert time.monotonic() - started < 3.0
+
+
+def test_disconnect_closes_running_session(background):
+    manager = ConnectionManager(background, python("import time; time.sleep(60)"))
+    session = manager.connect("Ali", "127.0.0.1", 3389)
+    wait_until(lambda: session.state == RUNNING)
+    manager.disconnect(session.id)
+    finished(session)
+    assert session.state == CLOSED
+    assert session.elapsed < 30
+
+
+def test_clear_finished_drops_ended_sessions(background):
+    done = ConnectionManager(background, python("pass"))
+    session = finished(done.connect("Ali", "127.0.0.1", 3389))
+    assert done.sessions() == [session]
+    done.clear_finished()
+    assert done.sessions() == []
@@ -0,0 +1,99 @@
+import pytest
+
+from core import Console, ValidationError
+from model import AVAILABLE, FINISHED, IN_PROGRESS, ON_TASK, PENDING
+from storage import Store
+
+
+@pytest.fixture
+def console(tmp_path):
+    console = Console(store=Store(str(tmp_path / "yesway.db"), seed=False))
+    yield console
+    console.close()
+
+
+def test_client_needs_a_new_name(console):
+    code = console.create_client("  Ali  ", "Kochi")
+    assert console.store.get_client("Ali")["code"] == code
+    with pytest.raises(ValidationError, match="Please enter a username"):
+        console.create_client("   ")
+    with pytest.raises(ValidationError, match="already exists"):
+        console.create_client("Ali")
+
+
+def test_payment_must_start_with_an_amount(console):
+    with pytest.raises(ValidationError, match="must start with an amount"):
+        console.create_client("Ali", payment="January")
+    assert not console.client_exists("Ali")
+
+
+def test_add_payment_checks_client_amount_and_date(console):
+    console.create_client("Ali")
+    with pytest.raises(ValidationError, match="Unknown client"):
+        console.add_payment("Bina", "500")
+    with pytest.raises(ValidationError, match="Enter an amount"):
+        console.add_payment("Ali", "lots")
+    with pytest.raises(ValidationError, match="Enter the date"):
+        console.add_payment("Ali", "500", "someday")
+    console.add_payment("Ali", "1,250.50", "12 Jan 2025")
+    assert console.payment_total(console.store.get_client("Ali")["id"]) == (125050, 1)
+
+
+def test_service_needs_client_task_status_and_priority(console):
+    with pytest.raises(ValidationError, match="required"):
+        console.add_service("Ali", " ", PENDING)
+    with pytest.raises(ValidationError, match="Priority"):
+        console.add_service("Ali", "Install", PENDING, priority=7)
+    assert not console.client_exists("Ali")
+
+    # An unknown client is created along with the service
+    service_id = console.add_service("Ali", "Install", PENDING, location="Kochi")
+    assert console.store.get_client("Ali")["location"] == "Kochi"
+    assert console.store.get_service(service_id)["status"] == PENDING
+
+
+def test_update_service_rejects_blanks_and_deleted_rows(console):
+    service_id = console.add_service("Ali", "Install", PENDING)
+    for client, task, status in (("", "Install", PENDING), ("Ali", " ", PENDING),
+                                 ("Ali", "Install", "")):
+        with pytest.raises(ValidationError, match="required"):
+            console.update_service(service_id, client, task, status)
+    assert console.store.get_service(service_id)["task"] == "Install"
+    console.delete_service(service_id)
+    with pytest.raises(ValidationError, match="no longer exists"):
+        console.update_service(service_id, "Ali", "Install", PENDING)
+
+
+def test_worker_names_are_unique(console):
+    console.add_worker("Deepu", "Office", AVAILABLE)
+    with pytest.raises(ValidationError, match="required"):
+        console.add_worker("Joel", "", AVAILABLE)
+    with pytest.raises(ValidationError, match="already exists"):
+        console.add_worker("Deepu", "Remote", AVAILABLE)
+    joel = console.add_worker("Joel", "Remote", AVAILABLE)
+    with pytest.raises(ValidationError, match="already exists"):
+        console.update_worker(joel, "Deepu", "Remote", AVAILABLE)
+    console.delete_worker(joel)
+    with pytest.raises(ValidationError, match="no longer exists"):
+        console.update_worker(joel, "Joel", "Remote", AVAILABLE)
+
+
+def test_finishing_a_service_frees_its_worker(console):
+    service_id = console.add_service("Ali", "Install", PENDING)
+    worker_id = console.add_worker("Deepu", "Office", AVAILABLE)
+    console.reassign_services([service_id], worker_id)
+    assert console.store.get_service(service_id)["status"] == IN_PROGRESS
+    assert console.store.get_worker(worker_id)["status"] == ON_TASK
+
+    console.finish_service(service_id)
+    assert console.store.get_service(service_id)["status"] == FINISHED
+    assert console.store.get_worker(worker_id)["status"] == AVAILABLE
+
+
+def test_deleting_a_worker_requeues_their_services(console):
+    service_id = console.add_service("Ali", "Install", PENDING)
+    worker_id = console.add_worker("Deepu", "Office", AVAILABLE)
+    console.reassign_services([service_id], worker_id)
+    console.delete_worker(worker_id)
+    service = console.store.get_service(service_id)
+    assert (service["status"], service["worker_id"]) == (PENDING, None)
@@ -0,0 +1,111 @@
+import pytest
+
+from core import Console
+from journal import load_snapshot, snapshot_path
+from model import FINISHED, PENDING
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "yesway.db")
+
+
+@pytest.fixture
+def consoles(path):
+    opened = []
+
+    def open_console():
+        console = Console(path=path)
+        opened.append(console)
+        return console
+
+    yield open_console
+    for console in opened:
+        console.close()
+
+
+def test_changes_reach_another_console(consoles):
+    first, second = consoles(), consoles()
+    first.warm()
+    clients, services = first.counters.total("clients"), first.counters.total("services")
+
+    service_id = second.add_service("Zed", "Install Office", PENDING)
+    assert first.sync() > 0
+    assert first.indexes.has_client("Zed")
+    assert first.counters.total("clients") == clients + 1
+    assert first.counters.total("services") == services + 1
+    assert service_id in first.indexes.services_with_status(PENDING)
+    assert first.search.search("clients", "zed")
+
+    second.finish_service(service_id)
+    first.sync()
+    assert service_id in first.indexes.services_with_status(FINISHED)
+    assert service_id not in first.indexes.services_with_status(PENDING)
+
+    second.delete_service(service_id)
+    first.sync()
+    assert first.counters.total("services") == services
+    assert first.sync() == 0
+
+
+def test_own_changes_are_not_applied_twice(consoles):
+    first, second = consoles(), consoles()
+    first.warm()
+    workers = first.counters.total("workers")
+    first.add_worker("Zed", "Remote", "Available")
+    second.sync()
+    first.sync()
+    assert first.counters.total("workers") == workers + 1
+
+
+def test_snapshot_is_loaded_with_the_changes_since(consoles):
+    first = consoles()
+    first.warm()
+    first.create_client("Zed")
+    first.save_snapshot()
+    first.create_client("Mira")
+
+    assert load_snapshot(first.store) is not None
+    second = consoles()
+    second.warm()
+    assert second.indexes.has_client("Zed")
+    assert second.indexes.has_client("Mira")
+    assert second.counters.total("clients") == first.counters.total("clients")
+
+
+def test_snapshot_not_matching_its_digest_is_ignored(consoles):
+    first = consoles()
+    first.warm()
+    first.create_client("Zed")
+    first.save_snapshot()
+
+    # A different file in the snapshot's place is never unpickled
+    with open(snapshot_path(first.store), "ab") as f:
+        f.write(b"\0")
+    assert load_snapshot(first.store) is None
+
+    first.save_snapshot()
+    first.store.set_snapshot_digest("0" * 64)
+    assert load_snapshot(first.store) is None
+
+    # The next start reads the tables instead
+    second = consoles()
+    second.warm()
+    assert second.indexes.has_client("Zed")
+    assert second.counters.total("clients") == first.counters.total("clients")
+
+
+def test_snapshot_of_another_database_is_ignored(consoles, tmp_path):
+    first = consoles()
+    first.warm()
+    first.save_snapshot()
+    other = Console(path=str(tmp_path / "other.db"))
+    try:
+        with open(snapshot_path(first.store), "rb") as f:
+            data = f.read()
+        with open(snapshot_path(other.store), "wb") as f:
+            f.write(data)
+        other.store.set_snapshot_digest(first.store.snapshot_digest())
+        assert load_snapshot(other.store) is None
+    finally:
+        other.close()
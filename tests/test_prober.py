@@ -0,0 +1,77 @@
+import asyncio
+import socket
+
+import pytest
+
+import prober
+from prober import OFFLINE, ONLINE, Prober
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+@pytest.fixture
+def closed_port():
+    # A port that was just free: nothing listens there, so connecting is refused
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def probe(background, target, **options):
+    return background.submit(Prober(background, **options).probe(*target)).result(timeout=10)
+
+
+def test_listening_port_is_online(background, listener):
+    result = probe(background, ("Ali", "127.0.0.1", listener))
+    assert result.online
+    assert result.status == ONLINE
+    assert result.latency is not None and result.latency >= 0
+    assert result.error is None
+
+
+def test_refused_port_is_offline(background, closed_port):
+    result = probe(background, ("Ali", "127.0.0.1", closed_port))
+    assert not result.online
+    assert result.status == OFFLINE
+    assert result.error
+    assert result.latency is None
+
+
+def test_unanswered_connect_times_out(background, monkeypatch):
+    async def never(host, port):
+        await asyncio.sleep(60)
+    monkeypatch.setattr(prober.asyncio, "open_connection", never)
+    result = probe(background, ("Ali", "192.0.2.1", 3389), timeout=0.1)
+    assert not result.online
+    assert result.error == "timed out"
+
+
+def test_probe_all_reports_each_client_and_caches(background, listener, closed_port):
+    checker = Prober(background)
+    endpoints = [("up", ("127.0.0.1", listener)), ("down", ("127.0.0.1", closed_port))]
+    results = checker.probe_all(endpoints).result(timeout=10)
+    assert {r.client: r.online for r in results} == {"up": True, "down": False}
+    assert {r.client for r in checker.drain()} == {"up", "down"}
+    assert checker.drain() == []
+    assert checker.cached("up").online
+
+    # Fresh cache entries are skipped unless forced
+    assert checker.probe_all(endpoints).result(timeout=10) == []
+    assert len(checker.probe_all(endpoints, force=True).result(timeout=10)) == 2
+
+
+def test_expired_results_are_probed_again(background, listener):
+    checker = Prober(background, ttl=-1.0)
+    endpoints = [("up", ("127.0.0.1", listener))]
+    checker.probe_all(endpoints).result(timeout=10)
+    assert checker.cached("up") is None
+    assert len(checker.probe_all(endpoints).result(timeout=10)) == 1
@@ -0,0 +1,125 @@
+import pytest
+
+from conftest import wait_until
+from screen import (CLOSED, FAILED, FRAME_BODY, RUNNING, TILE_HEADER, ScreenAgent, ScreenViewer,
+                    SyntheticScreen, TileDecoder, TileEncoder, tile_grid)
+
+
+def frame_payload(number, tiles):
+    # A FRAME payload as the agent sends it
+    parts = [FRAME_BODY.pack(number, len(tiles))]
+    for col, row, pixels in tiles:
+        parts += (TILE_HEADER.pack(col, row, len(pixels)), pixels)
+    return b"".join(parts)
+
+
+def pixels(width, height, seed):
+    return bytes((x * 7 + y * 13 + seed) % 256 for y in range(height) for x in range(width * 3))
+
+
+@pytest.fixture
+def agent(background):
+    agents = []
+
+    def start(source, code="SECRET"):
+        screen_agent = ScreenAgent(source, code, port=0)
+        server = background.submit(screen_agent.start()).result(timeout=10)
+        agents.append(screen_agent)
+        return server.sockets[0].getsockname()[1]
+
+    yield start
+    for screen_agent in agents:
+        background.call_soon(screen_agent.close)
+
+
+def test_tile_grid_covers_the_screen_with_edge_tiles_clipped():
+    grid = tile_grid(150, 70, 64)
+    assert len(grid) == 3 * 2
+    assert grid[0] == (0, 0, 0, 0, 64, 64)
+    assert grid[2] == (2, 0, 128, 0, 22, 64)
+    assert grid[-1] == (2, 1, 128, 64, 22, 6)
+    assert sum(w * h for *_, w, h in grid) == 150 * 70
+
+
+def test_encoded_tiles_decode_to_the_same_frame():
+    width, height = 150, 70
+    encoder, decoder = TileEncoder(width, height), TileDecoder(width, height)
+    first = pixels(width, height, 0)
+    tiles = encoder.encode(first)
+    assert len(tiles) == len(tile_grid(width, height))
+    number, regions = decoder.decode(frame_payload(1, tiles))
+    assert number == 1
+    assert len(regions) == len(tiles)
+    assert bytes(decoder.buffer) == first
+
+    # One pixel changes: only its tile is sent, and the buffer follows
+    second = bytearray(first)
+    offset = (66 * width + 140) * 3
+    second[offset:offset + 3] = b"\xff\x00\x00"
+    tiles = encoder.encode(second)
+    assert [(col, row) for col, row, _ in tiles] == [(2, 1)]
+    number, regions = decoder.decode(frame_payload(2, tiles))
+    assert regions == [(128, 64, 22, 6)]
+    assert bytes(decoder.buffer) == bytes(second)
+
+    assert encoder.encode(second) == []
+
+
+def test_ppm_reads_a_region_back_out_of_the_buffer():
+    width, height = 150, 70
+    frame = pixels(width, height, 5)
+    decoder = TileDecoder(width, height)
+    decoder.decode(frame_payload(1, TileEncoder(width, height).encode(frame)))
+    header = b"P6 22 6 255\n"
+    image = decoder.ppm(128, 64, 22, 6)
+    assert image.startswith(header)
+    rows = [frame[(y * width + 128) * 3:(y * width + 150) * 3] for y in range(64, 70)]
+    assert image[len(header):] == b"".join(rows)
+
+
+def test_encoder_rejects_a_frame_of_the_wrong_size():
+    with pytest.raises(ValueError):
+        TileEncoder(64, 64).encode(bytes(10))
+
+
+def test_decoder_rejects_a_tile_outside_the_screen():
+    tile = (5, 5, TileEncoder(64, 64).encode(bytes(64 * 64 * 3))[0][2])
+    with pytest.raises(ValueError):
+        TileDecoder(64, 64).decode(frame_payload(1, [tile]))
+
+
+def test_viewer_streams_frames_and_forwards_input(background, agent):
+    source = SyntheticScreen(320, 200)
+    port = agent(source)
+    viewer = ScreenViewer(background, "127.0.0.1", "SECRET", port)
+    viewer.connect()
+    wait_until(lambda: viewer.state == RUNNING and viewer.frames)
+    assert viewer.size == (320, 200)
+
+    tiles, frames, number = viewer.take()
+    assert tiles and frames and number
+    for region in tiles:
+        assert viewer.decoder.ppm(*region).startswith(b"P6 ")
+    viewer.rendered(frames, number, 0.0)
+
+    viewer.send_input({"type": "click", "x": 10, "y": 20})
+    wait_until(lambda: source.clicks == 1)
+    assert source.cursor == (10, 20)
+    viewer.close()
+    wait_until(lambda: viewer.state == CLOSED)
+
+
+def test_viewer_with_wrong_code_is_refused(background, agent):
+    source = SyntheticScreen(320, 200)
+    port = agent(source)
+    viewer = ScreenViewer(background, "127.0.0.1", "WRONG", port)
+    viewer.connect().result(timeout=10)
+    assert viewer.state == FAILED
+    assert viewer.error == "agent refused the client code"
+    assert viewer.frames == 0
+    assert source.events == 0
+
+
+def test_agent_needs_a_code():
+    with pytest.raises(ValueError):
+        ScreenAgent(SyntheticScreen(64, 64), "")
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from conftest import wait_until
+from transfer import (CANCELLED, DONE, FAILED, MAX_LINE, FileAgent, Transfer, TransferManager,
+                      request, upload)
+
+CODE = "SECRET"
+CHUNK = 1024
+
+
+@pytest.fixture
+def agent(background, tmp_path):
+    agents = []
+
+    def start(**options):
+        file_agent = FileAgent(str(tmp_path / "received"), CODE, port=0, **options)
+        server = background.submit(file_agent.start()).result(timeout=10)
+        agents.append(file_agent)
+        return file_agent, server.sockets[0].getsockname()[1]
+
+    yield start
+    for file_agent in agents:
+        background.call_soon(file_agent.close)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "setup.bin"
+    path.write_bytes(os.urandom(10 * CHUNK + 100))
+    return str(path)
+
+
+def run(background, coro):
+    return background.submit(coro).result(timeout=10)
+
+
+async def talk(port, *requests, code=CODE):
+    # One connection: AUTH with `code`, then each (header, body) in turn.
+    # Returns the replies, stopping at the first the agent hangs up on.
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=MAX_LINE)
+    replies = []
+    try:
+        for header, body in (({"op": "auth", "code": code}, None),) + requests:
+            replies.append(await request(reader, writer, header, body))
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+    return replies
+
+
+def opening(path, name=None, **extra):
+    with open(path, "rb") as f:
+        file_id = hashlib.sha256(f.read()).hexdigest()
+    if name is None:
+        name = os.path.basename(path)
+    header = {"op": "open", "id": file_id, "name": name, "size": os.path.getsize(path),
+              "chunk": CHUNK}
+    header.update(extra)
+    return header, None
+
+
+def chunk(path, file_id, index, sha256=None):
+    with open(path, "rb") as f:
+        f.seek(index * CHUNK)
+        data = f.read(CHUNK)
+    return ({"op": "chunk", "id": file_id, "index": index, "length": len(data),
+             "sha256": sha256 or hashlib.sha256(data).hexdigest()}, data)
+
+
+def transfer(port, path, **options):
+    return Transfer(1, "Ali", "127.0.0.1", port, CODE, path, chunk_size=CHUNK, **options)
+
+
+def received(file_agent, name):
+    with open(os.path.join(file_agent.directory, name), "rb") as f:
+        return f.read()
+
+
+def test_upload_delivers_the_file(background, agent, source):
+    file_agent, port = agent()
+    sending = transfer(port, source)
+    run(background, upload(sending))
+    with open(source, "rb") as f:
+        assert received(file_agent, "setup.bin") == f.read()
+    assert sending.done == sending.chunks == 11
+    assert sorted(os.listdir(file_agent.directory)) == ["setup.bin"]
+
+
+def test_upload_resumes_after_a_partial_send(background, agent, source):
+    file_agent, port = agent()
+    header, _ = opening(source)
+    replies = run(background, talk(port, (header, None),
+                                   *(chunk(source, header["id"], i) for i in range(4))))
+    assert all(reply["ok"] for reply in replies)
+    assert replies[1]["have"] == []
+
+    # The agent kept the first four chunks; only the other seven go again
+    sending = transfer(port, source)
+    run(background, upload(sending, parallel=2))
+    assert sending.sent == 6 * CHUNK + 100
+    with open(source, "rb") as f:
+        assert received(file_agent, "setup.bin") == f.read()
+
+
+def test_manager_resumes_a_cancelled_transfer(background, agent, source):
+    file_agent, port = agent()
+    manager = TransferManager(background)
+    sending = manager.send("Ali", "127.0.0.1", CODE, source, port)
+    manager.cancel(sending.id)
+    wait_until(lambda: not sending.active)
+    assert sending.state in (CANCELLED, DONE)
+    manager.resume(sending.id)
+    wait_until(lambda: not sending.active)
+    assert sending.state == DONE
+    with open(source, "rb") as f:
+        assert received(file_agent, "setup.bin") == f.read()
+
+
+def test_chunk_with_wrong_checksum_is_rejected(background, agent, source):
+    file_agent, port = agent()
+    header, _ = opening(source)
+    replies = run(background, talk(port, (header, None),
+                                   chunk(source, header["id"], 0, sha256="0" * 64),
+                                   chunk(source, header["id"], 1)))
+    assert replies[2] == {"ok": False, "error": "checksum"}
+    assert replies[3] == {"ok": True}
+    replies = run(background, talk(port, (header, None)))
+    assert replies[1]["have"] == [1]
+
+
+def test_file_not_matching_its_id_is_not_kept(background, agent, source):
+    file_agent, port = agent()
+    header, _ = opening(source)
+    header["id"] = "f" * 64
+    chunks = [chunk(source, header["id"], i) for i in range(11)]
+    replies = run(background, talk(port, (header, None), *chunks,
+                                   ({"op": "finish", "id": header["id"]}, None)))
+    assert replies[-1] == {"ok": False, "error": "file checksum"}
+    assert not os.path.exists(os.path.join(file_agent.directory, "setup.bin"))
+    # Every chunk has to be sent again
+    replies = run(background, talk(port, (header, None)))
+    assert replies[1]["have"] == []
+
+
+@pytest.mark.parametrize("name", ["", ".profile"])
+def test_bad_name_is_rejected(background, agent, source, name):
+    file_agent, port = agent()
+    replies = run(background, talk(port, opening(source, name)))
+    # The agent hangs up on a malformed open
+    assert replies == [{"ok": True}]
+    assert os.listdir(file_agent.directory) == []
+
+
+def test_name_cannot_leave_the_directory(background, agent, source):
+    file_agent, port = agent()
+    sending = transfer(port, source)
+    sending.name = os.path.join("..", "..", "escaped.bin")
+    run(background, upload(sending))
+    assert os.listdir(file_agent.directory) == ["escaped.bin"]
+
+
+def test_wrong_code_is_refused(background, agent, source):
+    file_agent, port = agent()
+    replies = run(background, talk(port, opening(source), code="WRONG"))
+    assert replies == [{"ok": False}]
+
+    sending = transfer(port, source)
+    sending.code = "WRONG"
+    with pytest.raises(ConnectionError, match="refused the client code"):
+        run(background, upload(sending))
+    assert os.listdir(file_agent.directory) == []
+
+
+def test_existing_file_is_only_replaced_when_asked(background, agent, source):
+    file_agent, port = agent()
+    os.makedirs(file_agent.directory, exist_ok=True)
+    with open(os.path.join(file_agent.directory, "setup.bin"), "wb") as f:
+        f.write(b"old")
+
+    with pytest.raises(ConnectionError, match="already exists"):
+        run(background, upload(transfer(port, source)))
+    assert received(file_agent, "setup.bin") == b"old"
+
+    run(background, upload(transfer(port, source, overwrite=True)))
+    with open(source, "rb") as f:
+        assert received(file_agent, "setup.bin") == f.read()
+
+
+def test_file_over_the_size_cap_is_refused(background, agent, source):
+    file_agent, port = agent(max_size=4 * CHUNK)
+    with pytest.raises(ConnectionError, match="file larger than"):
+        run(background, upload(transfer(port, source)))
+    assert os.listdir(file_agent.directory) == []
+
+
+def test_manager_reports_a_refused_transfer(background, agent, source):
+    _, port = agent()
+    manager = TransferManager(background)
+    sending = manager.send("Ali", "127.0.0.1", "WRONG", source, port)
+    wait_until(lambda: not sending.active)
+    assert sending.state == FAILED
+    assert sending.error == "agent refused the client code"
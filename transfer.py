@@ -0,0 +1,497 @@
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+TRANSFER_PORT = int(os.environ.get("YESWAY_TRANSFER_PORT", "47910"))
+
+CHUNK_SIZE = 1024 * 1024
+# Connections per transfer, each sending its own chunks
+PARALLEL = 4
+# Transfers sending at once; the rest wait their turn in the queue
+MAX_ACTIVE = 3
+# Transfers waiting or sending; the console refuses more beyond this
+MAX_QUEUED = 50
+# Times a chunk is resent after failing its checksum
+CHUNK_RETRIES = 3
+
+MAX_CHUNK = 16 * 1024 * 1024
+MAX_LINE = 4096
+# Largest file an agent accepts; it also keeps this much short of a full disk
+MAX_FILE = int(os.environ.get("YESWAY_TRANSFER_MAX", str(8 * 1024 ** 3)))
+
+QUEUED = "Queued"
+HASHING = "Hashing"
+SENDING = "Sending"
+DONE = "Done"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+
+
+class QueueFull(Exception):
+    """The transfer queue already holds MAX_QUEUED transfers."""
+
+
+class Refused(Exception):
+    """An agent turned down a request; the reason goes back to the sender."""
+
+
+# ------------------- Wire Format -------------------
+# Requests are one JSON line, a chunk followed by its bytes; every request
+# gets one JSON line back. A transfer is named by the SHA-256 of the whole
+# file, which is also what the agent checks once every chunk is in:
+#
+#   {"op": "auth", "code": ..}
+#       -> {"ok": true}; must come first, or the agent hangs up
+#   {"op": "open", "id": .., "name": .., "size": .., "chunk": .., "overwrite": ..}
+#       -> {"ok": true, "have": [indexes of chunks already received]}
+#          or {"ok": false, "error": ..} (file exists, too large, ...)
+#   {"op": "chunk", "id": .., "index": .., "length": .., "sha256": ..} + bytes
+#       -> {"ok": true} or {"ok": false, "error": "checksum"}
+#   {"op": "finish", "id": ..}
+#       -> {"ok": true} once the file is complete and verified
+#
+# open is idempotent, so each parallel connection sends it, and a transfer
+# cut off halfway resumes by opening again and sending what is missing.
+async def request(reader, writer, header, body=None):
+    writer.write(json.dumps(header).encode() + b"\n")
+    if body is not None:
+        writer.write(body)
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("agent closed the connection")
+    return json.loads(line)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ------------------- File Agent -------------------
+# Receives files into one directory from senders that know the client's
+# code, the same secret its heartbeats and screen agent use; only loopback
+# is served unless a host is given. A file is written in place as
+# <name>.<id prefix>.part, with each verified chunk's index appended to a
+# .chunks log next to it; after an interruption the log says which chunks
+# are already there. Chunks from parallel connections are checked on
+# worker threads concurrently; each file's lock only covers the seek and
+# write (pread/pwrite are not available everywhere, e.g. on Windows). An
+# existing file is only replaced when the sender asks to overwrite it.
+class FileAgent:
+    def __init__(self, directory, code, host="127.0.0.1", port=TRANSFER_PORT, max_size=MAX_FILE):
+        if not code:
+            raise ValueError("a file agent needs the client's code")
+        self.directory = directory
+        self.code = str(code)
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.server = None
+        self.received = 0
+        self._files = {}
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.server = await asyncio.start_server(self._on_sender, self.host, self.port,
+                                                 limit=MAX_LINE)
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        for state in self._files.values():
+            state["file"].close()
+            state["log"].close()
+        self._files.clear()
+
+    def _open(self, header):
+        file_id, size, chunk = str(header["id"]), int(header["size"]), int(header["chunk"])
+        name = os.path.basename(str(header["name"]))
+        overwrite = header.get("overwrite") is True
+        if (not name or name.startswith(".") or len(file_id) != 64 or size < 0
+                or not 0 < chunk <= MAX_CHUNK):
+            raise ValueError("bad open request")
+        if not overwrite and os.path.exists(os.path.join(self.directory, name)):
+            raise Refused(f"{name} already exists")
+        state = self._files.get(file_id)
+        if state is None:
+            if size > self.max_size:
+                raise Refused(f"file larger than {self.max_size:,} bytes")
+            if size > shutil.disk_usage(self.directory).free:
+                raise Refused("not enough disk space")
+            part = os.path.join(self.directory, f"{name}.{file_id[:12]}.part")
+            have = set()
+            if os.path.exists(part + ".chunks"):
+                with open(part + ".chunks", encoding="ascii") as f:
+                    have = {int(line) for line in f if line.strip().isdigit()}
+            fd = os.open(part, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            f = os.fdopen(fd, "r+b")
+            f.truncate(size)
+            state = self._files[file_id] = {
+                "name": name, "part": part, "size": size, "chunk": chunk, "overwrite": overwrite,
+                "file": f, "lock": threading.Lock(),
+                "have": have, "log": open(part + ".chunks", "a", encoding="ascii"),
+            }
+        return state
+
+    def _write(self, state, index, data, sha256):
+        # Worker thread: verify, then write at the chunk's offset
+        if hashlib.sha256(data).hexdigest() != sha256:
+            return False
+        with state["lock"]:
+            state["file"].seek(index * state["chunk"])
+            state["file"].write(data)
+        return True
+
+    def _finish(self, file_id):
+        # Worker thread: the whole file must hash to its id
+        state = self._files[file_id]
+        chunks = -(-state["size"] // state["chunk"])
+        if len(state["have"]) < chunks:
+            return "missing chunks"
+        with state["lock"]:
+            state["file"].flush()
+            os.fsync(state["file"].fileno())
+        if file_sha256(state["part"]) != file_id:
+            # Start over rather than keep chunks that add up to the wrong file
+            state["have"].clear()
+            state["log"].truncate(0)
+            return "file checksum"
+        target = os.path.join(self.directory, state["name"])
+        if not state["overwrite"] and os.path.exists(target):
+            return f"{state['name']} already exists"
+        del self._files[file_id]
+        state["file"].close()
+        state["log"].close()
+        os.replace(state["part"], target)
+        os.remove(state["part"] + ".chunks")
+        return None
+
+    async def _authenticate(self, reader, writer):
+        header = json.loads(await reader.readline())
+        allowed = (isinstance(header, dict) and header.get("op") == "auth"
+                   and hmac.compare_digest(str(header.get("code")).encode(), self.code.encode()))
+        writer.write(json.dumps({"ok": allowed}).encode() + b"\n")
+        await writer.drain()
+        return allowed
+
+    async def _on_sender(self, reader, writer):
+        try:
+            if not await asyncio.wait_for(self._authenticate(reader, writer), 10):
+                return
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                header = json.loads(line)
+                op = header.get("op")
+                if op == "open":
+                    try:
+                        state = self._open(header)
+                        reply = {"ok": True, "have": sorted(state["have"])}
+                    except Refused as exc:
+                        reply = {"ok": False, "error": str(exc)}
+                elif op == "chunk":
+                    state = self._files[header["id"]]
+                    index, length = int(header["index"]), int(header["length"])
+                    if not 0 <= length <= state["chunk"] or index * state["chunk"] >= state["size"]:
+                        raise ValueError("bad chunk")
+                    data = await reader.readexactly(length)
+                    if await asyncio.to_thread(self._write, state, index, data, header["sha256"]):
+                        if index not in state["have"]:
+                            state["have"].add(index)
+                            state["log"].write(f"{index}\n")
+                            state["log"].flush()
+                        self.received += length
+                        reply = {"ok": True}
+                    else:
+                        reply = {"ok": False, "error": "checksum"}
+                elif op == "finish":
+                    error = await asyncio.to_thread(self._finish, header["id"])
+                    reply = {"ok": error is None, "error": error}
+                else:
+                    reply = {"ok": False, "error": f"unknown op {op!r}"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError, ValueError, KeyError, TypeError, OSError):
+            pass
+        finally:
+            writer.close()
+
+
+# ------------------- Transfers -------------------
+class Transfer:
+    __slots__ = ("id", "client", "host", "port", "code", "path", "name", "size", "chunk_size",
+                 "overwrite", "file_id", "done", "sent", "state", "error", "started", "ended",
+                 "task")
+
+    def __init__(self, transfer_id, client, host, port, code, path, chunk_size=CHUNK_SIZE,
+                 overwrite=False):
+        self.id = transfer_id
+        self.client = client
+        self.host = host
+        self.port = port
+        self.code = code
+        self.path = path
+        self.overwrite = overwrite
+        self.name = os.path.basename(path)
+        self.size = os.path.getsize(path)
+        self.chunk_size = chunk_size
+        self.file_id = None
+        self.done = 0
+        self.sent = 0
+        self.state = QUEUED
+        self.error = None
+        self.started = None
+        self.ended = None
+        self.task = None
+
+    @property
+    def chunks(self):
+        return -(-self.size // self.chunk_size)
+
+    @property
+    def fraction(self):
+        if not self.chunks:
+            return 1.0 if self.state == DONE else 0.0
+        return self.done / self.chunks
+
+    @property
+    def rate(self):
+        # Bytes per second sent by the current (or last) run
+        if self.started is None:
+            return 0.0
+        elapsed = (self.ended or time.monotonic()) - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, HASHING, SENDING)
+
+
+async def upload(transfer, parallel=PARALLEL):
+    """Send transfer.path to its agent over `parallel` connections, skipping chunks it has."""
+    if transfer.file_id is None:
+        transfer.state = HASHING
+        transfer.file_id = await asyncio.to_thread(file_sha256, transfer.path)
+    transfer.state = SENDING
+    transfer.started, transfer.ended, transfer.sent = time.monotonic(), None, 0
+    opening = {"op": "open", "id": transfer.file_id, "name": transfer.name,
+               "size": transfer.size, "chunk": transfer.chunk_size,
+               "overwrite": transfer.overwrite}
+
+    connections = []
+    try:
+        for _ in range(max(1, min(parallel, transfer.chunks))):
+            reader, writer = await asyncio.open_connection(transfer.host, transfer.port,
+                                                          limit=MAX_LINE)
+            connections.append((reader, writer))
+            try:
+                reply = await request(reader, writer, {"op": "auth", "code": transfer.code})
+            except ConnectionError:
+                reply = {}
+            if not reply.get("ok"):
+                raise ConnectionError("agent refused the client code")
+            reply = await request(reader, writer, opening)
+            if not reply.get("ok"):
+                raise ConnectionError(reply.get("error") or "agent refused the transfer")
+        have = set(reply["have"])
+        transfer.done = len(have)
+        missing = iter([i for i in range(transfer.chunks) if i not in have])
+
+        def read(f, index):
+            f.seek(index * transfer.chunk_size)
+            data = f.read(transfer.chunk_size)
+            return data, hashlib.sha256(data).hexdigest()
+
+        async def sender(reader, writer):
+            # Connections share one iterator of missing chunks, so each
+            # takes the next one as soon as it is free. Each reads through
+            # its own file object, so no two threads share a position.
+            with open(transfer.path, "rb") as f:
+                for index in missing:
+                    data, digest = await asyncio.to_thread(read, f, index)
+                    header = {"op": "chunk", "id": transfer.file_id, "index": index,
+                              "length": len(data), "sha256": digest}
+                    for _ in range(CHUNK_RETRIES + 1):
+                        reply = await request(reader, writer, header, data)
+                        transfer.sent += len(data)
+                        if reply.get("ok"):
+                            break
+                    else:
+                        raise ConnectionError(f"chunk {index}: {reply.get('error')}")
+                    transfer.done += 1
+
+        await asyncio.gather(*(sender(*connection) for connection in connections))
+
+        reply = await request(*connections[0], {"op": "finish", "id": transfer.file_id})
+        if not reply.get("ok"):
+            raise ConnectionError(reply.get("error") or "agent could not finish the file")
+    finally:
+        for _, writer in connections:
+            writer.close()
+
+
+# ------------------- Transfer Manager -------------------
+# Runs transfers on the background loop, at most MAX_ACTIVE at a time and
+# the rest queued in order, so any number of clients can be served without
+# the Tk thread ever waiting. The UI polls transfers() for progress. A
+# failed or cancelled transfer can be resumed: the agent still has the
+# chunks it verified, and only the rest are sent.
+class TransferManager:
+    def __init__(self, background, parallel=PARALLEL, active=MAX_ACTIVE, limit=MAX_QUEUED):
+        self.background = background
+        self.parallel = parallel
+        self.limit = limit
+        self._slots = asyncio.Semaphore(active)
+        self._transfers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def send(self, client, host, code, path, port=TRANSFER_PORT, overwrite=False):
+        transfer = Transfer(next(self._ids), client, host, int(port), code, path,
+                            overwrite=overwrite)
+        with self._lock:
+            if sum(t.active for t in self._transfers.values()) >= self.limit:
+                raise QueueFull(f"{self.limit} transfers are already queued")
+            self._transfers[transfer.id] = transfer
+        self._start(transfer)
+        return transfer
+
+    def resume(self, transfer_id):
+        transfer = self.get(transfer_id)
+        if transfer is not None and transfer.state in (FAILED, CANCELLED):
+            transfer.state, transfer.error = QUEUED, None
+            self._start(transfer)
+
+    def _start(self, transfer):
+        def create():
+            transfer.task = asyncio.ensure_future(self._run(transfer))
+        self.background.call_soon(create)
+
+    async def _run(self, transfer):
+        try:
+            async with self._slots:
+                await upload(transfer, self.parallel)
+            transfer.state = DONE
+        except asyncio.CancelledError:
+            transfer.state = CANCELLED
+        except Exception as exc:
+            # Whatever went wrong, the transfer must not stay "Sending"
+            transfer.error = str(exc) or type(exc).__name__
+            transfer.state = FAILED
+        finally:
+            transfer.ended = time.monotonic()
+
+    def cancel(self, transfer_id):
+        transfer = self.get(transfer_id)
+        if transfer is not None and transfer.task is not None and transfer.active:
+            self.background.call_soon(transfer.task.cancel)
+
+    def get(self, transfer_id):
+        with self._lock:
+            return self._transfers.get(transfer_id)
+
+    def transfers(self):
+        with self._lock:
+            return list(self._transfers.values())
+
+    def clear_finished(self):
+        with self._lock:
+            for transfer_id in [t.id for t in self._transfers.values() if not t.active]:
+                del self._transfers[transfer_id]
+
+
+def _agent(args):
+    async def serve():
+        agent = FileAgent(args.dir, args.code, args.host, args.port)
+        server = await agent.start()
+        print(f"receiving files into {args.dir} on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def _bench(args):
+    # A stand-in agent on its own loop, the console's manager on another,
+    # and this thread polling progress the way the Tk timer does
+    from background import BackgroundLoop
+
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, "installer.bin")
+        with open(source, "wb") as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+        agent = FileAgent(os.path.join(work, "received"), "BENCH", "127.0.0.1", args.port)
+        agent_loop = BackgroundLoop("transfer-agent")
+        agent_loop.submit(agent.start()).result()
+        manager = TransferManager(BackgroundLoop("transfer-console"), args.parallel)
+
+        def wait(transfer, stop_at=None):
+            while transfer.active:
+                if stop_at is not None and transfer.fraction >= stop_at:
+                    manager.cancel(transfer.id)
+                    stop_at = None
+                time.sleep(0.01)
+
+        transfer = manager.send("bench", "127.0.0.1", "BENCH", source, args.port)
+        if args.interrupt:
+            wait(transfer, args.interrupt)
+            print(f"cancelled at {transfer.fraction:.0%} ({transfer.state})")
+            manager.resume(transfer.id)
+        wait(transfer)
+        if transfer.state != DONE:
+            raise SystemExit(f"Transfer {transfer.state}: {transfer.error}")
+
+        received = os.path.join(agent.directory, "installer.bin")
+        agent_loop.call_soon(agent.close)
+        intact = file_sha256(received) == transfer.file_id
+        print(f"sent      {args.size} MiB in {transfer.ended - transfer.started:.2f}s "
+              f"({transfer.rate / 2 ** 20:,.1f} MiB/s over {args.parallel} connection(s))")
+        print(f"last run  {transfer.sent / 2 ** 20:,.1f} MiB on the wire, "
+              f"{transfer.chunks} chunks of {transfer.chunk_size // 1024} KiB")
+        print(f"verified  {'yes' if intact else 'NO'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunked file transfer to client machines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    agent = commands.add_parser("agent", help="receive files into a directory")
+    agent.add_argument("dir")
+    agent.add_argument("--code", required=True, help="the client's code; senders must present it")
+    agent.add_argument("--host", default="127.0.0.1",
+                       help="address to serve on; 0.0.0.0 for every interface")
+    agent.add_argument("--port", type=int, default=TRANSFER_PORT)
+    agent.set_defaults(run=_agent)
+
+    bench = commands.add_parser("bench", help="measure throughput against a local agent")
+    bench.add_argument("--size", type=int, default=256, help="file size in MiB")
+    bench.add_argument("--parallel", type=int, default=PARALLEL)
+    bench.add_argument("--interrupt", type=float,
+                       help="cancel at this fraction done, then resume")
+    bench.add_argument("--port", type=int, default=TRANSFER_PORT + 1)
+    bench.set_defaults(run=_bench)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
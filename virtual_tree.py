@@ -0,0 +1,373 @@
+from collections import OrderedDict
+from itertools import islice
+from tkinter import ttk
+
+
+# ------------------- Virtual Tree -------------------
+# A ttk.Treeview that only ever holds the rows currently on screen. Rows
+# are pulled from a data source in pages as the user scrolls, so building
+# and scrolling the view costs the same for 100 rows or 100k rows.
+#
+#   fetch(offset, limit, sort_by) -> [(iid, values), ...]
+#   count()                       -> total number of rows
+#   ids(sort_by)                  -> every row's iid in order (optional; for
+#                                    selecting ranges and all rows without
+#                                    fetching their values)
+#
+# The selection is kept here too, as iids, so it can span rows that are
+# not on screen: shift-click selects a range of any length and Ctrl+A
+# every row. The Treeview only ever shows the part that is visible, and
+# <<SelectionChanged>> fires on the frame whenever the selection changes.
+#
+# Columns made sortable() sort on a click of their heading, and reverse on
+# the next. The tree only records the choice and reloads: sort_by is
+# (sort key name, reversed), or None for the source's own order, and the
+# source hands back its rows in that order.
+class VirtualTree(ttk.Frame):
+    def __init__(self, master, columns, fetch, count, ids=None, height=10,
+                 page_size=200, cached_pages=8, **tree_options):
+        super().__init__(master)
+        self.fetch = fetch
+        self.count = count
+        self.ids = ids
+        self.height = height
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+
+        self.total = 0
+        self.offset = 0
+        self._pages = OrderedDict()
+        self._located = {}  # iid -> (page number, position) for cached rows
+        self.selected = {}  # iid -> None, in the order they were selected
+        self._anchor = None  # row index shift-click extends from
+        self.sort_by = None
+        self._sort_keys = {}  # column -> sort key name
+        self._titles = {}  # column -> heading text without the arrow
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings",
+                                 height=height, **tree_options)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="x", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.height))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.height))
+        self.tree.bind("<Up>", self._on_key_up)
+        self.tree.bind("<Down>", self._on_key_down)
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<Control-Button-1>", self._on_control_click)
+        self.tree.bind("<Shift-Button-1>", self._on_shift_click)
+        self.tree.bind("<Control-a>", lambda e: self.select_all() or "break")
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+
+        self.refresh()
+
+    # ---------------- Treeview passthrough ----------------
+    def heading(self, column, **options):
+        return self.tree.heading(column, **options)
+
+    def column(self, column, **options):
+        return self.tree.column(column, **options)
+
+    def selection(self):
+        # Selected iids, including rows scrolled out of view
+        return tuple(self.selected)
+
+    def focus(self):
+        return self.tree.focus()
+
+    def item(self, iid, option=None, **options):
+        return self.tree.item(iid, option, **options)
+
+    # ---------------- Sorting ----------------
+    def sortable(self, columns):
+        """Sort on heading clicks; columns maps each column to the key name put in sort_by."""
+        for column, key in columns.items():
+            self._sort_keys[column] = key
+            self._titles[column] = self.tree.heading(column, "text")
+            self.tree.heading(column, command=lambda c=column: self.sort(c))
+
+    def sort(self, column, reverse=None):
+        key = self._sort_keys[column]
+        if reverse is None:
+            # A second click on the same column flips it
+            reverse = self.sort_by == (key, False)
+        self.sort_by = (key, reverse)
+        for other, title in self._titles.items():
+            arrow = (" ▼" if reverse else " ▲") if other == column else ""
+            self.tree.heading(other, text=title + arrow)
+        # Positions mean something else now; the selection (ids) stays
+        self._anchor = None
+        self.offset = 0
+        self.refresh()
+
+    # ---------------- Data ----------------
+    def refresh(self):
+        """Drop cached pages and re-read the row count, keeping the scroll position."""
+        self._pages.clear()
+        self._located.clear()
+        self.total = self.count()
+        self.offset = max(0, min(self.offset, self.total - self.height))
+        self.render()
+
+    def _page(self, number):
+        page = self._pages.get(number)
+        if page is None:
+            page = self.fetch(number * self.page_size, self.page_size, self.sort_by)
+            self._pages[number] = page
+            for position, (iid, values) in enumerate(page):
+                self._located[str(iid)] = (number, position)
+            if len(self._pages) > self.cached_pages:
+                self._drop_page(next(iter(self._pages)))
+        else:
+            self._pages.move_to_end(number)
+        return page
+
+    def _drop_page(self, number):
+        for iid, values in self._pages.pop(number):
+            self._located.pop(str(iid), None)
+
+    def _invalidate_from(self, index):
+        # Rows at or after index have shifted; forget any cached page that
+        # holds them. An unknown position (None) drops every page.
+        first = 0 if index is None else index // self.page_size
+        for number in [n for n in self._pages if n >= first]:
+            self._drop_page(number)
+
+    def _index_of(self, iid):
+        location = self._located.get(iid)
+        if location is None:
+            return None
+        number, position = location
+        return number * self.page_size + position
+
+    def window(self):
+        rows = []
+        end = min(self.offset + self.height, self.total)
+        index = self.offset
+        while index < end:
+            number, start = divmod(index, self.page_size)
+            page = self._page(number)
+            chunk = page[start:start + end - index]
+            if not chunk:
+                break
+            rows.extend(chunk)
+            index += len(chunk)
+        return rows
+
+    # ---------------- Row patches ----------------
+    # Applied from model change events. Each touches at most the visible
+    # window, never the whole data set. Rows are ordered by record id, so a
+    # new record always lands at the end; while sort_by is set, callers
+    # refresh instead of inserting.
+    def update_row(self, iid, values):
+        iid = str(iid)
+        location = self._located.get(iid)
+        if location is not None:
+            number, position = location
+            self._pages[number][position] = (iid, values)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values)
+
+    def cached_values(self, iid):
+        # Values of a row if it is on a cached page, without hitting the source
+        location = self._located.get(str(iid))
+        if location is None:
+            return None
+        number, position = location
+        return self._pages[number][position][1]
+
+    def insert_row(self, iid, values):
+        self.total += 1
+        self._invalidate_from(self.total - 1)
+        if len(self.tree.get_children()) < self.height:
+            self.tree.insert("", "end", iid=iid, values=values)
+        self._update_scrollbar()
+
+    def delete_row(self, iid):
+        iid = str(iid)
+        self.deselect((iid,))
+        index = self._index_of(iid)
+        self.total -= 1
+        self._invalidate_from(index)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+            self.offset = max(0, min(self.offset, self.total - self.height))
+            self._fill()
+        elif index is not None and index < self.offset:
+            # Keep the same rows on screen as the ones above shift up.
+            self.offset -= 1
+        elif index is None:
+            self.offset = max(0, min(self.offset, self.total - self.height))
+            self.render()
+        self._update_scrollbar()
+
+    def _fill(self):
+        window = self.window()
+        children = self.tree.get_children()
+        if [str(iid) for iid, values in window[:len(children)]] != list(children):
+            self.render()
+            return
+        for iid, values in window[len(children):]:
+            self.tree.insert("", "end", iid=iid, values=values)
+        self._show_selection()
+
+    # ---------------- Selection ----------------
+    def select_all(self):
+        self._select(self._ids_between(0, self.total))
+
+    def clear_selection(self):
+        self._select(())
+
+    def deselect(self, iids):
+        # Forget rows that were deleted or left the view
+        selected, removed = self.selected, False
+        for iid in map(str, iids):
+            if iid in selected:
+                del selected[iid]
+                removed = True
+        if removed:
+            self._show_selection()
+            self.event_generate("<<SelectionChanged>>")
+
+    def _select(self, iids):
+        self.selected = dict.fromkeys(map(str, iids))
+        self._show_selection()
+        self.event_generate("<<SelectionChanged>>")
+
+    def _ids_between(self, start, stop):
+        if self.ids is not None:
+            return list(islice(self.ids(self.sort_by), start, stop))
+        return [iid for iid, values in self.fetch(start, stop - start, self.sort_by)]
+
+    def _show_selection(self):
+        # Make the Treeview's own selection match the visible part of ours
+        visible = [iid for iid in self.tree.get_children() if iid in self.selected]
+        if set(visible) != set(self.tree.selection()):
+            self.tree.selection_set(visible)
+
+    def _drop_offscreen(self):
+        # The Treeview is about to replace what it shows selected; rows it
+        # cannot see would otherwise stay selected behind its back
+        visible = set(self.tree.get_children())
+        if any(iid not in visible for iid in self.selected):
+            self.selected = {iid: None for iid in self.selected if iid in visible}
+            self.event_generate("<<SelectionChanged>>")
+
+    def _row_index(self, iid):
+        children = self.tree.get_children()
+        return self.offset + children.index(iid) if iid in children else None
+
+    def _on_tree_select(self, event):
+        # Taken from the Treeview after clicks and keys: rows on screen are
+        # selected exactly when it shows them selected
+        shown = set(self.tree.selection())
+        selected, changed = self.selected, False
+        for iid in self.tree.get_children():
+            if iid in shown and iid not in selected:
+                selected[iid] = None
+                changed = True
+            elif iid not in shown and iid in selected:
+                del selected[iid]
+                changed = True
+        if changed:
+            self.event_generate("<<SelectionChanged>>")
+
+    def _clicked_row(self, event):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None
+        return self.tree.identify_row(event.y) or None
+
+    def _on_click(self, event):
+        # A plain click starts over, dropping rows selected off screen
+        iid = self._clicked_row(event)
+        if iid is not None:
+            self._drop_offscreen()
+            self._anchor = self._row_index(iid)
+
+    def _on_control_click(self, event):
+        iid = self._clicked_row(event)
+        if iid is not None:
+            self._anchor = self._row_index(iid)
+
+    def _on_shift_click(self, event):
+        iid = self._clicked_row(event)
+        if iid is None:
+            return None
+        index = self._row_index(iid)
+        if self._anchor is None:
+            self._anchor = index
+        start, stop = sorted((self._anchor, index))
+        self._select(self._ids_between(start, stop + 1))
+        self.tree.focus(iid)
+        return "break"
+
+    # ---------------- Rendering ----------------
+    def render(self):
+        focus = self.tree.focus()
+
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        for iid, values in self.window():
+            self.tree.insert("", "end", iid=iid, values=values)
+
+        self._show_selection()
+        if focus and self.tree.exists(focus):
+            self.tree.focus(focus)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if self.total <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / self.total,
+                               (self.offset + self.height) / self.total)
+
+    # ---------------- Scrolling ----------------
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.total - self.height))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.total)
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_key_up(self, event):
+        self._on_key_move(event)
+        children = self.tree.get_children()
+        if children and self.tree.focus() == children[0] and self.offset > 0:
+            self.scroll(-1)
+            self._move_focus(self.tree.get_children()[0])
+            return "break"
+
+    def _on_key_down(self, event):
+        self._on_key_move(event)
+        children = self.tree.get_children()
+        if children and self.tree.focus() == children[-1]:
+            self.scroll(1)
+            self._move_focus(self.tree.get_children()[-1])
+            return "break"
+
+    def _on_key_move(self, event):
+        # Arrow keys move a single selection, as a plain click does
+        if not event.state & 0x1:
+            self._drop_offscreen()
+
+    def _move_focus(self, iid):
+        self.tree.focus(iid)
+        self.tree.selection_set(iid)